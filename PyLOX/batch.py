@@ -0,0 +1,493 @@
+"""
+Batch evaluation of a program over many input records
+inputs are columns of values for globals that the program reads but does not
+declare, the program is evaluated once for all of the records
+every value is either uniform, a python value shared by all records, or a
+column with one value per record
+columns are numpy arrays when numpy is installed and typed arrays otherwise
+branches of if statements and right hand sides of logical operators are
+evaluated under a mask of the records that take them, assignments only change
+the records in the mask
+records that raise a runtime error are evaluated again one by one by the
+interpreter so errors are reported exactly, so is every record of a program
+with a statement that has no batch form (loops, print, lazy blocks,
+functions, classes and imports) or an expression that has no batch form
+(calls, arrays and properties)
+results are the values of the globals declared by the program for every
+record, so the program should be optimized without whole_program
+run as a module it evaluates a script over the records of a csv file and
+writes the declared globals of every record as csv
+"""
+import csv
+import operator as operators
+import sys
+from array import array
+from itertools import repeat
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from PyLOX.exceptions import PyLOXRuntimeError
+from PyLOX.expressions import Binary, Grouping, Literal, Unary, \
+    Variable, Assignment, Logical
+from PyLOX.interpreter import Interpreter
+from PyLOX.main import compile_program
+from PyLOX.program import run_deep
+from PyLOX.statements import Stmt, Var, Expression, Block, If
+from PyLOX.token import Token, TokenType
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TYPE_CODES = {float: "d", bool: "b"}
+NUMERIC_FUNCTIONS = {
+    TokenType.PLUS: operators.add,
+    TokenType.MINUS: operators.sub,
+    TokenType.STAR: operators.mul,
+    TokenType.SLASH: operators.truediv,
+}
+COMPARISON_FUNCTIONS = {
+    TokenType.GREATER: operators.gt,
+    TokenType.GREATER_EQUAL: operators.ge,
+    TokenType.LESS: operators.lt,
+    TokenType.LESS_EQUAL: operators.le,
+}
+
+
+# storage of float and bool columns
+def make(kind: type, values: Iterable[object]):
+    if numpy is not None:
+        return numpy.fromiter(values, dtype=kind)
+    return array(TYPE_CODES[kind], values)
+
+
+def full(kind: type, size: int, value: object):
+    if numpy is not None:
+        return numpy.full(size, value, dtype=kind)
+    return array(TYPE_CODES[kind], [value]) * size
+
+
+def combine(function: Callable[..., object], kind: type, *operands):
+    # operands are columns or python values
+    if numpy is not None:
+        return function(*operands)
+    return make(kind, map(function, *[operand if isinstance(operand, array)
+                                      else repeat(operand)
+                                      for operand in operands]))
+
+
+def where(mask, kind: type, lhs, rhs):
+    if numpy is not None:
+        return numpy.where(mask, lhs, rhs)
+    return combine(lambda take, x, y: x if take else y, kind, mask, lhs, rhs)
+
+
+def both(lhs, rhs):
+    if numpy is not None:
+        return lhs & rhs
+    return combine(operators.and_, bool, lhs, rhs)
+
+
+def either(lhs, rhs):
+    if numpy is not None:
+        return lhs | rhs
+    return combine(operators.or_, bool, lhs, rhs)
+
+
+def negate(mask):
+    if numpy is not None:
+        return ~mask
+    return combine(operators.not_, bool, mask)
+
+
+def any_true(mask) -> bool:
+    if numpy is not None:
+        return bool(mask.any())
+    return any(mask)
+
+
+def to_list(kind: type, values) -> List[object]:
+    if kind is object:
+        return list(values)
+    if numpy is not None:
+        return values.tolist()
+    return list(map(kind, values))
+
+
+class Unsupported(Exception):
+    # raised for nodes that have no batch form
+    pass
+
+
+class Column(object):
+    # kind is float, bool or object, object columns are python lists
+    def __init__(self, kind: type, values):
+        self.kind = kind
+        self.values = values
+
+    @classmethod
+    def from_values(cls, values: Sequence[object]) -> "Column":
+        kinds = {type(value) for value in values}
+        if kinds == {float} or kinds == {bool}:
+            kind = kinds.pop()
+            return cls(kind, make(kind, values))
+        return cls(object, list(values))
+
+
+def kind_of(value: object) -> type:
+    if isinstance(value, Column):
+        return value.kind
+    return type(value)
+
+
+def raw(value: object) -> object:
+    if isinstance(value, Column):
+        return value.values
+    return value
+
+
+def expand(value: object, size: int) -> List[object]:
+    if isinstance(value, Column):
+        return list(items(value))
+    return [value] * size
+
+
+def items(value: object) -> Iterable[object]:
+    if isinstance(value, Column):
+        return value.values if value.kind is object else \
+            to_list(value.kind, value.values)
+    return repeat(value)
+
+
+class BatchEvaluator(object):
+    def __init__(self, size: int, stream=sys.stdout):
+        self.size = size
+        # uniform values are computed by the interpreter itself
+        self.interpreter = Interpreter(stream)
+        self.scopes = [{}]
+        self.mask = full(bool, size, True)
+        self.failed = full(bool, size, False)
+
+    def evaluate(self, program: List[Stmt],
+                 inputs: Dict[str, Column]) -> Dict[str, object]:
+        self.scopes = [dict(inputs)]
+        self.statements(program)
+        return self.scopes[0]
+
+    def failed_records(self) -> List[int]:
+        return [index for index, failed in
+                enumerate(to_list(bool, self.failed)) if failed]
+
+    # masks
+    def fail(self, records) -> None:
+        # records raised a runtime error, they are evaluated again later
+        self.failed = either(self.failed, records)
+        self.mask = both(self.mask, negate(records))
+
+    def with_mask(self, mask, node: object) -> object:
+        old_mask = self.mask
+        self.mask = mask
+        try:
+            return node.visit(self)
+        finally:
+            self.mask = both(old_mask, negate(self.failed))
+
+    def truth(self, value: object) -> object:
+        # returns a python bool if the truth is uniform and a mask otherwise
+        if not isinstance(value, Column):
+            return self.interpreter.is_true(value)
+        if value.kind is float:
+            return True
+        if value.kind is bool:
+            return value.values
+        return make(bool, map(self.interpreter.is_true, value.values))
+
+    def select(self, mask, lhs: object, rhs: object) -> object:
+        # takes lhs for the records in the mask and rhs for the others
+        lhs_kind, rhs_kind = kind_of(lhs), kind_of(rhs)
+        if not isinstance(lhs, Column) and not isinstance(rhs, Column) and \
+                lhs_kind == rhs_kind and lhs == rhs:
+            return lhs
+        if lhs_kind == rhs_kind and lhs_kind in TYPE_CODES:
+            return Column(lhs_kind, where(mask, lhs_kind, raw(lhs), raw(rhs)))
+        return Column.from_values([x if take else y for take, x, y in
+                                   zip(to_list(bool, mask), items(lhs),
+                                       items(rhs))])
+
+    # statements
+    def statements(self, stmts: List[Stmt]) -> None:
+        for stmt in stmts:
+            if not any_true(self.mask):
+                return
+            stmt.visit(self)
+
+    def visit_var(self, stmt: Var) -> None:
+        if stmt.value is None:
+            value = None
+        else:
+            value = stmt.value.visit(self)
+        self.scopes[-1][stmt.name.lexeme] = value
+
+    def visit_expression(self, stmt: Expression) -> None:
+        stmt.expression.visit(self)
+
+    visit_assignment_statement = visit_expression
+
+    def visit_block(self, stmt: Block) -> None:
+        self.scopes.append({})
+        try:
+            self.statements(stmt.statements)
+        finally:
+            self.scopes.pop()
+
+    def visit_if(self, stmt: If) -> None:
+        truth = self.truth(stmt.condition.visit(self))
+        if truth is True or truth is False:
+            branch = stmt.then_statement if truth else stmt.else_statement
+            if branch is not None:
+                branch.visit(self)
+            return
+        then_mask = both(self.mask, truth)
+        else_mask = both(self.mask, negate(truth))
+        if any_true(then_mask):
+            self.with_mask(then_mask, stmt.then_statement)
+        if stmt.else_statement is not None and any_true(else_mask):
+            self.with_mask(else_mask, stmt.else_statement)
+
+    def unsupported(self, node: object) -> None:
+        raise Unsupported(type(node).__name__)
+
+    visit_print = visit_while = visit_for = visit_break = visit_hoist = \
+        visit_lazy_block = visit_function = visit_class = visit_import = \
+        unsupported
+
+    # expressions
+    def visit_literal(self, expr: Literal) -> object:
+        return expr.value
+
+    def visit_grouping(self, expr: Grouping) -> object:
+        return expr.expression.visit(self)
+
+    def visit_variable(self, expr: Variable) -> object:
+        for scope in reversed(self.scopes):
+            if expr.name.lexeme in scope:
+                return scope[expr.name.lexeme]
+        self.fail(self.mask)
+        return None
+
+    def visit_assignment(self, expr: Assignment) -> object:
+        value = expr.value.visit(self)
+        for scope in reversed(self.scopes):
+            if expr.name.lexeme in scope:
+                scope[expr.name.lexeme] = self.select(self.mask, value,
+                                                      scope[expr.name.lexeme])
+                return value
+        self.fail(self.mask)
+        return None
+
+    def visit_increment(self, expr: Assignment) -> object:
+        return self.visit_assignment(expr)
+
+    def visit_logical(self, expr: Logical) -> object:
+        left = expr.left.visit(self)
+        truth = self.truth(left)
+        if isinstance(truth, bool):
+            if truth == (expr.operator == TokenType.OR):
+                return left
+            return expr.right.visit(self)
+        # records that short circuit keep the left value
+        take_left = truth if expr.operator == TokenType.OR else negate(truth)
+        right_mask = both(self.mask, negate(take_left))
+        if not any_true(right_mask):
+            return left
+        right = self.with_mask(right_mask, expr.right)
+        return self.select(take_left, left, right)
+
+    def visit_unary(self, expr: Unary) -> object:
+        inner = expr.right.visit(self)
+        if not isinstance(inner, Column):
+            return self.uniform(self.interpreter.unary_operators.get(
+                expr.operator.type, self.interpreter.not_implemented),
+                expr.operator, inner)
+        if inner.kind is not float:
+            self.fail(self.mask)
+            return None
+        if expr.operator == TokenType.MINUS:
+            return Column(float, combine(operators.neg, float, inner.values))
+        # numbers are always true
+        return False
+
+    def visit_unchecked_unary(self, expr: Unary) -> object:
+        return self.visit_unary(expr)
+
+    def visit_guarded_unary(self, expr: Unary) -> object:
+        return self.visit_unary(expr)
+
+    def visit_binary(self, expr: Binary) -> object:
+        lhs = expr.left.visit(self)
+        rhs = expr.right.visit(self)
+        operator = expr.operator.type
+        if not isinstance(lhs, Column) and not isinstance(rhs, Column):
+            return self.uniform(self.interpreter.binary_operators.get(
+                operator, self.interpreter.not_implemented),
+                expr.operator, lhs, rhs)
+        if operator in (TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL):
+            return self.equality(operator, lhs, rhs)
+        if kind_of(lhs) is not float or kind_of(rhs) is not float:
+            # strings are never columns
+            self.fail(self.mask)
+            return None
+        if operator in COMPARISON_FUNCTIONS:
+            return Column(bool, combine(COMPARISON_FUNCTIONS[operator], bool,
+                                        raw(lhs), raw(rhs)))
+        if operator == TokenType.SLASH:
+            rhs = self.divisor(rhs)
+        return Column(float, combine(NUMERIC_FUNCTIONS[operator], float,
+                                     raw(lhs), raw(rhs)))
+
+    def visit_unchecked_binary(self, expr: Binary) -> object:
+        return self.visit_binary(expr)
+
+    def visit_guarded_binary(self, expr: Binary) -> object:
+        return self.visit_binary(expr)
+
+    def visit_compare(self, expr: Binary) -> object:
+        return self.visit_binary(expr)
+
+    visit_invariant = visit_deep = visit_array = visit_index = visit_slice = \
+        visit_index_assignment = visit_call = visit_property = \
+        visit_property_assignment = visit_this = visit_super = unsupported
+
+    def uniform(self, function: Callable[..., object], operator: Token,
+                *operands) -> object:
+        try:
+            return function(operator, *operands)
+        except PyLOXRuntimeError:
+            self.fail(self.mask)
+            return None
+
+    def equality(self, operator: TokenType, lhs: object,
+                 rhs: object) -> Column:
+        if kind_of(lhs) in TYPE_CODES and kind_of(rhs) in TYPE_CODES:
+            values = combine(operators.eq, bool, raw(lhs), raw(rhs))
+        else:
+            values = make(bool, map(operators.eq, items(lhs), items(rhs)))
+        if operator == TokenType.BANG_EQUAL:
+            values = negate(values)
+        return Column(bool, values)
+
+    def divisor(self, rhs: object) -> object:
+        # records dividing by zero fail, their divisor is replaced to
+        # compute the others
+        if not isinstance(rhs, Column):
+            if rhs == 0:
+                self.fail(self.mask)
+                return 1.0
+            return rhs
+        zero = combine(operators.eq, bool, rhs.values, 0.0)
+        failing = both(zero, self.mask)
+        if any_true(failing):
+            self.fail(failing)
+        if any_true(zero):
+            return Column(float, where(zero, float, 1.0, rhs.values))
+        return rhs
+
+
+def evaluate_record(program: List[Stmt], inputs: Dict[str, Sequence[object]],
+                    index: int, stream=sys.stdout) -> Optional[Dict[str, object]]:
+    # returns None if the record raises, the error is reported
+    interpreter = Interpreter(stream)
+    for name, values in inputs.items():
+        interpreter.environment.memory[name] = values[index]
+    try:
+        for stmt in program:
+            interpreter.interpret(stmt)
+    except PyLOXRuntimeError as e:
+        print(e)
+        return None
+    return interpreter.environment.memory
+
+
+def evaluate_batch(program: List[Stmt], inputs: Dict[str, Sequence[object]],
+                   stream=sys.stdout) -> Dict[str, List[object]]:
+    # returns the values of the declared globals for every record, records
+    # that raise have nil values
+    sizes = {len(values) for values in inputs.values()}
+    if len(sizes) != 1 or 0 in sizes:
+        raise ValueError("inputs must be one or more columns with the same "
+                         "non zero number of records")
+    size = sizes.pop()
+    names = [stmt.name.lexeme for stmt in program if isinstance(stmt, Var)]
+
+    evaluator = BatchEvaluator(size, stream)
+    try:
+        values = evaluator.evaluate(program, {
+            name: Column.from_values(values) for name, values in inputs.items()})
+        failed = evaluator.failed_records()
+        outputs = {name: expand(values.get(name), size) for name in names}
+    except Unsupported:
+        failed = range(size)
+        outputs = {name: [None] * size for name in names}
+
+    def reevaluate():
+        # records run on a deep stack, like the programs of the interpreter
+        for index in failed:
+            record = evaluate_record(program, inputs, index, stream)
+            for name in names:
+                outputs[name][index] = None if record is None else \
+                    record.get(name)
+
+    run_deep(reevaluate)
+    return outputs
+
+
+def parse_value(text: str) -> object:
+    # csv fields are numbers, true, false, nil or strings
+    literals = {"true": True, "false": False, "nil": None}
+    if text in literals:
+        return literals[text]
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def format_value(value: object) -> str:
+    if value is None:
+        return "nil"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        value = str(value)
+        if value[-2:] == ".0":
+            value = value[:-2]
+    return str(value)
+
+
+def main(args, stream=sys.stdout):
+    if len(args) != 3:
+        print("Usage: {name} script inputs.csv".format(name=args[0]))
+        return -1
+    with open(args[1], "r") as f:
+        program = run_deep(compile_program, f.read())
+    if program is None:
+        return -1
+    with open(args[2], "r", newline="") as f:
+        records = list(csv.DictReader(f))
+    names = list(records[0]) if records else []
+    inputs = {name: [parse_value(record[name]) for record in records]
+              for name in names}
+    try:
+        outputs = evaluate_batch(program, inputs, stream)
+    except ValueError as e:
+        print(e)
+        return -1
+    writer = csv.writer(stream)
+    writer.writerow(list(outputs))
+    writer.writerows(zip(*[map(format_value, values)
+                           for values in outputs.values()]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
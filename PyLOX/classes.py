@@ -0,0 +1,74 @@
+"""
+Classes and instances of the language
+instances do not keep a dictionary of their fields, they point to a shape
+which maps field names to indices of their field list
+instances that got the same fields in the same order share their shape,
+adding a field moves an instance along a transition to the next shape
+every property site of the program keeps an inline cache of the last shape
+it has seen and where the property was found for it, so a site that always
+sees the same shape reads and writes fields without looking up their names
+"""
+from typing import Dict, Optional
+
+
+class Shape(object):
+    def __init__(self, klass: "LoxClass", slots: Dict[str, int]):
+        self.klass = klass
+        self.slots = slots
+        self.transitions = {}
+
+    def add(self, name: str) -> "Shape":
+        # shape of an instance after the field is added to it
+        shape = self.transitions.get(name)
+        if shape is None:
+            slots = dict(self.slots)
+            slots[name] = len(slots)
+            # a thread that added the field first keeps its shape
+            shape = self.transitions.setdefault(name, Shape(self.klass, slots))
+        return shape
+
+
+class InlineCache(object):
+    # a get site hits either a slot or a method, a set site hits either a
+    # slot or a transition to the shape that has the field
+    # the entry is replaced as a whole, so threads running the same program
+    # never see the slot of one shape together with another shape
+    __slots__ = ("entry",)
+
+    def __init__(self):
+        # shape, slot and method or transition
+        self.entry = (None, None, None)
+
+
+class LoxClass(object):
+    def __init__(self, name: str, superclass: Optional["LoxClass"],
+                 methods: Dict[str, object]):
+        self.name = name
+        self.superclass = superclass
+        self.methods = methods
+        # instances start with no fields
+        self.shape = Shape(self, {})
+        initializer = self.find_method("init")
+        self.arity = 0 if initializer is None else initializer.arity
+
+    def find_method(self, name: str) -> Optional[object]:
+        klass = self
+        while klass is not None:
+            if name in klass.methods:
+                return klass.methods[name]
+            klass = klass.superclass
+        return None
+
+    def __str__(self):
+        return self.name
+
+
+class LoxInstance(object):
+    __slots__ = ("shape", "fields")
+
+    def __init__(self, shape: Shape):
+        self.shape = shape
+        self.fields = []
+
+    def __str__(self):
+        return "{name} instance".format(name=self.shape.klass.name)
@@ -0,0 +1,246 @@
+"""
+Evaluation daemon
+a server keeps a pool of worker processes that have PyLOX imported and keep
+a cache of the programs they optimized, so a job only pays for running its
+program
+clients connect to a Unix domain socket and send one job per line as a JSON
+object with either the path or the source of a script, "lazy" and "jit" are
+optional flags, every job is answered by a line with a JSON object holding
+the captured output, the exit status and the timings of the job in seconds
+every job runs in a new interpreter, programs do not share their globals
+the server optimizes every program once and publishes it in shared memory,
+workers attach to it instead of parsing the source again, modules imported
+by jobs are compiled once by every worker
+with a prelude every worker runs it once and jobs run in forks of that
+interpreter, which share its frozen globals and keep their own writes
+"""
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from typing import Dict
+
+from PyLOX.functions import LRUCache, missing
+from PyLOX.interpreter import Interpreter
+from PyLOX.jit import JITInterpreter
+from PyLOX.main import run, compile_program
+from PyLOX.program import run_deep
+from PyLOX.shared_program import publish, attach
+
+# number of optimized programs a worker keeps
+PROGRAM_CACHE_SIZE = 64
+
+# number of programs the server keeps in shared memory
+PUBLISHED_PROGRAMS = 64
+
+# optimized programs of the worker process
+programs = LRUCache(PROGRAM_CACHE_SIZE)
+
+# programs the worker attached to by the name of their memory
+attached = LRUCache(PROGRAM_CACHE_SIZE)
+
+# interpreter that ran the prelude of the worker
+prelude = None
+
+
+def warm_up(worker: int) -> int:
+    return os.getpid()
+
+
+def run_prelude(path: str) -> None:
+    # runs in every worker when it starts
+    global prelude
+    with open(path, "r") as f:
+        source = f.read()
+    output = io.StringIO()
+    interpreter = Interpreter(output)
+    interpreter.directory = os.path.dirname(path)
+    with contextlib.redirect_stdout(output):
+        if run(source, interpreter, jobs=1) == -1:
+            raise ValueError("prelude {path} failed".format(path=path))
+    interpreter.freeze()
+    prelude = interpreter
+
+
+def evaluate(job: Dict[str, object]) -> Dict[str, object]:
+    # runs in a worker, prints of the program and of its errors are captured
+    started = time.perf_counter()
+    output = io.StringIO()
+    if "source" in job:
+        source = job["source"]
+    else:
+        try:
+            with open(job["path"], "r") as f:
+                source = f.read()
+        except (KeyError, OSError) as e:
+            return {"output": "Job can not be read: {error}\n".format(
+                error=e), "status": -1, "timings": {"worker": 0.0}}
+    interpreter_class = JITInterpreter if job.get("jit") else Interpreter
+    lazy = bool(job.get("lazy"))
+    cached = (source, lazy, False) in programs.entries
+    if not cached and "program" in job:
+        program = attached.get(job["program"])
+        if program is missing:
+            program = attach(job["program"])
+            attached.put(job["program"], program)
+        programs.put((source, lazy, False), program)
+    if prelude is None:
+        interpreter = interpreter_class(output)
+    else:
+        interpreter = prelude.fork(output, interpreter_class)
+    if "path" in job:
+        interpreter.directory = os.path.dirname(job["path"])
+    # functions of the prelude read and write the globals of the job
+    with contextlib.redirect_stdout(output):
+        status = run(source, interpreter, whole_program=prelude is None,
+                     jobs=1, lazy=lazy, programs=programs)
+    return {"output": output.getvalue(), "status": status or 0,
+            "cached": cached,
+            "timings": {"worker": time.perf_counter() - started}}
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            started = time.perf_counter()
+            try:
+                job = json.loads(line)
+                if not isinstance(job, dict):
+                    raise ValueError("a job is a JSON object")
+            except ValueError as e:
+                result = {"output": "Job can not be decoded: {error}\n".format(
+                    error=e), "status": -1, "timings": {}}
+            else:
+                job = self.server.share(job)
+                result = self.server.pool.submit(evaluate, job).result()
+            result["timings"]["total"] = time.perf_counter() - started
+            self.wfile.write(json.dumps(result).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class Daemon(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, workers: int, prelude: str = None):
+        if os.path.exists(path):
+            # left behind by a daemon that was killed
+            os.unlink(path)
+        super(Daemon, self).__init__(path, JobHandler)
+        self.path = path
+        self.prelude = prelude
+        # workers share the resource tracker of the server if it runs before
+        # they start, it unlinks the published programs if the server dies
+        resource_tracker.ensure_running()
+        if prelude is None:
+            self.pool = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self.pool = ProcessPoolExecutor(max_workers=workers,
+                                            initializer=run_prelude,
+                                            initargs=(prelude,))
+        # workers are started before the first job arrives
+        list(self.pool.map(warm_up, range(workers)))
+        # shared memory of the published programs by source and parser mode
+        self.published = {}
+        self.lock = threading.Lock()
+
+    def share(self, job: Dict[str, object]) -> Dict[str, object]:
+        # adds the name of the shared program to the job, jobs that can not
+        # be read or parsed go to a worker as they are and it reports them
+        if "source" in job:
+            source = job["source"]
+        else:
+            try:
+                with open(job["path"], "r") as f:
+                    source = f.read()
+            except (KeyError, OSError):
+                return job
+        key = (source, bool(job.get("lazy")))
+        with self.lock:
+            memory = self.published.get(key)
+        if memory is None:
+            # other jobs are served while the program is compiled, the
+            # worker reports the errors of the job
+            # compiling and pickling recurse as deep as the tree
+            program = run_deep(compile_program, source,
+                               whole_program=self.prelude is None, jobs=1,
+                               lazy=key[1], stream=io.StringIO())
+            if program is None:
+                return job
+            try:
+                memory = run_deep(publish, program)
+            except RecursionError:
+                return job
+            with self.lock:
+                if key in self.published:
+                    # published by a job of the same source in the meantime
+                    memory.close()
+                    memory.unlink()
+                    memory = self.published[key]
+                else:
+                    self.published[key] = memory
+                    if len(self.published) > PUBLISHED_PROGRAMS:
+                        # workers that attached to it keep their mapping
+                        oldest = self.published.pop(next(iter(self.published)))
+                        oldest.close()
+                        oldest.unlink()
+        return dict(job, source=source, program=memory.name)
+
+    def server_close(self):
+        super(Daemon, self).server_close()
+        self.pool.shutdown()
+        for memory in self.published.values():
+            memory.close()
+            memory.unlink()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def submit(path: str, job: Dict[str, object]) -> Dict[str, object]:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        connection.sendall(json.dumps(job).encode("utf-8") + b"\n")
+        with connection.makefile("rb") as response:
+            return json.loads(response.readline())
+
+
+def main(args):
+    flags = {arg for arg in args[1:] if arg.startswith("--")}
+    args = [arg for arg in args if arg not in flags]
+    workers = os.cpu_count() or 1
+    connect = prelude_path = None
+    for flag in flags:
+        if flag.startswith("--workers="):
+            workers = int(flag[len("--workers="):])
+        elif flag.startswith("--connect="):
+            connect = flag[len("--connect="):]
+        elif flag.startswith("--prelude="):
+            prelude_path = os.path.abspath(flag[len("--prelude="):])
+    if connect is not None and len(args) == 2:
+        # runs a script on a daemon as if it was run by main
+        result = submit(connect, {"path": os.path.abspath(args[1]),
+                                  "lazy": "--lazy" in flags,
+                                  "jit": "--jit" in flags})
+        print(result["output"], end="")
+        return result["status"]
+    elif connect is None and len(args) == 2:
+        with Daemon(args[1], workers, prelude_path) as daemon:
+            try:
+                daemon.serve_forever()
+            except KeyboardInterrupt:
+                pass
+        return 0
+    print("Usage: {name} [--workers=N] [--prelude=FILE] socket\n"
+          "       {name} --connect=socket [--lazy] [--jit] script".format(
+        name=args[0]))
+    return -1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,449 @@
+"""
+Dead store and unused variable elimination
+variables are resolved to their declarations first, then a backward liveness
+analysis finds the stores whose value is never read again
+declarations that are never read are removed together with their stores,
+stores that are overwritten before use are replaced with their values
+initializers and values that might raise or have side effects are kept
+variables read by function bodies are live at every call, stores inside
+function bodies to variables they capture are always kept
+methods are function bodies too, fields of instances are not tracked
+"""
+from typing import Dict, List, Optional, Set
+
+from PyLOX.expressions import Expr, Binary, Grouping, Literal, Unary, \
+    Variable, Assignment, Logical, Invariant, Deep, Array, Index, Slice, \
+    IndexAssignment, Call, UncheckedBinary, UncheckedUnary, Property, \
+    PropertyAssignment, This, Super
+from PyLOX.statements import Stmt, Var, Print, Expression, Block, If, While, \
+    Break, For, Hoist, LazyBlock, Function, Return, Class, Import
+from PyLOX.token import TokenType
+from PyLOX.transformer import Transformer, walk, referenced_names, has_calls
+
+
+class Binding(object):
+    def __init__(self, declaration: Var, exported: bool, depth: int):
+        self.declaration = declaration
+        self.exported = exported
+        self.reads = 0
+        # number of functions the declaration is in, references from other
+        # depths are captured
+        self.depth = depth
+        self.captured = False
+
+
+class Resolver(Transformer):
+    # maps variables and assignments to the declaration they refer to
+    def __init__(self, keep_globals: bool):
+        self.keep_globals = keep_globals
+        self.scopes = [{}]
+        self.bindings = {}
+        self.lazy_references = {}
+        self.depth = 0
+
+    def resolve(self, program: List[Stmt]) -> Dict[int, Binding]:
+        self.transform(program)
+        return self.bindings
+
+    def lookup(self, name: str) -> Optional[Binding]:
+        # names of functions and parameters are bound to None
+        for scope in reversed(self.scopes):
+            if name in scope:
+                binding = scope[name]
+                if binding is not None and binding.depth != self.depth:
+                    binding.captured = True
+                return binding
+        return None
+
+    def visit_var(self, stmt: Var) -> Stmt:
+        super(Resolver, self).visit_var(stmt)
+        exported = self.keep_globals and len(self.scopes) == 1
+        binding = Binding(stmt, exported, self.depth)
+        self.scopes[-1][stmt.name.lexeme] = binding
+        self.bindings[id(stmt)] = binding
+        return stmt
+
+    def visit_block(self, stmt: Block) -> Stmt:
+        self.scopes.append({})
+        super(Resolver, self).visit_block(stmt)
+        self.scopes.pop()
+        return stmt
+
+    def visit_for(self, stmt: For) -> Stmt:
+        self.scopes.append({})
+        super(Resolver, self).visit_for(stmt)
+        self.scopes.pop()
+        return stmt
+
+    def visit_function(self, stmt: Function) -> Stmt:
+        self.scopes[-1][stmt.name.lexeme] = None
+        return self.resolve_function(stmt)
+
+    def visit_class(self, stmt: Class) -> Stmt:
+        # names of methods are not variables
+        self.scopes[-1][stmt.name.lexeme] = None
+        if stmt.superclass is not None:
+            stmt.superclass.visit(self)
+        for method in stmt.methods:
+            self.resolve_function(method)
+        return stmt
+
+    def resolve_function(self, stmt: Function) -> Stmt:
+        self.scopes.append({parameter.lexeme: None
+                            for parameter in stmt.parameters})
+        self.depth += 1
+        super(Resolver, self).visit_function(stmt)
+        self.depth -= 1
+        self.scopes.pop()
+        return stmt
+
+    def visit_variable(self, expr: Variable) -> Expr:
+        binding = self.lookup(expr.name.lexeme)
+        if binding is not None:
+            binding.reads += 1
+            self.bindings[id(expr)] = binding
+        return expr
+
+    def visit_assignment(self, expr: Assignment) -> Expr:
+        super(Resolver, self).visit_assignment(expr)
+        binding = self.lookup(expr.name.lexeme)
+        if binding is not None:
+            self.bindings[id(expr)] = binding
+        return expr
+
+    def visit_deep(self, expr: Deep) -> Expr:
+        for node in walk(expr.expression):
+            if isinstance(node, Variable):
+                self.visit_variable(node)
+            elif isinstance(node, Assignment):
+                binding = self.lookup(node.name.lexeme)
+                if binding is not None:
+                    self.bindings[id(node)] = binding
+        return expr
+
+    def visit_lazy_block(self, stmt: LazyBlock) -> Stmt:
+        # every name in a lazy block might be read
+        references = set()
+        for name in referenced_names(stmt):
+            binding = self.lookup(name)
+            if binding is not None:
+                binding.reads += 1
+                references.add(binding)
+        self.lazy_references[id(stmt)] = references
+        return stmt
+
+
+class Liveness(object):
+    # backward analysis, every visit function receives the bindings that are
+    # live after the node and returns the ones that are live before it
+    def __init__(self, bindings: Dict[int, Binding],
+                 lazy_references: Dict[int, Set[Binding]]):
+        self.bindings = bindings
+        self.lazy_references = lazy_references
+        self.break_live = []
+        self.live_stores = set()
+        self.captured = {binding for binding in bindings.values()
+                         if binding.captured}
+
+    def analyse(self, program: List[Stmt], live: Set[Binding]) -> Set[int]:
+        self.statements(program, live)
+        return self.live_stores
+
+    def statements(self, stmts: List[Stmt], live: Set[Binding]) -> Set[Binding]:
+        for stmt in reversed(stmts):
+            live = stmt.visit(self, live)
+        return live
+
+    def store(self, node: object, live: Set[Binding]) -> Set[Binding]:
+        binding = self.bindings.get(id(node))
+        if binding is None:
+            return live
+        if binding in live:
+            self.live_stores.add(id(node))
+        return live - {binding}
+
+    def loop(self, condition: Expr, body: Stmt, update: Optional[Expr],
+             live: Set[Binding]) -> Set[Binding]:
+        self.break_live.append(live)
+        head = set()
+        while True:
+            after_body = head if update is None else update.visit(self, head)
+            before_body = body.visit(self, after_body)
+            new_head = condition.visit(self, live | before_body)
+            if new_head <= head:
+                break
+            head |= new_head
+        self.break_live.pop()
+        return head
+
+    # statements
+    def visit_var(self, stmt: Var, live: Set[Binding]) -> Set[Binding]:
+        live = self.store(stmt, live)
+        if stmt.value is not None:
+            live = stmt.value.visit(self, live)
+        return live
+
+    def visit_expression(self, stmt: Expression, live: Set[Binding]) -> Set[Binding]:
+        return stmt.expression.visit(self, live)
+
+    def visit_print(self, stmt: Print, live: Set[Binding]) -> Set[Binding]:
+        return stmt.expression.visit(self, live)
+
+    def visit_block(self, stmt: Block, live: Set[Binding]) -> Set[Binding]:
+        return self.statements(stmt.statements, live)
+
+    def visit_if(self, stmt: If, live: Set[Binding]) -> Set[Binding]:
+        then_live = stmt.then_statement.visit(self, live)
+        if stmt.else_statement is not None:
+            else_live = stmt.else_statement.visit(self, live)
+        else:
+            else_live = live
+        return stmt.condition.visit(self, then_live | else_live)
+
+    def visit_while(self, stmt: While, live: Set[Binding]) -> Set[Binding]:
+        return self.loop(stmt.condition, stmt.body, None, live)
+
+    def visit_for(self, stmt: For, live: Set[Binding]) -> Set[Binding]:
+        live = self.loop(stmt.condition, stmt.body, stmt.update, live)
+        if stmt.initializer is not None:
+            live = stmt.initializer.visit(self, live)
+        return live
+
+    def visit_break(self, stmt: Break, live: Set[Binding]) -> Set[Binding]:
+        # lazy blocks are analysed without their enclosing loop
+        if not self.break_live:
+            return set()
+        return set(self.break_live[-1])
+
+    def visit_hoist(self, stmt: Hoist, live: Set[Binding]) -> Set[Binding]:
+        return stmt.loop.visit(self, live)
+
+    def visit_lazy_block(self, stmt: LazyBlock, live: Set[Binding]) -> Set[Binding]:
+        live = live | self.lazy_references[id(stmt)]
+        if has_calls(stmt):
+            live = live | self.captured
+        return live
+
+    def visit_function(self, stmt: Function, live: Set[Binding]) -> Set[Binding]:
+        # body runs at the calls, every captured variable is live after it
+        self.statements(stmt.body, set(self.captured))
+        return live
+
+    def visit_class(self, stmt: Class, live: Set[Binding]) -> Set[Binding]:
+        for method in stmt.methods:
+            self.visit_function(method, live)
+        if stmt.superclass is not None:
+            live = stmt.superclass.visit(self, live)
+        return live
+
+    def visit_import(self, stmt: Import, live: Set[Binding]) -> Set[Binding]:
+        # modules do not read the variables of the importer
+        return live
+
+    def visit_return(self, stmt: Return, live: Set[Binding]) -> Set[Binding]:
+        live = set(self.captured)
+        if stmt.value is not None:
+            live = stmt.value.visit(self, live)
+        return live
+
+    # expressions
+    def visit_literal(self, expr: Literal, live: Set[Binding]) -> Set[Binding]:
+        return live
+
+    def visit_variable(self, expr: Variable, live: Set[Binding]) -> Set[Binding]:
+        binding = self.bindings.get(id(expr))
+        if binding is None:
+            return live
+        return live | {binding}
+
+    def visit_assignment(self, expr: Assignment, live: Set[Binding]) -> Set[Binding]:
+        live = self.store(expr, live)
+        return expr.value.visit(self, live)
+
+    def visit_logical(self, expr: Logical, live: Set[Binding]) -> Set[Binding]:
+        # right hand side might be short circuited
+        live = live | expr.right.visit(self, live)
+        return expr.left.visit(self, live)
+
+    def visit_binary(self, expr: Binary, live: Set[Binding]) -> Set[Binding]:
+        live = expr.right.visit(self, live)
+        return expr.left.visit(self, live)
+
+    def visit_unchecked_binary(self, expr: UncheckedBinary, live: Set[Binding]) -> Set[Binding]:
+        return self.visit_binary(expr, live)
+
+    def visit_guarded_binary(self, expr: Binary, live: Set[Binding]) -> Set[Binding]:
+        return self.visit_binary(expr, live)
+
+    def visit_grouping(self, expr: Grouping, live: Set[Binding]) -> Set[Binding]:
+        return expr.expression.visit(self, live)
+
+    def visit_unary(self, expr: Unary, live: Set[Binding]) -> Set[Binding]:
+        return expr.right.visit(self, live)
+
+    def visit_unchecked_unary(self, expr: UncheckedUnary, live: Set[Binding]) -> Set[Binding]:
+        return self.visit_unary(expr, live)
+
+    def visit_guarded_unary(self, expr: Unary, live: Set[Binding]) -> Set[Binding]:
+        return self.visit_unary(expr, live)
+
+    def visit_invariant(self, expr: Invariant, live: Set[Binding]) -> Set[Binding]:
+        return expr.expression.visit(self, live)
+
+    def visit_array(self, expr: Array, live: Set[Binding]) -> Set[Binding]:
+        for element in reversed(expr.elements):
+            live = element.visit(self, live)
+        return live
+
+    def visit_index(self, expr: Index, live: Set[Binding]) -> Set[Binding]:
+        live = expr.index.visit(self, live)
+        return expr.array.visit(self, live)
+
+    def visit_slice(self, expr: Slice, live: Set[Binding]) -> Set[Binding]:
+        for bound in (expr.stop, expr.start):
+            if bound is not None:
+                live = bound.visit(self, live)
+        return expr.array.visit(self, live)
+
+    def visit_index_assignment(self, expr: IndexAssignment, live: Set[Binding]) -> Set[Binding]:
+        live = expr.value.visit(self, live)
+        live = expr.index.visit(self, live)
+        return expr.array.visit(self, live)
+
+    def visit_call(self, expr: Call, live: Set[Binding]) -> Set[Binding]:
+        live = live | self.captured
+        for argument in reversed(expr.arguments):
+            live = argument.visit(self, live)
+        return expr.callee.visit(self, live)
+
+    def visit_property(self, expr: Property, live: Set[Binding]) -> Set[Binding]:
+        return expr.object.visit(self, live)
+
+    def visit_property_assignment(self, expr: PropertyAssignment,
+                                 live: Set[Binding]) -> Set[Binding]:
+        live = expr.value.visit(self, live)
+        return expr.object.visit(self, live)
+
+    def visit_this(self, expr: This, live: Set[Binding]) -> Set[Binding]:
+        return live
+
+    def visit_super(self, expr: Super, live: Set[Binding]) -> Set[Binding]:
+        return live
+
+    def visit_deep(self, expr: Deep, live: Set[Binding]) -> Set[Binding]:
+        # every store inside is kept and every read is live
+        live = set(live)
+        for node in walk(expr.expression):
+            if isinstance(node, Assignment):
+                self.live_stores.add(id(node))
+            elif isinstance(node, Variable) and id(node) in self.bindings:
+                live.add(self.bindings[id(node)])
+            elif isinstance(node, Call):
+                live |= self.captured
+        return live
+
+
+class DeadStoreElimination(Transformer):
+    def __init__(self, keep_globals: bool = False):
+        self.keep_globals = keep_globals
+        self.bindings = {}
+        self.live_stores = set()
+        # number of statement lists being transformed, top level statements
+        # are in the first one
+        self.depth = 0
+        self.removed_declarations = 0
+        self.removed_stores = 0
+        self.removed_statements = 0
+
+    def optimize(self, program: List[Stmt]) -> List[Stmt]:
+        # removing a store might leave other stores without readers
+        while True:
+            removed = self.removed()
+            resolver = Resolver(self.keep_globals)
+            self.bindings = resolver.resolve(program)
+            exported = {binding for binding in self.bindings.values()
+                        if binding.exported}
+            liveness = Liveness(self.bindings, resolver.lazy_references)
+            self.live_stores = liveness.analyse(program, exported)
+            program = self.transform(program)
+            if self.removed() == removed:
+                return program
+
+    def removed(self) -> int:
+        return self.removed_declarations + self.removed_stores + \
+               self.removed_statements
+
+    def statistics(self) -> str:
+        return "Dead store elimination: removed {declarations} declarations, " \
+               "{stores} stores and {statements} statements".format(
+            declarations=self.removed_declarations,
+            stores=self.removed_stores,
+            statements=self.removed_statements)
+
+    def is_pure(self, expr: Expr) -> bool:
+        # pure expressions have no side effects and can not raise
+        if isinstance(expr, Literal):
+            return True
+        if isinstance(expr, Variable):
+            return id(expr) in self.bindings
+        if isinstance(expr, (Grouping, Invariant)):
+            return self.is_pure(expr.expression)
+        if isinstance(expr, UncheckedUnary):
+            return self.is_pure(expr.right)
+        if isinstance(expr, Binary):
+            if isinstance(expr, UncheckedBinary):
+                safe = expr.operator != TokenType.SLASH
+            else:
+                safe = expr.operator.type in (TokenType.EQUAL_EQUAL,
+                                              TokenType.BANG_EQUAL)
+            return safe and self.is_pure(expr.left) and self.is_pure(expr.right)
+        if isinstance(expr, Logical):
+            return self.is_pure(expr.left) and self.is_pure(expr.right)
+        return False
+
+    def transform(self, program: List[Stmt]) -> List[Stmt]:
+        self.depth += 1
+        top_level = self.depth == 1
+        statements = []
+        for stmt in program:
+            stmt = stmt.visit(self)
+            if stmt is None:
+                continue
+            if not top_level and isinstance(stmt, Expression) and \
+                    self.is_pure(stmt.expression):
+                # blocks discard the values of their statements
+                self.removed_statements += 1
+                continue
+            statements.append(stmt)
+        self.depth -= 1
+        return statements
+
+    def visit_var(self, stmt: Var) -> Optional[Stmt]:
+        super(DeadStoreElimination, self).visit_var(stmt)
+        binding = self.bindings[id(stmt)]
+        if id(stmt) in self.live_stores or binding.exported:
+            return stmt
+        value = stmt.value
+        is_nil = value is None or isinstance(value, Literal) and value.value is None
+        if binding.reads > 0:
+            # the variable is read but its initial value is overwritten
+            if is_nil or not self.is_pure(value):
+                return stmt
+            self.removed_stores += 1
+            stmt.value = None
+            return stmt
+        if is_nil or self.is_pure(value):
+            self.removed_declarations += 1
+            return None
+        if self.depth == 1:
+            # at top level expression statements print their values
+            return stmt
+        self.removed_declarations += 1
+        return Expression(value)
+
+    def visit_assignment(self, expr: Assignment) -> Expr:
+        super(DeadStoreElimination, self).visit_assignment(expr)
+        if id(expr) in self.bindings and id(expr) not in self.live_stores:
+            self.removed_stores += 1
+            return expr.value
+        return expr
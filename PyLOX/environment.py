@@ -1,8 +1,16 @@
+import threading
+from typing import Dict
+
+from PyLOX.classes import LoxInstance
 from PyLOX.exceptions import PyLOXRuntimeError
+from PyLOX.numeric_array import NumericArray
 from PyLOX.token import Token
 
 
 class Environment(object):
+    # frozen environments keep the writes of the running context here
+    overlay = None
+
     def __init__(self, parent=None):
         self.parent = parent
         self.memory = {}
@@ -26,3 +34,212 @@ class Environment(object):
             raise PyLOXRuntimeError(name, "{name} is not defined in the current"
                                           " environment".format(name=name.lexeme))
         self.memory[name.lexeme] = value
+
+    def resolve(self, name: str):
+        # memory that reads and writes of the name go to, None if the name is
+        # not defined or can not be written
+        environment = self
+        while environment is not None:
+            if type(environment) is not Environment:
+                return environment.resolve(name)
+            if name in environment.memory:
+                return environment.memory
+            environment = environment.parent
+        return None
+
+    def freeze(self) -> None:
+        # the environment becomes a shared layer in place, so functions that
+        # close over it see the overlay of the running context
+        self.__class__ = FrozenEnvironment
+        self.contexts = threading.local()
+
+
+class ImportedEnvironment(Environment):
+    # layer between an environment and its parent for the modules it
+    # imported, reads and writes of the names a module defines go to the
+    # environment of the module, so importers share its bindings
+    # the module imported last comes first
+    def __init__(self, parent=None):
+        super(ImportedEnvironment, self).__init__(parent)
+        self.modules = []
+
+    def add(self, module: Environment) -> None:
+        if module in self.modules:
+            self.modules.remove(module)
+        self.modules.append(module)
+
+    def exporter(self, name: str):
+        # modules export the names they import too
+        for module in reversed(self.modules):
+            if name in module.memory:
+                return module
+            if type(module.parent) is ImportedEnvironment:
+                exporter = module.parent.exporter(name)
+                if exporter is not None:
+                    return exporter
+        return None
+
+    def __getitem__(self, name: Token):
+        module = self.exporter(name.lexeme)
+        if module is not None:
+            return module[name]
+        return super(ImportedEnvironment, self).__getitem__(name)
+
+    def assign(self, name: Token, value: object) -> None:
+        module = self.exporter(name.lexeme)
+        if module is not None:
+            module.assign(name, value)
+        else:
+            super(ImportedEnvironment, self).assign(name, value)
+
+    def resolve(self, name: str):
+        module = self.exporter(name)
+        if module is not None:
+            return module.resolve(name)
+        if self.parent is not None:
+            return self.parent.resolve(name)
+        return None
+
+
+class Overlay(dict):
+    # writes of a context to a frozen environment, with the private copies of
+    # the arrays and instances it read from the shared memory by the id of
+    # the shared value, and the modules the context imported
+    # the overlays of the other frozen environments of the context share
+    # the copies
+    def __init__(self, copies=None):
+        super(Overlay, self).__init__()
+        self.copies = {} if copies is None else copies
+        self.imports = None
+        self.layers = {}
+
+    def layer(self, environment: Environment) -> "Overlay":
+        overlay = self.layers.get(id(environment))
+        if overlay is None:
+            overlay = self.layers[id(environment)] = Overlay(self.copies)
+        return overlay
+
+    def fork(self) -> "Overlay":
+        # overlay of a fork of the context, the arrays and instances of the
+        # context are copied so neither sees the changes of the other, and
+        # the shared values the context copied map to the copies of the fork
+        overlay = Overlay()
+        copies = overlay.copies
+        for key, value in self.copies.items():
+            copies[key] = thaw(value, copies)
+        overlay.update((name, thaw(value, copies))
+                       for name, value in self.items())
+        for key, layer in self.layers.items():
+            forked = overlay.layers[key] = Overlay(copies)
+            forked.update((name, thaw(value, copies))
+                          for name, value in layer.items())
+        if self.imports is not None:
+            overlay.imports = ImportedEnvironment(self.imports.parent)
+            overlay.imports.modules = list(self.imports.modules)
+        return overlay
+
+
+def thaw(value: object, copies: Dict[int, object]) -> object:
+    # private copy of a value of the shared memory, arrays and instances are
+    # copied with the ones they refer to, values that can not be changed
+    # in place are shared
+    if type(value) is NumericArray:
+        copy = copies.get(id(value))
+        if copy is None:
+            copy = copies[id(value)] = value.slice(0, len(value))
+        return copy
+    if type(value) is LoxInstance:
+        copy = copies.get(id(value))
+        if copy is None:
+            copy = copies[id(value)] = LoxInstance(value.shape)
+            copy.fields = [thaw(field, copies) for field in value.fields]
+        return copy
+    return value
+
+
+class FrozenEnvironment(Environment):
+    # reads fall through the overlay of the running context to the shared
+    # memory, writes are copied into the overlay, without a context the
+    # environment can only be read
+    # arrays and instances are copied into the overlay when the context
+    # reads them, so it never changes the values other contexts see
+    # modules the context imports come before the shared parent
+    # every thread runs its own context
+    @property
+    def overlay(self):
+        return getattr(self.contexts, "overlay", None)
+
+    @overlay.setter
+    def overlay(self, overlay):
+        self.contexts.overlay = overlay
+
+    def __getstate__(self):
+        return {"parent": self.parent, "memory": self.memory}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.contexts = threading.local()
+
+    def writable(self, name: Token) -> dict:
+        if self.overlay is None:
+            raise PyLOXRuntimeError(name, "{name} can not be written, the "
+                                          "environment is frozen".format(
+                name=name.lexeme))
+        return self.overlay
+
+    def define(self, name: Token, value: object) -> None:
+        self.writable(name)[name.lexeme] = value
+
+    def outer(self, overlay: Overlay):
+        if overlay is not None and overlay.imports is not None:
+            return overlay.imports
+        return self.parent
+
+    def __getitem__(self, name: Token):
+        overlay = self.overlay
+        if overlay is not None:
+            if name.lexeme in overlay:
+                return overlay[name.lexeme]
+            if name.lexeme in self.memory:
+                return self.shared(overlay, name.lexeme)
+        elif name.lexeme in self.memory:
+            return self.memory[name.lexeme]
+        outer = self.outer(overlay)
+        if outer is not None:
+            return outer[name]
+        raise PyLOXRuntimeError(name, "{name} is not defined in the current "
+                                      "environment".format(name=name.lexeme))
+
+    def shared(self, overlay: Overlay, name: str) -> object:
+        value = self.memory[name]
+        if type(value) in (NumericArray, LoxInstance):
+            value = overlay[name] = thaw(value, overlay.copies)
+        return value
+
+    def assign(self, name: Token, value: object) -> None:
+        overlay = self.overlay
+        if overlay is not None and name.lexeme in overlay or \
+                name.lexeme in self.memory:
+            self.writable(name)[name.lexeme] = value
+            return
+        outer = self.outer(overlay)
+        if outer is not None:
+            outer.assign(name, value)
+        else:
+            raise PyLOXRuntimeError(name, "{name} is not defined in the current"
+                                          " environment".format(name=name.lexeme))
+
+    def resolve(self, name: str):
+        overlay = self.overlay
+        if overlay is not None and name in overlay:
+            return overlay
+        if name in self.memory:
+            if overlay is None:
+                return None
+            # copied on the first write, a compiled loop may write it
+            overlay[name] = thaw(self.memory[name], overlay.copies)
+            return overlay
+        outer = self.outer(overlay)
+        if outer is not None:
+            return outer.resolve(name)
+        return None
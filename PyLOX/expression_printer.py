@@ -1,9 +1,12 @@
 from typing import List
 
 from PyLOX.expressions import Binary, Grouping, Literal, Unary, \
-    Variable, Assignment, Logical
+    Variable, Assignment, Logical, Invariant, Deep, Array, Index, Slice, \
+    IndexAssignment, Call, LocalVariable, LocalAssignment, Property, \
+    PropertyAssignment, This, Super, Increment, LocalIncrement, Compare
 from PyLOX.statements import Stmt, Var, Print, Expression, Block, If, While, \
-    Break
+    Break, For, Hoist, LazyBlock, Function, Return, LocalVar, LocalBlock, \
+    Class, AssignmentStatement, Import
 
 
 class ExpressionPrinter(object):
@@ -26,6 +29,10 @@ class ExpressionPrinter(object):
         self._print(depth, "Expression statement:")
         stmt.expression.visit(self, depth + 1)
 
+    def visit_assignment_statement(self, stmt: AssignmentStatement, depth: int):
+        self._print(depth, "Assignment statement:")
+        stmt.expression.visit(self, depth + 1)
+
     def visit_print(self, stmt: Print, depth: int):
         self._print(depth, "Print statement:")
         stmt.expression.visit(self, depth + 1)
@@ -47,6 +54,55 @@ class ExpressionPrinter(object):
         stmt.condition.visit(self, depth + 1)
         stmt.body.visit(self, depth + 1)
 
+    def visit_for(self, stmt: For, depth: int):
+        self._print(depth, "For:")
+        if stmt.initializer is not None:
+            stmt.initializer.visit(self, depth + 1)
+        stmt.condition.visit(self, depth + 1)
+        if stmt.update is not None:
+            stmt.update.visit(self, depth + 1)
+        stmt.body.visit(self, depth + 1)
+
+    def visit_hoist(self, stmt: Hoist, depth: int):
+        self._print(depth, "Hoist:", *stmt.temporaries)
+        stmt.loop.visit(self, depth + 1)
+
+    def visit_lazy_block(self, stmt: LazyBlock, depth: int):
+        if stmt.body is None:
+            self._print(depth, "Lazy block:", len(stmt.tokens), "tokens")
+        else:
+            stmt.body.visit(self, depth)
+
+    def visit_function(self, stmt: Function, depth: int):
+        self._print(depth, "Function:", stmt.name, *stmt.parameters)
+        for child_stmt in stmt.body:
+            child_stmt.visit(self, depth + 1)
+
+    def visit_class(self, stmt: Class, depth: int):
+        self._print(depth, "Class:", stmt.name)
+        if stmt.superclass is not None:
+            stmt.superclass.visit(self, depth + 1)
+        for method in stmt.methods:
+            method.visit(self, depth + 1)
+
+    def visit_import(self, stmt: Import, depth: int):
+        self._print(depth, "Import:", stmt.path.literal)
+
+    def visit_return(self, stmt: Return, depth: int):
+        self._print(depth, "Return:")
+        if stmt.value is not None:
+            stmt.value.visit(self, depth + 1)
+
+    def visit_local_var(self, stmt: LocalVar, depth: int):
+        self._print(depth, "Local variable declaration:", stmt.name, stmt.slot)
+        if stmt.value is not None:
+            stmt.value.visit(self, depth + 1)
+
+    def visit_local_block(self, stmt: LocalBlock, depth: int):
+        self._print(depth, "Local block:")
+        for child_stmt in stmt.statements:
+            child_stmt.visit(self, depth + 1)
+
     def visit_back(self, stmt: Break, depth: int):
         self._print(depth, "Break")
 
@@ -59,14 +115,51 @@ class ExpressionPrinter(object):
         self._print(depth, "Assignment", expr.name)
         expr.value.visit(self, depth + 1)
 
+    def visit_invariant(self, expr: Invariant, depth: int):
+        self._print(depth, "Invariant", expr.name)
+        expr.expression.visit(self, depth + 1)
+
+    def visit_deep(self, expr: Deep, depth: int):
+        self._print(depth, "Deep expression")
+
     def visit_variable(self, expr: Variable, depth: int):
         self._print(depth, "Variable", expr.name)
 
+    def visit_local_variable(self, expr: LocalVariable, depth: int):
+        self._print(depth, "Local variable", expr.name, expr.slot)
+
+    def visit_local_assignment(self, expr: LocalAssignment, depth: int):
+        self._print(depth, "Local assignment", expr.name, expr.slot)
+        expr.value.visit(self, depth + 1)
+
+    def visit_increment(self, expr: Increment, depth: int):
+        self._print(depth, "Increment", expr.name, expr.amount)
+
+    def visit_local_increment(self, expr: LocalIncrement, depth: int):
+        self._print(depth, "Local increment", expr.name, expr.slot,
+                    expr.amount)
+
+    def visit_compare(self, expr: Compare, depth: int):
+        self._print(depth, "Compare:", expr.operator.type)
+        expr.left.visit(self, depth + 1)
+        expr.right.visit(self, depth + 1)
+
     def visit_binary(self, expr: Binary, depth: int):
         self._print(depth, "Binary expression:", expr.operator.type)
         expr.left.visit(self, depth + 1)
         expr.right.visit(self, depth + 1)
 
+    def visit_unchecked_binary(self, expr: Binary, depth: int):
+        self._print(depth, "Unchecked binary expression:", expr.operator.type)
+        expr.left.visit(self, depth + 1)
+        expr.right.visit(self, depth + 1)
+
+    def visit_guarded_binary(self, expr: Binary, depth: int):
+        self._print(depth, "Guarded binary expression:", expr.operator.type,
+                    expr.expected.__name__)
+        expr.left.visit(self, depth + 1)
+        expr.right.visit(self, depth + 1)
+
     def visit_grouping(self, expr: Grouping, depth: int):
         self._print(depth, "Grouping:")
         expr.expression.visit(self, depth + 1)
@@ -77,3 +170,65 @@ class ExpressionPrinter(object):
     def visit_unary(self, expr: Unary, depth: int):
         self._print(depth, "Unary:", expr.operator.type)
         expr.right.visit(self, depth + 1)
+
+    def visit_unchecked_unary(self, expr: Unary, depth: int):
+        self._print(depth, "Unchecked unary:", expr.operator.type)
+        expr.right.visit(self, depth + 1)
+
+    def visit_guarded_unary(self, expr: Unary, depth: int):
+        self._print(depth, "Guarded unary:", expr.operator.type,
+                    expr.expected.__name__)
+        expr.right.visit(self, depth + 1)
+
+    def visit_array(self, expr: Array, depth: int):
+        self._print(depth, "Array:")
+        for element in expr.elements:
+            element.visit(self, depth + 1)
+
+    def visit_index(self, expr: Index, depth: int):
+        self._print(depth, "Index:")
+        expr.array.visit(self, depth + 1)
+        expr.index.visit(self, depth + 1)
+
+    def visit_slice(self, expr: Slice, depth: int):
+        self._print(depth, "Slice:")
+        expr.array.visit(self, depth + 1)
+        for bound in (expr.start, expr.stop):
+            if bound is None:
+                self._print(depth + 1, "Open bound")
+            else:
+                bound.visit(self, depth + 1)
+
+    def visit_index_assignment(self, expr: IndexAssignment, depth: int):
+        self._print(depth, "Index assignment:")
+        expr.array.visit(self, depth + 1)
+        expr.index.visit(self, depth + 1)
+        expr.value.visit(self, depth + 1)
+
+    def visit_call(self, expr: Call, depth: int):
+        self._print(depth, "Call:")
+        self.print_call(expr, depth)
+
+    def visit_tail_call(self, expr: Call, depth: int):
+        self._print(depth, "Tail call:")
+        self.print_call(expr, depth)
+
+    def visit_property(self, expr: Property, depth: int):
+        self._print(depth, "Property", expr.name)
+        expr.object.visit(self, depth + 1)
+
+    def visit_property_assignment(self, expr: PropertyAssignment, depth: int):
+        self._print(depth, "Property assignment", expr.name)
+        expr.object.visit(self, depth + 1)
+        expr.value.visit(self, depth + 1)
+
+    def visit_this(self, expr: This, depth: int):
+        self._print(depth, "This")
+
+    def visit_super(self, expr: Super, depth: int):
+        self._print(depth, "Super", expr.method)
+
+    def print_call(self, expr: Call, depth: int):
+        expr.callee.visit(self, depth + 1)
+        for argument in expr.arguments:
+            argument.visit(self, depth + 1)
@@ -1,3 +1,6 @@
+from typing import List
+
+from PyLOX.classes import InlineCache
 from PyLOX.token import Token
 
 
@@ -66,3 +69,196 @@ class Logical(Expr):
 
     def visit(self, visitor, *args, **kwargs):
         return visitor.visit_logical(self, *args, **kwargs)
+
+
+class Invariant(Expr):
+    def __init__(self, name: Token, expression: Expr):
+        self.name = name
+        self.expression = expression
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_invariant(self, *args, **kwargs)
+
+
+class Deep(Expr):
+    def __init__(self, expression: Expr):
+        self.expression = expression
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_deep(self, *args, **kwargs)
+
+
+class Array(Expr):
+    def __init__(self, bracket: Token, elements: List[Expr]):
+        self.bracket = bracket
+        self.elements = elements
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_array(self, *args, **kwargs)
+
+
+class Index(Expr):
+    def __init__(self, array: Expr, bracket: Token, index: Expr):
+        self.array = array
+        self.bracket = bracket
+        self.index = index
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_index(self, *args, **kwargs)
+
+
+class Slice(Expr):
+    def __init__(self, array: Expr, bracket: Token, start: Expr, stop: Expr):
+        self.array = array
+        self.bracket = bracket
+        self.start = start
+        self.stop = stop
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_slice(self, *args, **kwargs)
+
+
+class IndexAssignment(Expr):
+    def __init__(self, array: Expr, bracket: Token, index: Expr, value: Expr):
+        self.array = array
+        self.bracket = bracket
+        self.index = index
+        self.value = value
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_index_assignment(self, *args, **kwargs)
+
+
+class Call(Expr):
+    def __init__(self, callee: Expr, paren: Token, arguments: List[Expr]):
+        self.callee = callee
+        self.paren = paren
+        self.arguments = arguments
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_call(self, *args, **kwargs)
+
+
+class LocalVariable(Expr):
+    def __init__(self, name: Token, slot: int):
+        self.name = name
+        self.slot = slot
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_local_variable(self, *args, **kwargs)
+
+
+class LocalAssignment(Expr):
+    def __init__(self, name: Token, slot: int, value: Expr):
+        self.name = name
+        self.slot = slot
+        self.value = value
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_local_assignment(self, *args, **kwargs)
+
+
+class Property(Expr):
+    def __init__(self, object: Expr, name: Token, cache: InlineCache):
+        self.object = object
+        self.name = name
+        self.cache = cache
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_property(self, *args, **kwargs)
+
+
+class PropertyAssignment(Expr):
+    def __init__(self, object: Expr, name: Token, value: Expr,
+                 cache: InlineCache):
+        self.object = object
+        self.name = name
+        self.value = value
+        self.cache = cache
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_property_assignment(self, *args, **kwargs)
+
+
+class This(Expr):
+    def __init__(self, keyword: Token):
+        self.keyword = keyword
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_this(self, *args, **kwargs)
+
+
+class Super(Expr):
+    def __init__(self, keyword: Token, method: Token):
+        self.keyword = keyword
+        self.method = method
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_super(self, *args, **kwargs)
+
+
+# variants produced by the type inference pass
+class UncheckedBinary(Binary):
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_unchecked_binary(self, *args, **kwargs)
+
+
+class UncheckedUnary(Unary):
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_unchecked_unary(self, *args, **kwargs)
+
+
+# variants produced from a recorded profile, the operator is applied without
+# checks when both operands have the expected type
+class GuardedBinary(Binary):
+    def __init__(self, left: Expr, operator: Token, right: Expr,
+                 expected: type):
+        super(GuardedBinary, self).__init__(left, operator, right)
+        self.expected = expected
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_guarded_binary(self, *args, **kwargs)
+
+
+class GuardedUnary(Unary):
+    def __init__(self, operator: Token, right: Expr, expected: type):
+        super(GuardedUnary, self).__init__(operator, right)
+        self.expected = expected
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_guarded_unary(self, *args, **kwargs)
+
+
+# calls in return statements, marked by the slot resolver
+class TailCall(Call):
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_tail_call(self, *args, **kwargs)
+
+
+# nodes of the fusion pass, they keep the fields of the nodes they replace so
+# other visitors can treat them as the unfused nodes
+class Increment(Assignment):
+    def __init__(self, name: Token, value: Expr, amount: float):
+        super(Increment, self).__init__(name, value)
+        self.amount = amount
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_increment(self, *args, **kwargs)
+
+
+class LocalIncrement(LocalAssignment):
+    def __init__(self, name: Token, slot: int, value: Expr, amount: float):
+        super(LocalIncrement, self).__init__(name, slot, value)
+        self.amount = amount
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_local_increment(self, *args, **kwargs)
+
+
+class Compare(Binary):
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_compare(self, *args, **kwargs)
+
+
+class UncheckedCompare(Compare, UncheckedBinary):
+    pass
@@ -0,0 +1,186 @@
+"""
+Scanning and parsing of sources
+large sources are split at top level statement boundaries, the chunks are
+scanned and parsed in a process pool and their statements are stitched back
+together in order
+a boundary is the start of a line that follows a ";" or "}" outside of
+strings, comments, braces and parentheses
+if any chunk is invalid the whole source is parsed sequentially again so
+errors are reported exactly as the sequential path reports them
+"""
+import io
+import os
+import re
+from typing import List, Optional, TextIO, Tuple
+
+from PyLOX.exceptions import PyLOXParserError, PyLOXRuntimeError
+from PyLOX.optimizer import optimize
+from PyLOX.parser import Parser
+from PyLOX.scanner import Scanner
+from PyLOX.statements import Stmt, Block, LazyBlock
+from PyLOX.token import Token, TokenType, newline_runs
+
+# sources smaller than this are not worth the process pool
+PARALLEL_SOURCE_SIZE = 1 << 20
+
+# characters that change the nesting state of the source
+significant = re.compile(r'"|//|/\*|\*/|[{}()]|[\r\n]+')
+# whitespace and line comments before a token
+blank = re.compile(r"(?:\s+|//[^\r\n]*)*")
+block_comment = re.compile(r"/\*|\*/")
+keyword_else = re.compile(r"else\b")
+
+
+def parse(source: str, jobs: Optional[int] = None, lazy: bool = False,
+          check: bool = False, stream: Optional[TextIO] = None) \
+        -> Optional[List[Stmt]]:
+    # returns None if the source is not valid, errors are already reported
+    # to the stream, standard output if it is None
+    jobs = jobs or os.cpu_count() or 1
+    if jobs > 1 and len(source) >= PARALLEL_SOURCE_SIZE:
+        return parse_parallel(source, jobs, lazy, check, stream)
+    return parse_sequential(source, 0, lazy, check, stream)
+
+
+def parse_lazy_block(stmt: LazyBlock) -> Block:
+    # parses and optimizes the body of a lazy block on its first execution
+    closing = stmt.tokens[-1]
+    end = Token(TokenType.EOF, "", None,
+                closing.offset + len(closing.lexeme), closing.lines)
+    parser = Parser(stmt.tokens + [end], lazy=True)
+    try:
+        block = parser.eager_block()
+    except PyLOXParserError as e:
+        print(e)
+        parser.valid = False
+    if not parser.valid:
+        raise PyLOXRuntimeError(stmt.brace, "block can not be parsed")
+    return optimize([block])[0]
+
+
+def parse_sequential(source: str, line: int = 0, lazy: bool = False,
+                     check: bool = False, stream: Optional[TextIO] = None) \
+        -> Optional[List[Stmt]]:
+    scanner = Scanner(source, line, stream)
+    tokens = scanner.scan_tokens()
+    if not scanner.valid:
+        # there was a problem with tokens
+        return None
+    parser = Parser(tokens, lazy, check, stream)
+    program = parser.parse()
+    if not parser.valid:
+        # there was a problem with parser
+        return None
+    return program
+
+
+def parse_chunk(chunk: Tuple[str, int, bool, bool]) -> Optional[List[Stmt]]:
+    # errors are reported by the sequential fallback
+    return parse_sequential(*chunk, stream=io.StringIO())
+
+
+def parse_parallel(source: str, jobs: Optional[int] = None, lazy: bool = False,
+                   check: bool = False, stream: Optional[TextIO] = None) \
+        -> Optional[List[Stmt]]:
+    # loading the process pool costs more than starting a small script
+    from concurrent.futures import ProcessPoolExecutor
+    jobs = jobs or os.cpu_count() or 1
+    points = split_points(source, 4 * jobs)
+    if not points:
+        return parse_sequential(source, 0, lazy, check, stream)
+    chunks = []
+    start = 0
+    previous = 0
+    line = 0
+    for point in points + [len(source)]:
+        line += len(newline_runs.findall(source, previous, start))
+        previous = start
+        chunks.append((source[start:point], line, lazy, check))
+        start = point
+    with ProcessPoolExecutor(jobs) as executor:
+        results = list(executor.map(parse_chunk, chunks))
+    if any(result is None for result in results):
+        return parse_sequential(source, 0, lazy, check, stream)
+    return [stmt for result in results for stmt in result]
+
+
+def split_points(source: str, count: int) -> List[int]:
+    # returns at most count - 1 offsets that are safe to split the source at
+    target = len(source) // count
+    points = []
+    depth = 0
+    comment_depth = 0
+    in_string = False
+    # offset of the line comment of the current line, its code ends there
+    comment = None
+    last_point = 0
+    index = 0
+    while len(points) < count - 1:
+        match = significant.search(source, index)
+        if match is None:
+            break
+        text = match.group()
+        index = match.end()
+        if in_string:
+            in_string = text != '"'
+        elif comment_depth > 0:
+            if text == "/*":
+                comment_depth += 1
+            elif text == "*/":
+                comment_depth -= 1
+        elif text == '"':
+            in_string = True
+        elif text == "//":
+            comment = match.start()
+            index = source.find("\n", index)
+            if index < 0:
+                break
+        elif text == "/*":
+            comment_depth += 1
+        elif text in "{(":
+            depth += 1
+        elif text in "})":
+            depth -= 1
+        else:
+            # a line ends
+            end = match.start() if comment is None else comment
+            comment = None
+            if depth == 0 and index - last_point >= target and \
+                    is_statement_end(source, end) and \
+                    not starts_else(source, index):
+                points.append(index)
+                last_point = index
+    return points
+
+
+def is_statement_end(source: str, index: int) -> bool:
+    # checks the last character before index that is not a whitespace
+    index -= 1
+    while index >= 0 and source[index] in " \t":
+        index -= 1
+    return index >= 0 and source[index] in ";}"
+
+
+def starts_else(source: str, index: int) -> bool:
+    # checks the first token after index, an else continues the if before it
+    while True:
+        match = blank.match(source, index)
+        index = match.end()
+        if source.startswith("/*", index):
+            index = comment_end(source, index)
+        else:
+            break
+    return keyword_else.match(source, index) is not None
+
+
+def comment_end(source: str, index: int) -> int:
+    # returns the offset after the block comment that starts at index
+    depth = 0
+    while True:
+        match = block_comment.search(source, index)
+        if match is None:
+            return len(source)
+        index = match.end()
+        depth += 1 if match.group() == "/*" else -1
+        if depth == 0:
+            return index
@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional, Tuple
+
+from PyLOX.environment import Environment
+from PyLOX.exceptions import PyLOXRuntimeError
+from PyLOX.statements import Function
+from PyLOX.token import Token
+
+
+# number of results a memoized function keeps
+MEMO_CACHE_SIZE = 1 << 12
+
+# arguments of these types are immutable, results are cached only for them
+MEMO_ARGUMENT_TYPES = (float, str, bool, type(None))
+
+# stands for a missing entry, nil is a valid result
+missing = object()
+
+
+class LRUCache(object):
+    def __init__(self, size: int = MEMO_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> object:
+        value = self.entries.get(key, missing)
+        if value is missing:
+            self.misses += 1
+        else:
+            self.hits += 1
+            try:
+                self.entries.move_to_end(key)
+            except KeyError:
+                # evicted by another thread
+                pass
+        return value
+
+    def put(self, key: Hashable, value: object) -> None:
+        self.entries[key] = value
+        try:
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        except KeyError:
+            pass
+
+    def statistics(self) -> str:
+        return "{hits} hits, {misses} misses, {entries} entries".format(
+            hits=self.hits, misses=self.misses, entries=len(self.entries))
+
+
+class NativeFunction(object):
+    # functions implemented in python, arguments of a declared type are
+    # checked before the call, functions that take the token of the call
+    # report their own errors, the value and arithmetic errors of the others
+    # are reported at the call
+    def __init__(self, name: str, arity: int, function: Callable[..., object],
+                 types: Optional[Tuple[Optional[type], ...]] = None,
+                 token: bool = True):
+        self.name = name
+        self.arity = arity
+        self.function = function
+        self.token = token
+        # positions and types of the checked arguments
+        self.checks = tuple((index, expected) for index, expected
+                            in enumerate(types or ()) if expected is not None)
+
+    def check(self, token: Token, arguments: List[object]) -> None:
+        for index, expected in self.checks:
+            if type(arguments[index]) is not expected:
+                raise PyLOXRuntimeError(token, "{name} was expecting "
+                                               "<{expected}> as argument "
+                                               "{position} instead received "
+                                               "<{given}>".format(
+                    name=self.name, expected=expected, position=index + 1,
+                    given=type(arguments[index])))
+
+    def call(self, token: Token, arguments: List[object]) -> object:
+        if self.checks:
+            self.check(token, arguments)
+        if self.token:
+            return self.function(token, *arguments)
+        return self.call_host(token, arguments)
+
+    def call_host(self, token: Token, arguments: List[object]) -> object:
+        try:
+            return self.function(*arguments)
+        except (ValueError, ArithmeticError) as e:
+            raise PyLOXRuntimeError(token, "{name}: {error}".format(
+                name=self.name, error=e))
+
+    def __str__(self):
+        return "<native fn {name}>".format(name=self.name)
+
+
+class LoxFunction(object):
+    # functions declared by programs, their closure is the environment they
+    # are declared in, initializers return the instance they are bound to
+    def __init__(self, declaration: Function, closure: Environment,
+                 initializer: bool = False):
+        self.declaration = declaration
+        self.closure = closure
+        self.initializer = initializer
+        self.name = declaration.name.lexeme
+        self.arity = len(declaration.parameters)
+        self.cache = LRUCache() if declaration.memo else None
+
+    def cache_key(self, arguments: List[object]) -> Optional[Tuple]:
+        # types are part of the key since 1 == true in python
+        if all(type(argument) in MEMO_ARGUMENT_TYPES for argument in arguments):
+            return tuple((type(argument), argument) for argument in arguments)
+        return None
+
+    def bind(self, instance: object) -> "LoxFunction":
+        # methods find this in the environment they close over
+        environment = Environment(self.closure)
+        environment.memory["this"] = instance
+        return LoxFunction(self.declaration, environment, self.initializer)
+
+    def __str__(self):
+        return "<fn {name}>".format(name=self.name)
@@ -0,0 +1,106 @@
+"""
+Fusion of common node sequences
+assignments of a variable to itself plus or minus a number are replaced with
+increments, which update a float where it is stored without visiting the
+variable, the literal and the operator
+comparisons of variables and literals in the conditions of loops and ifs are
+replaced with compare nodes that read their operands in place
+expression statements of a single assignment are replaced with assignment
+statements that run the assignment without dispatching on it
+values that are not floats take the path of the unfused nodes, so errors are
+raised with the same tokens and messages
+the pass runs after slot resolution, local variables are fused on their slot
+"""
+from typing import List, Optional
+
+from PyLOX.expressions import Expr, Binary, Literal, Variable, Assignment, \
+    LocalVariable, LocalAssignment, UncheckedBinary, Increment, \
+    LocalIncrement, Compare, UncheckedCompare
+from PyLOX.statements import Stmt, Expression, If, While, For, \
+    AssignmentStatement
+from PyLOX.token import TokenType
+from PyLOX.transformer import Transformer
+
+COMPARISONS = (TokenType.LESS, TokenType.LESS_EQUAL, TokenType.GREATER,
+               TokenType.GREATER_EQUAL)
+OPERANDS = (Variable, LocalVariable, Literal)
+ASSIGNMENTS = (Assignment, LocalAssignment, Increment, LocalIncrement)
+
+
+def step(expr: Expr) -> Optional[float]:
+    # the number a binary expression adds to its left operand
+    if type(expr) not in (Binary, UncheckedBinary) or \
+            type(expr.right) is not Literal or \
+            type(expr.right.value) is not float:
+        return None
+    if expr.operator.type == TokenType.PLUS:
+        return expr.right.value
+    if expr.operator.type == TokenType.MINUS:
+        return -expr.right.value
+    return None
+
+
+class Fusion(Transformer):
+    def __init__(self):
+        self.increments = 0
+        self.comparisons = 0
+        self.assignments = 0
+
+    def fuse(self, program: List[Stmt]) -> List[Stmt]:
+        return self.transform(program)
+
+    def statistics(self) -> str:
+        return "Fusion: fused {increments} increments, {comparisons} " \
+               "comparisons and {assignments} assignment statements".format(
+            increments=self.increments, comparisons=self.comparisons,
+            assignments=self.assignments)
+
+    def compare(self, expr: Expr) -> Expr:
+        if type(expr) not in (Binary, UncheckedBinary) or \
+                expr.operator.type not in COMPARISONS or \
+                type(expr.left) not in OPERANDS or \
+                type(expr.right) not in OPERANDS:
+            return expr
+        self.comparisons += 1
+        fused = UncheckedCompare if type(expr) is UncheckedBinary else Compare
+        return fused(expr.left, expr.operator, expr.right)
+
+    def visit_expression(self, stmt: Expression) -> Stmt:
+        stmt = super(Fusion, self).visit_expression(stmt)
+        if type(stmt.expression) not in ASSIGNMENTS:
+            return stmt
+        self.assignments += 1
+        return AssignmentStatement(stmt.expression)
+
+    def visit_if(self, stmt: If) -> Stmt:
+        stmt = super(Fusion, self).visit_if(stmt)
+        stmt.condition = self.compare(stmt.condition)
+        return stmt
+
+    def visit_while(self, stmt: While) -> Stmt:
+        stmt = super(Fusion, self).visit_while(stmt)
+        stmt.condition = self.compare(stmt.condition)
+        return stmt
+
+    def visit_for(self, stmt: For) -> Stmt:
+        stmt = super(Fusion, self).visit_for(stmt)
+        stmt.condition = self.compare(stmt.condition)
+        return stmt
+
+    def visit_assignment(self, expr: Assignment) -> Expr:
+        expr = super(Fusion, self).visit_assignment(expr)
+        amount = step(expr.value)
+        if amount is None or type(expr.value.left) is not Variable or \
+                expr.value.left.name.lexeme != expr.name.lexeme:
+            return expr
+        self.increments += 1
+        return Increment(expr.name, expr.value, amount)
+
+    def visit_local_assignment(self, expr: LocalAssignment) -> Expr:
+        expr = super(Fusion, self).visit_local_assignment(expr)
+        amount = step(expr.value)
+        if amount is None or type(expr.value.left) is not LocalVariable or \
+                expr.value.left.slot != expr.slot:
+            return expr
+        self.increments += 1
+        return LocalIncrement(expr.name, expr.slot, expr.value, amount)
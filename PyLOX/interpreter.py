@@ -1,13 +1,28 @@
+import operator as operators
+import os
+from collections import ChainMap
 from functools import partial, wraps
-from typing import List
+from typing import List, Optional, Tuple
 
-from PyLOX.environment import Environment
+from PyLOX.classes import LoxClass, LoxInstance
+from PyLOX.environment import Environment, FrozenEnvironment, \
+    ImportedEnvironment, Overlay
 from PyLOX.exceptions import PyLOXRuntimeError
-from PyLOX.expressions import Binary, Grouping, Literal, Unary, \
-    Variable, Assignment, Logical
+from PyLOX.front_end import parse_lazy_block
+from PyLOX.expressions import Expr, Binary, Grouping, Literal, Unary, \
+    Variable, Assignment, Logical, Invariant, Deep, Array, Index, Slice, \
+    IndexAssignment, Call, LocalVariable, LocalAssignment, UncheckedBinary, \
+    UncheckedUnary, TailCall, Property, PropertyAssignment, This, Super, \
+    GuardedBinary, GuardedUnary, Increment, LocalIncrement, Compare
+from PyLOX.functions import NativeFunction, LoxFunction, missing
+from PyLOX.modules import module_path, compile_module
+from PyLOX.natives import natives
+from PyLOX.numeric_array import NumericArray
 from PyLOX.statements import Stmt, Var, Print, Expression, Block, If, While, \
-    Break
+    Break, For, Hoist, LazyBlock, Function, Return, LocalVar, LocalBlock, \
+    Class, AssignmentStatement, Import
 from PyLOX.token import TokenType, Token
+from PyLOX.transformer import declares_functions
 
 
 def format_type(types):
@@ -15,9 +30,11 @@ def format_type(types):
                                                   types)))
 
 
-def type_check(fn=None, *, types=(float,)):
+def type_check(fn=None, *, types=(float,), elementwise=False):
+    # elementwise operators are applied to every element if any of their
+    # operands is an array
     if fn is None:
-        return partial(type_check, types=types)
+        return partial(type_check, types=types, elementwise=elementwise)
 
     expected_type_message = format_type(types)
 
@@ -25,6 +42,9 @@ def type_check(fn=None, *, types=(float,)):
     def wrapped(self, operator, *args):
         for expected_type, arg in zip(types, args):
             if type(arg) != expected_type:
+                if elementwise and any(isinstance(arg, NumericArray)
+                                       for arg in args):
+                    return self.elementwise(operator, *args)
                 received_type_message = format_type(type(arg) for arg in args)
                 raise PyLOXRuntimeError(operator, "{operator} was expecting "
                                                   "{expected} instead received "
@@ -38,13 +58,106 @@ def type_check(fn=None, *, types=(float,)):
 
 
 class Interpreter(object):
-    def __init__(self, stream):
-        self.environment = Environment()
+    # statistics are printed after every run, not only verbose ones
+    reports_statistics = False
+
+    def __init__(self, stream, globals=None):
+        # forks pass the frozen globals they share
+        self.environment = Environment() if globals is None else globals
+        self.globals = self.environment
+        # writes of a forked interpreter to the frozen globals it shares
+        self.overlay = None
         self.stream = stream
+        # slots of the running function
+        self.frame = None
+        # return statements set these instead of raising, statement
+        # sequences stop when returning is set
+        self.returning = False
+        self.return_value = None
+        self.tail_call = None
+        # functions with result caches by their declaration, for their
+        # statistics, a declaration that runs again replaces its function
+        self.memoized = {}
+        # environments of the imported modules by path, None while a module
+        # runs, and the directory relative imports are resolved from
+        self.modules = {}
+        self.directory = None
+        # environments of the modules frozen with the globals
+        self.frozen_modules = []
+        self.binary_operators = {
+            TokenType.MINUS: self.subtraction,
+            TokenType.PLUS: self.addition,
+            TokenType.SLASH: self.division,
+            TokenType.STAR: self.multiplication,
+            TokenType.GREATER_EQUAL: self.greater_equal,
+            TokenType.GREATER: self.greater,
+            TokenType.LESS_EQUAL: self.less_equal,
+            TokenType.LESS: self.less,
+            TokenType.EQUAL_EQUAL: self.equal,
+            TokenType.BANG_EQUAL: self.not_equal,
+        }
+        self.unary_operators = {
+            TokenType.MINUS: self.unary_minus,
+            TokenType.BANG: self.binary_negation,
+        }
+        # operators for sites whose operand types are proven statically
+        self.unchecked_binary_operators = {
+            TokenType.MINUS: operators.sub,
+            TokenType.PLUS: operators.add,
+            TokenType.SLASH: operators.truediv,
+            TokenType.STAR: operators.mul,
+            TokenType.GREATER_EQUAL: operators.ge,
+            TokenType.GREATER: operators.gt,
+            TokenType.LESS_EQUAL: operators.le,
+            TokenType.LESS: operators.lt,
+        }
+        self.unchecked_unary_operators = {
+            TokenType.MINUS: operators.neg,
+            TokenType.BANG: lambda inner: not self.is_true(inner),
+        }
+        if globals is None:
+            for function in natives():
+                self.environment.memory[function.name] = function
 
     def interpret(self, expr: Stmt):
+        globals = self.globals
+        if globals.overlay is not self.overlay:
+            # the frozen globals see the writes of the running interpreter
+            globals.overlay = self.overlay
+            for module in self.frozen_modules:
+                module.overlay = None if self.overlay is None else \
+                    self.overlay.layer(module)
         return expr.visit(self)
 
+    def freeze(self) -> None:
+        # the globals become a shared layer in place since the functions of
+        # the interpreter close over them, the interpreter keeps writing to
+        # them through an overlay of its own like its forks
+        # importers share the bindings of the modules, so they are frozen too
+        self.globals.freeze()
+        self.frozen_modules = [module for module in self.modules.values()
+                               if type(module) is Environment]
+        for module in self.frozen_modules:
+            module.freeze()
+        self.overlay = Overlay()
+
+    def fork(self, stream=None, interpreter_class=None) -> "Interpreter":
+        # the globals are frozen on the first fork, forks share them and keep
+        # their own writes and copies of the arrays and instances they use,
+        # a fork starts with a copy of the writes of its parent
+        if type(self.globals) is not FrozenEnvironment:
+            self.freeze()
+        child = (interpreter_class or type(self))(
+            self.stream if stream is None else stream, self.globals)
+        child.overlay = Overlay() if self.overlay is None else \
+            self.overlay.fork()
+        # functions and modules of the fork are added to maps of its own
+        child.memoized = ChainMap({}, self.memoized)
+        child.modules = ChainMap({}, self.modules)
+        child.frozen_modules = self.frozen_modules
+        child.directory = self.directory
+        return child
+
     # main logic
     def visit_var(self, stmt: Var) -> None:
         name = stmt.name
@@ -57,17 +170,138 @@ class Interpreter(object):
     def visit_block(self, stmt: Block) -> None:
         self.execute_block(stmt.statements, Environment(self.environment))
 
+    def visit_lazy_block(self, stmt: LazyBlock) -> None:
+        self.visit_block(self.lazy_body(stmt))
+
+    def lazy_body(self, stmt: LazyBlock) -> Block:
+        body = stmt.body
+        if body is None:
+            # threads that enter the block at once parse equal bodies, the
+            # one stored last is kept
+            body = stmt.body = parse_lazy_block(stmt)
+        return body
+
     def execute_block(self, stmts: List[Stmt], environment: Environment) -> None:
         old_environment = self.environment
         self.environment = environment
         try:
             for stmt in stmts:
-                self.interpret(stmt)
+                stmt.visit(self)
+                if self.returning:
+                    return
         finally:
             self.environment = old_environment
 
+    def visit_local_block(self, stmt: LocalBlock) -> None:
+        for child in stmt.statements:
+            child.visit(self)
+            if self.returning:
+                return
+
+    def visit_local_var(self, stmt: LocalVar) -> None:
+        if stmt.value is None:
+            self.frame[stmt.slot] = None
+        else:
+            self.frame[stmt.slot] = stmt.value.visit(self)
+
+    def visit_function(self, stmt: Function) -> None:
+        function = LoxFunction(stmt, self.environment)
+        if function.cache is not None:
+            self.memoized[stmt] = function
+        self.environment.define(stmt.name, function)
+
+    def visit_class(self, stmt: Class) -> None:
+        superclass = None
+        if stmt.superclass is not None:
+            superclass = stmt.superclass.visit(self)
+            if not isinstance(superclass, LoxClass):
+                raise PyLOXRuntimeError(stmt.name, "superclass of {name} must "
+                                                   "be a class".format(
+                    name=stmt.name.lexeme))
+        self.environment.define(stmt.name, None)
+        closure = self.environment
+        if superclass is not None:
+            # methods find the superclass in the environment they close over
+            closure = Environment(closure)
+            closure.memory["super"] = superclass
+        methods = {method.name.lexeme: LoxFunction(method, closure,
+                                                   method.name.lexeme == "init")
+                   for method in stmt.methods}
+        klass = LoxClass(stmt.name.lexeme, superclass, methods)
+        self.environment.assign(stmt.name, klass)
+
+    def visit_return(self, stmt: Return) -> None:
+        value = stmt.value
+        if type(value) is TailCall:
+            callee, arguments = self.evaluate_call(value)
+            if isinstance(callee, LoxFunction):
+                # the caller runs it after this frame is dropped
+                self.tail_call = (callee, arguments)
+                self.returning = True
+                return
+            self.return_value = self.call_value(callee, arguments, value.paren)
+        elif value is None:
+            self.return_value = None
+        else:
+            self.return_value = value.visit(self)
+        self.returning = True
+
+    def visit_import(self, stmt: Import) -> None:
+        path = module_path(stmt.path.literal, self.directory)
+        module = self.modules.get(path, missing)
+        if module is None:
+            raise PyLOXRuntimeError(stmt.path, "module {path} is imported "
+                                               "while it runs".format(
+                path=path))
+        if module is missing:
+            module = self.run_module(stmt, path)
+        # names of the module are resolved through its environment, a fork
+        # keeps its imports in its overlay
+        environment = self.environment
+        if type(environment) is FrozenEnvironment:
+            overlay = environment.writable(stmt.keyword)
+            if overlay.imports is None:
+                overlay.imports = ImportedEnvironment(environment.parent)
+            overlay.imports.add(module)
+        else:
+            if type(environment.parent) is not ImportedEnvironment:
+                environment.parent = ImportedEnvironment(environment.parent)
+            environment.parent.add(module)
+
+    def run_module(self, stmt: Import, path: str) -> Environment:
+        try:
+            program = compile_module(path)
+        except OSError as e:
+            raise PyLOXRuntimeError(stmt.path, "module {path} can not be "
+                                               "read: {error}".format(
+                path=path, error=e.strerror))
+        if program is None:
+            raise PyLOXRuntimeError(stmt.path, "module {path} can not be "
+                                               "parsed".format(path=path))
+        # modules see the native functions but not the globals of the
+        # importer, only the names they define are exported
+        natives = Environment()
+        natives.memory.update(
+            (name, value) for name, value in self.globals.memory.items()
+            if type(value) is NativeFunction)
+        environment = Environment(natives)
+        directory = self.directory
+        self.directory = os.path.dirname(path)
+        self.modules[path] = None
+        try:
+            self.execute_block(program, environment)
+        except PyLOXRuntimeError:
+            del self.modules[path]
+            raise
+        finally:
+            self.directory = directory
+        self.modules[path] = environment
+        return environment
+
     def visit_print(self, stmt: Print) -> None:
-        value = stmt.expression.visit(self)
+        self.print_value(stmt.expression.visit(self))
+
+    def print_value(self, value: object) -> None:
         if value is None:
             print("nil", file=self.stream)
         else:
@@ -80,6 +314,26 @@ class Interpreter(object):
     def visit_expression(self, stmt: Expression) -> object:
         return stmt.expression.visit(self)
 
+    def visit_assignment_statement(self, stmt: AssignmentStatement) -> object:
+        # the assignment is run in place, increments of other values than
+        # floats are visited
+        expr = stmt.expression
+        kind = type(expr)
+        if kind is LocalAssignment:
+            value = self.frame[expr.slot] = expr.value.visit(self)
+            return value
+        if kind is Assignment:
+            value = expr.value.visit(self)
+            self.environment.assign(expr.name, value)
+            return value
+        if kind is LocalIncrement:
+            frame = self.frame
+            value = frame[expr.slot]
+            if type(value) is float:
+                value = frame[expr.slot] = value + expr.amount
+                return value
+        return expr.visit(self)
+
     def visit_if(self, stmt: If) -> object:
         if self.is_true(stmt.condition.visit(self)):
             return stmt.then_statement.visit(self)
@@ -96,8 +350,84 @@ class Interpreter(object):
                 if e.token != TokenType.BREAK:
                     raise e
                 break
+            if self.returning:
+                break
         return result
 
+    def visit_for(self, stmt: For) -> None:
+        # the loop variable lives in a single frame for the whole loop
+        old_environment = self.environment
+        self.environment = Environment(old_environment)
+        try:
+            if stmt.initializer is not None:
+                stmt.initializer.visit(self)
+            self.execute_loop(stmt)
+        finally:
+            self.environment = old_environment
+
+    def loop_frame(self, stmt: For) \
+            -> Tuple[List[Stmt], Optional[Environment], bool]:
+        # returns the statements of the body, the frame they run in and
+        # whether every iteration needs a new one
+        body = stmt.body
+        if isinstance(body, LazyBlock):
+            body = self.lazy_body(body)
+        # closures keep the environment of the iteration that created them so
+        # bodies declaring functions get a new one in every iteration
+        fresh = False
+        if isinstance(body, LocalBlock):
+            # locals of a function body live in the slots of its frame
+            statements = body.statements
+            frame = None
+        elif isinstance(body, Block):
+            statements = body.statements
+            fresh = declares_functions(body)
+            if not fresh and any(isinstance(child, Var) for child in statements):
+                # a single frame is cleared and reused by every iteration
+                frame = Environment(self.environment)
+            else:
+                # nothing to shadow, run the body in the loop frame
+                frame = None
+        else:
+            statements = [body]
+            frame = None
+        return statements, frame, fresh
+
+    def execute_loop(self, stmt: For) -> None:
+        statements, frame, fresh = self.loop_frame(stmt)
+        while self.is_true(stmt.condition.visit(self)):
+            try:
+                if fresh:
+                    self.execute_block(statements, Environment(self.environment))
+                elif frame is None:
+                    for child in statements:
+                        child.visit(self)
+                        if self.returning:
+                            break
+                else:
+                    frame.memory.clear()
+                    self.execute_block(statements, frame)
+            except PyLOXRuntimeError as e:
+                if e.token != TokenType.BREAK:
+                    raise e
+                break
+            if self.returning:
+                break
+            if stmt.update is not None:
+                stmt.update.visit(self)
+
+    def visit_hoist(self, stmt: Hoist) -> object:
+        # temporaries are nil until they are computed inside the loop
+        environment = Environment(self.environment)
+        for temporary in stmt.temporaries:
+            environment.define(temporary, None)
+        old_environment = self.environment
+        self.environment = environment
+        try:
+            return stmt.loop.visit(self)
+        finally:
+            self.environment = old_environment
+
     def visit_break(self, stmt: Break):
         raise PyLOXRuntimeError(stmt.token, "break statement seen outside of "
                                             "a loop")
@@ -110,6 +440,41 @@ class Interpreter(object):
         self.environment.assign(expr.name, value)
         return value
 
+    def visit_increment(self, expr: Increment) -> object:
+        # a float is updated in the memory it is stored in, other values are
+        # assigned like the unfused expression so errors are the same
+        name = expr.name.lexeme
+        memory = self.environment.resolve(name)
+        if memory is not None:
+            value = memory[name]
+            if type(value) is float:
+                value = memory[name] = value + expr.amount
+                return value
+        return self.visit_assignment(expr)
+
+    def visit_local_variable(self, expr: LocalVariable) -> object:
+        return self.frame[expr.slot]
+
+    def visit_local_assignment(self, expr: LocalAssignment) -> object:
+        value = expr.value.visit(self)
+        self.frame[expr.slot] = value
+        return value
+
+    def visit_local_increment(self, expr: LocalIncrement) -> object:
+        frame = self.frame
+        value = frame[expr.slot]
+        if type(value) is float:
+            value = frame[expr.slot] = value + expr.amount
+            return value
+        return self.visit_local_assignment(expr)
+
+    def visit_invariant(self, expr: Invariant) -> object:
+        value = self.environment[expr.name]
+        if value is None:
+            value = expr.expression.visit(self)
+            self.environment.assign(expr.name, value)
+        return value
+
     def visit_logical(self, expr: Logical) -> object:
         l_value = expr.left.visit(self)
         if expr.operator == TokenType.OR:
@@ -122,24 +487,249 @@ class Interpreter(object):
             return expr.right.visit(self)
 
     def visit_binary(self, expr: Binary) -> object:
-        operators = {
-            TokenType.MINUS: self.subtraction,
-            TokenType.PLUS: self.addition,
-            TokenType.SLASH: self.division,
-            TokenType.STAR: self.multiplication,
-            TokenType.GREATER_EQUAL: self.greater_equal,
-            TokenType.GREATER: self.greater,
-            TokenType.LESS_EQUAL: self.less_equal,
-            TokenType.LESS: self.less,
-            TokenType.EQUAL_EQUAL: self.equal,
-            TokenType.BANG_EQUAL: self.not_equal,
+        op = self.binary_operators.get(expr.operator.type, self.not_implemented)
+        lhs = expr.left.visit(self)
+        rhs = expr.right.visit(self)
+        return op(expr.operator, lhs, rhs)
 
-        }
-        op = operators.get(expr.operator, self.not_implemented)
+    def visit_unchecked_binary(self, expr: UncheckedBinary) -> object:
         lhs = expr.left.visit(self)
         rhs = expr.right.visit(self)
+        if rhs == 0 and expr.operator.type == TokenType.SLASH:
+            raise PyLOXRuntimeError(expr.operator, "Zero division error")
+        return self.unchecked_binary_operators[expr.operator.type](lhs, rhs)
+
+    def visit_guarded_binary(self, expr: GuardedBinary) -> object:
+        lhs = expr.left.visit(self)
+        rhs = expr.right.visit(self)
+        expected = expr.expected
+        if type(lhs) is expected and type(rhs) is expected:
+            if rhs == 0 and expr.operator.type == TokenType.SLASH:
+                raise PyLOXRuntimeError(expr.operator, "Zero division error")
+            return self.unchecked_binary_operators[expr.operator.type](lhs, rhs)
+        op = self.binary_operators.get(expr.operator.type, self.not_implemented)
         return op(expr.operator, lhs, rhs)
 
+    def visit_compare(self, expr: Compare) -> object:
+        # variables and literals are read without visiting them
+        left = expr.left
+        kind = type(left)
+        if kind is LocalVariable:
+            lhs = self.frame[left.slot]
+        elif kind is Literal:
+            lhs = left.value
+        elif kind is Variable:
+            lhs = self.environment[left.name]
+        else:
+            lhs = left.visit(self)
+        right = expr.right
+        kind = type(right)
+        if kind is LocalVariable:
+            rhs = self.frame[right.slot]
+        elif kind is Literal:
+            rhs = right.value
+        elif kind is Variable:
+            rhs = self.environment[right.name]
+        else:
+            rhs = right.visit(self)
+        if type(lhs) is float and type(rhs) is float:
+            return self.unchecked_binary_operators[expr.operator.type](lhs, rhs)
+        return self.binary_operators[expr.operator.type](expr.operator, lhs,
+                                                          rhs)
+
+    def visit_array(self, expr: Array) -> NumericArray:
+        elements = [element.visit(self) for element in expr.elements]
+        for element in elements:
+            if type(element) != float:
+                raise PyLOXRuntimeError(expr.bracket, "array elements must be "
+                                                      "numbers instead found "
+                                                      "{type}".format(
+                    type=type(element)))
+        return NumericArray.from_values(elements)
+
+    def visit_index(self, expr: Index) -> float:
+        array = expr.array.visit(self)
+        index = expr.index.visit(self)
+        return array[self.array_index(expr.bracket, array, index)]
+
+    def visit_slice(self, expr: Slice) -> NumericArray:
+        array = expr.array.visit(self)
+        start = 0.0 if expr.start is None else expr.start.visit(self)
+        start = self.array_index(expr.bracket, array, start, check_range=False)
+        if expr.stop is None:
+            stop = len(array)
+        else:
+            stop = self.array_index(expr.bracket, array, expr.stop.visit(self),
+                                    check_range=False)
+        return array.slice(start, stop)
+
+    def visit_index_assignment(self, expr: IndexAssignment) -> float:
+        array = expr.array.visit(self)
+        index = expr.index.visit(self)
+        value = expr.value.visit(self)
+        index = self.array_index(expr.bracket, array, index)
+        if type(value) != float:
+            raise PyLOXRuntimeError(expr.bracket, "array elements must be "
+                                                  "numbers instead found "
+                                                  "{type}".format(
+                type=type(value)))
+        array[index] = value
+        return value
+
+    def visit_call(self, expr: Call) -> object:
+        callee = expr.callee.visit(self)
+        arguments = [argument.visit(self) for argument in expr.arguments]
+        if type(callee) is NativeFunction and len(arguments) == callee.arity:
+            # natives are called in place, only declared types are checked
+            if callee.checks:
+                callee.check(expr.paren, arguments)
+            if callee.token:
+                return callee.function(expr.paren, *arguments)
+            return callee.call_host(expr.paren, arguments)
+        self.check_call(expr, callee, arguments)
+        return self.call_value(callee, arguments, expr.paren)
+
+    def visit_tail_call(self, expr: TailCall) -> object:
+        return self.visit_call(expr)
+
+    def evaluate_call(self, expr: Call) -> Tuple[object, List[object]]:
+        callee = expr.callee.visit(self)
+        arguments = [argument.visit(self) for argument in expr.arguments]
+        self.check_call(expr, callee, arguments)
+        return callee, arguments
+
+    def check_call(self, expr: Call, callee: object,
+                   arguments: List[object]) -> None:
+        if not isinstance(callee, (NativeFunction, LoxFunction, LoxClass)):
+            raise PyLOXRuntimeError(expr.paren, "only functions and classes can "
+                                                "be called")
+        if len(arguments) != callee.arity:
+            raise PyLOXRuntimeError(expr.paren, "{name} was expecting {arity} "
+                                                "arguments instead received "
+                                                "{count}".format(
+                name=callee.name, arity=callee.arity, count=len(arguments)))
+
+    def call_value(self, callee: object, arguments: List[object],
+                   token: Token) -> object:
+        if isinstance(callee, LoxFunction):
+            return self.call(callee, arguments, token)
+        if isinstance(callee, LoxClass):
+            return self.instantiate(callee, arguments, token)
+        return callee.call(token, arguments)
+
+    def instantiate(self, klass: LoxClass, arguments: List[object],
+                    token: Token) -> LoxInstance:
+        instance = LoxInstance(klass.shape)
+        initializer = klass.find_method("init")
+        if initializer is not None:
+            self.call(initializer.bind(instance), arguments, token)
+        return instance
+
+    def call(self, function: LoxFunction, arguments: List[object],
+             token: Token) -> object:
+        # tail calls replace the running function instead of nesting, the
+        # result is cached for every memoized function of the chain
+        old_frame = self.frame
+        old_environment = self.environment
+        pending = []
+        try:
+            while True:
+                if function.cache is not None:
+                    key = function.cache_key(arguments)
+                    if key is not None:
+                        value = function.cache.get(key)
+                        if value is not missing:
+                            break
+                        pending.append((function.cache, key))
+                declaration = function.declaration
+                self.frame = arguments + [None] * (declaration.size -
+                                                   len(arguments))
+                self.environment = function.closure
+                for stmt in declaration.body:
+                    stmt.visit(self)
+                    if self.returning:
+                        break
+                value, tail_call = self.return_value, self.tail_call
+                self.returning = False
+                self.return_value = None
+                self.tail_call = None
+                if tail_call is None:
+                    break
+                function, arguments = tail_call
+        except RecursionError:
+            raise PyLOXRuntimeError(token, "stack overflow")
+        finally:
+            self.frame = old_frame
+            self.environment = old_environment
+        for cache, key in pending:
+            cache.put(key, value)
+        if function.initializer:
+            return function.closure.memory["this"]
+        return value
+
+    def statistics(self) -> List[str]:
+        return ["Memo cache of {name}: {statistics}".format(
+            name=function.name, statistics=function.cache.statistics())
+            for function in self.memoized.values()]
+
+    def visit_property(self, expr: Property) -> object:
+        instance = expr.object.visit(self)
+        if not isinstance(instance, LoxInstance):
+            raise PyLOXRuntimeError(expr.name, "only instances have properties, "
+                                               "found {type}".format(
+                type=type(instance)))
+        shape, slot, method = expr.cache.entry
+        if instance.shape is not shape:
+            # fields shadow methods, both are fixed for a shape
+            shape = instance.shape
+            slot = shape.slots.get(expr.name.lexeme)
+            method = None
+            if slot is None:
+                method = shape.klass.find_method(expr.name.lexeme)
+                if method is None:
+                    raise PyLOXRuntimeError(expr.name, "undefined property "
+                                                       "{name}".format(
+                        name=expr.name.lexeme))
+            expr.cache.entry = (shape, slot, method)
+        if slot is not None:
+            return instance.fields[slot]
+        return method.bind(instance)
+
+    def visit_property_assignment(self, expr: PropertyAssignment) -> object:
+        instance = expr.object.visit(self)
+        if not isinstance(instance, LoxInstance):
+            raise PyLOXRuntimeError(expr.name, "only instances have fields, "
+                                               "found {type}".format(
+                type=type(instance)))
+        value = expr.value.visit(self)
+        shape, slot, transition = expr.cache.entry
+        if instance.shape is not shape:
+            shape = instance.shape
+            slot = shape.slots.get(expr.name.lexeme)
+            # new fields are appended to the field list
+            transition = shape.add(expr.name.lexeme) if slot is None else None
+            expr.cache.entry = (shape, slot, transition)
+        if transition is not None:
+            instance.fields.append(value)
+            instance.shape = transition
+        else:
+            instance.fields[slot] = value
+        return value
+
+    def visit_this(self, expr: This) -> object:
+        return self.environment[expr.keyword]
+
+    def visit_super(self, expr: Super) -> object:
+        superclass = self.environment[expr.keyword]
+        this = Token(TokenType.THIS, "this", None, expr.keyword.offset,
+                     expr.keyword.lines)
+        method = superclass.find_method(expr.method.lexeme)
+        if method is None:
+            raise PyLOXRuntimeError(expr.method, "undefined property "
+                                                 "{name}".format(
+                name=expr.method.lexeme))
+        return method.bind(self.environment[this])
+
     def visit_grouping(self, expr: Grouping) -> object:
         return expr.expression.visit(self)
 
@@ -147,22 +737,132 @@ class Interpreter(object):
         return expr.value
 
     def visit_unary(self, expr: Unary) -> object:
-        operators = {
-            TokenType.MINUS: self.unary_minus,
-            TokenType.BANG: self.binary_negation,
-        }
+        op = self.unary_operators.get(expr.operator.type, self.not_implemented)
+        inner = expr.right.visit(self)
+        return op(expr.operator, inner)
 
-        op = operators.get(expr.operator, self.not_implemented)
+    def visit_unchecked_unary(self, expr: UncheckedUnary) -> object:
+        inner = expr.right.visit(self)
+        return self.unchecked_unary_operators[expr.operator.type](inner)
 
+    def visit_guarded_unary(self, expr: GuardedUnary) -> object:
         inner = expr.right.visit(self)
+        if type(inner) is expr.expected:
+            return self.unchecked_unary_operators[expr.operator.type](inner)
+        op = self.unary_operators.get(expr.operator.type, self.not_implemented)
         return op(expr.operator, inner)
 
+    def visit_deep(self, expr: Deep) -> object:
+        # evaluates deeply nested expressions with an explicit stack instead
+        # of recursion, tasks are (apply, node) pairs and operands of a node
+        # are applied after they are evaluated
+        values = []
+        tasks = [(False, expr.expression)]
+        while tasks:
+            apply, node = tasks.pop()
+            if apply:
+                self.apply_deep(node, values, tasks)
+            elif isinstance(node, Literal):
+                values.append(node.value)
+            elif isinstance(node, Variable):
+                values.append(self.environment[node.name])
+            elif isinstance(node, LocalVariable):
+                values.append(self.frame[node.slot])
+            elif isinstance(node, (Grouping, Deep)):
+                tasks.append((False, node.expression))
+            elif isinstance(node, (Binary, Logical)):
+                tasks.append((True, node))
+                if isinstance(node, Binary):
+                    tasks.append((False, node.right))
+                tasks.append((False, node.left))
+            elif isinstance(node, Unary):
+                tasks.append((True, node))
+                tasks.append((False, node.right))
+            elif isinstance(node, (Assignment, LocalAssignment)):
+                tasks.append((True, node))
+                tasks.append((False, node.value))
+            elif isinstance(node, Invariant):
+                value = self.environment[node.name]
+                if value is None:
+                    tasks.append((True, node))
+                    tasks.append((False, node.expression))
+                else:
+                    values.append(value)
+            else:
+                values.append(node.visit(self))
+        return values.pop()
+
+    def apply_deep(self, node: Expr, values: List[object],
+                   tasks: List[Tuple[bool, Expr]]) -> None:
+        if isinstance(node, Logical):
+            # left value is on top of the stack, right one is evaluated only
+            # if it is not short circuited
+            if self.is_true(values[-1]) != (node.operator.type == TokenType.OR):
+                values.pop()
+                tasks.append((False, node.right))
+        elif isinstance(node, (Assignment, Invariant)):
+            self.environment.assign(node.name, values[-1])
+        elif isinstance(node, LocalAssignment):
+            self.frame[node.slot] = values[-1]
+        elif isinstance(node, Binary):
+            rhs = values.pop()
+            lhs = values.pop()
+            operator = node.operator
+            if isinstance(node, UncheckedBinary):
+                if rhs == 0 and operator.type == TokenType.SLASH:
+                    raise PyLOXRuntimeError(operator, "Zero division error")
+                op = self.unchecked_binary_operators[operator.type]
+                values.append(op(lhs, rhs))
+            else:
+                op = self.binary_operators.get(operator.type,
+                                               self.not_implemented)
+                values.append(op(operator, lhs, rhs))
+        elif isinstance(node, UncheckedUnary):
+            op = self.unchecked_unary_operators[node.operator.type]
+            values.append(op(values.pop()))
+        elif isinstance(node, Unary):
+            op = self.unary_operators.get(node.operator.type,
+                                          self.not_implemented)
+            values.append(op(node.operator, values.pop()))
+
     # helper functions
     def is_true(self, value: object) -> bool:
         if value is None or value is False:
             return False
         return True
 
+    def array_index(self, token: Token, array: object, index: object,
+                    check_range: bool = True) -> int:
+        if not isinstance(array, NumericArray):
+            raise PyLOXRuntimeError(token, "only arrays can be indexed, found "
+                                           "{type}".format(type=type(array)))
+        if type(index) != float or not index.is_integer():
+            raise PyLOXRuntimeError(token, "array index must be an integer "
+                                           "instead found {index}".format(
+                index=index))
+        if check_range and not 0 <= index < len(array):
+            raise PyLOXRuntimeError(token, "array index {index} is out of "
+                                           "range".format(index=index))
+        # slice bounds are clamped
+        return min(max(int(index), 0), len(array))
+
+    def elementwise(self, operator: Token, lhs: object, rhs: object) -> object:
+        for value in (lhs, rhs):
+            if not isinstance(value, (float, NumericArray)):
+                raise PyLOXRuntimeError(operator, "{operator} was expecting "
+                                                  "arrays or numbers instead "
+                                                  "found ({lhs}, {rhs})".format(
+                    operator=operator.type, lhs=type(lhs), rhs=type(rhs)))
+        try:
+            return NumericArray.apply(self.unchecked_binary_operators[
+                                          operator.type], lhs, rhs)
+        except ZeroDivisionError:
+            raise PyLOXRuntimeError(operator, "Zero division error")
+        except ValueError:
+            raise PyLOXRuntimeError(operator, "arrays of different lengths "
+                                              "({lhs}, {rhs})".format(
+                lhs=len(lhs), rhs=len(rhs)))
+
     def not_implemented(self, operator, *args) -> None:
         raise PyLOXRuntimeError(operator, "unary operator {operator} is not "
                                           "implemented".format(operator=operator))
@@ -177,7 +877,7 @@ class Interpreter(object):
         return not self.is_true(inner)
 
     # binary functions
-    @type_check(types=[float, float])
+    @type_check(types=[float, float], elementwise=True)
     def subtraction(self, operator: Token, lhs: float, rhs: float) -> float:
         return lhs - rhs
 
@@ -186,35 +886,37 @@ class Interpreter(object):
             return lhs + rhs
         if isinstance(lhs, str) and isinstance(rhs, str):
             return lhs + rhs
+        if isinstance(lhs, NumericArray) or isinstance(rhs, NumericArray):
+            return self.elementwise(operator, lhs, rhs)
 
         raise PyLOXRuntimeError(operator, "PLUS was expecting (float, float) or "
                                           "(str, str) instead found ({lhs}, "
                                           "{rhs})".format(lhs=type(lhs),
                                                           rhs=type(rhs)))
 
-    @type_check(types=[float, float])
+    @type_check(types=[float, float], elementwise=True)
     def multiplication(self, operator: Token, lhs: float, rhs: float) -> float:
         return lhs * rhs
 
-    @type_check(types=[float, float])
+    @type_check(types=[float, float], elementwise=True)
     def division(self, operator: Token, lhs: float, rhs: float) -> float:
         if rhs == 0:
             raise PyLOXRuntimeError(operator, "Zero division error")
         return lhs / rhs
 
-    @type_check(types=[float, float])
+    @type_check(types=[float, float], elementwise=True)
     def greater(self, operator: Token, lhs: object, rhs: object) -> bool:
         return lhs > rhs
 
-    @type_check(types=[float, float])
+    @type_check(types=[float, float], elementwise=True)
     def greater_equal(self, operator: Token, lhs: object, rhs: object) -> bool:
         return lhs >= rhs
 
-    @type_check(types=[float, float])
+    @type_check(types=[float, float], elementwise=True)
     def less(self, operator: Token, lhs: object, rhs: object) -> bool:
         return lhs < rhs
 
-    @type_check(types=[float, float])
+    @type_check(types=[float, float], elementwise=True)
     def less_equal(self, operator: Token, lhs: object, rhs: object) -> bool:
         return lhs <= rhs
 
@@ -0,0 +1,578 @@
+"""
+A tracing just in time compiler for hot loops
+the interpreter counts the iterations of every while and for statement, once
+a loop is hot the types of the variables it uses are recorded and the loop is
+translated into the source of a python function specialised for them, which
+is compiled and run instead of the tree walker from then on
+operators whose operand types follow from the recorded ones are emitted as
+python operators, every other site calls the checked operator of the
+interpreter so errors are raised with the same messages
+the function loads the variables from their environments and slots, guards
+their types and writes the assigned ones back when it leaves the loop, if a
+guard fails the loop is run by the tree walker and compiled again once it is
+hot with the new types
+only loops made of blocks, variables, operators, prints, ifs and nested
+loops are compiled, calls, arrays, properties and declarations of functions
+and classes keep a loop in the tree walker
+"""
+from typing import List, Optional, Set, Tuple
+
+from PyLOX.exceptions import PyLOXRuntimeError
+from PyLOX.expressions import Binary, Grouping, Literal, Unary, Variable, \
+    Assignment, Logical, Invariant, LocalVariable, LocalAssignment, \
+    UncheckedBinary, UncheckedUnary
+from PyLOX.environment import Environment
+from PyLOX.interpreter import Interpreter
+from PyLOX.statements import Stmt, Var, Print, Expression, Block, If, While, \
+    Break, For, Hoist, LazyBlock, LocalVar, LocalBlock
+from PyLOX.token import Token, TokenType
+
+# iterations after which a loop is compiled
+HOT_LOOP_ITERATIONS = 200
+
+# guard failures after which a loop is left to the tree walker
+MAX_DEOPTIMIZATIONS = 4
+
+# only these types are specialised, values of others are treated as unknown
+SPECIALISED_TYPES = (float, str, bool, type(None))
+
+ARITHMETIC_OPERATORS = {
+    TokenType.PLUS: "+",
+    TokenType.MINUS: "-",
+    TokenType.STAR: "*",
+}
+COMPARISON_OPERATORS = {
+    TokenType.GREATER: ">",
+    TokenType.GREATER_EQUAL: ">=",
+    TokenType.LESS: "<",
+    TokenType.LESS_EQUAL: "<=",
+}
+
+Code = Tuple[str, Optional[type]]
+
+
+class Unsupported(Exception):
+    pass
+
+
+def divide(token: Token, lhs: float, rhs: float) -> float:
+    if rhs == 0:
+        raise PyLOXRuntimeError(token, "Zero division error")
+    return lhs / rhs
+
+
+class CompiledLoop(object):
+    def __init__(self, function, names: List[str], slots: List[int]):
+        self.function = function
+        self.names = names
+        self.slots = slots
+
+    def run(self, interpreter: Interpreter) -> bool:
+        # returns False if the loop has to be run by the tree walker
+        memories = []
+        for name in self.names:
+            memory = interpreter.environment.resolve(name)
+            if memory is None:
+                # the tree walker reports the undefined variable
+                return False
+            memories.append(memory)
+        return self.function(interpreter.frame, *memories)
+
+
+class LoopCompiler(object):
+    # generates the source of a loop, expressions return their code and
+    # the type they are known to have, None if it is unknown
+    def __init__(self, interpreter: Interpreter, generic: Set[str]):
+        self.interpreter = interpreter
+        # variables whose assignments do not keep their type
+        self.generic = generic
+        self.violations = set()
+        self.types = {}
+        self.lines = []
+        self.depth = 1
+        self.constants = {}
+        self.count = 0
+        # variables declared in the loop, slots declared in the loop
+        self.scopes = [{}]
+        self.declared_slots = {}
+        # variables and slots of the enclosing code
+        self.names = {}
+        self.slots = {}
+        self.assigned = set()
+
+    def generate(self, stmt: Stmt) -> Set[str]:
+        # returns the variables whose assignments do not keep their type, a
+        # for loop is compiled after its initializer ran
+        if isinstance(stmt, For):
+            self.loop(stmt)
+        else:
+            stmt.visit(self)
+        return self.violations
+
+    def build(self) -> CompiledLoop:
+        names = list(self.names)
+        slots = list(self.slots)
+        prologue = []
+        guards = []
+        for index, name in enumerate(names):
+            variable = self.names[name]
+            prologue.append("{variable} = memory{index}[{name!r}]".format(
+                variable=variable, index=index, name=name))
+            guards.append(variable)
+        for slot in slots:
+            variable = self.slots[slot]
+            prologue.append("{variable} = frame[{slot}]".format(
+                variable=variable, slot=slot))
+            guards.append(variable)
+        checks = ["type({variable}) is not {type}".format(
+            variable=variable, type=self.constant(self.types[variable]))
+            for variable in guards if self.types[variable] is not None]
+        epilogue = ["memory{index}[{name!r}] = {variable}".format(
+            index=index, name=name, variable=self.names[name])
+            for index, name in enumerate(names)
+            if self.names[name] in self.assigned]
+        epilogue += ["frame[{slot}] = {variable}".format(
+            slot=slot, variable=self.slots[slot]) for slot in slots
+            if self.slots[slot] in self.assigned]
+
+        # constants are default values of parameters, they are read as locals
+        parameters = ["frame"] + ["memory{index}".format(index=index)
+                                  for index in range(len(names))] + \
+                     ["{name}={name}".format(name=name)
+                      for name in self.constants]
+        source = ["def loop({parameters}):".format(
+            parameters=", ".join(parameters))]
+        source += ["    " + line for line in prologue]
+        if checks:
+            source.append("    if {checks}:".format(checks=" or ".join(checks)))
+            source.append("        return False")
+        source.append("    try:")
+        source += ["    " + line for line in self.lines]
+        source.append("    finally:")
+        source += ["        " + line for line in epilogue or ["pass"]]
+        source.append("    return True")
+        namespace = dict(self.constants)
+        exec(compile("\n".join(source), "<loop>", "exec"), namespace)
+        return CompiledLoop(namespace["loop"], names, slots)
+
+    # helpers
+    def emit(self, line: str) -> None:
+        self.lines.append("    " * self.depth + line)
+
+    def new_name(self, prefix: str) -> str:
+        self.count += 1
+        return "{prefix}{count}".format(prefix=prefix, count=self.count)
+
+    def constant(self, value: object) -> str:
+        for name, constant in self.constants.items():
+            if constant is value:
+                return name
+        name = self.new_name("K")
+        self.constants[name] = value
+        return name
+
+    def declare(self, variable: str, value_type: Optional[type]) -> None:
+        if variable in self.generic or value_type not in SPECIALISED_TYPES:
+            value_type = None
+        self.types[variable] = value_type
+
+    def store(self, variable: str, value_type: Optional[type]) -> None:
+        self.assigned.add(variable)
+        if self.types[variable] is not None and \
+                self.types[variable] != value_type:
+            self.violations.add(variable)
+
+    def variable(self, name: str) -> str:
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        if name not in self.names:
+            memory = self.interpreter.environment.resolve(name)
+            if memory is None:
+                raise Unsupported(name)
+            variable = self.new_name("e")
+            self.names[name] = variable
+            self.declare(variable, type(memory[name]))
+        return self.names[name]
+
+    def slot(self, slot: int) -> str:
+        if slot in self.declared_slots:
+            return self.declared_slots[slot]
+        if slot not in self.slots:
+            variable = self.new_name("s")
+            self.slots[slot] = variable
+            self.declare(variable, type(self.interpreter.frame[slot]))
+        return self.slots[slot]
+
+    def truth(self, code: Code) -> str:
+        # only nil and false are false
+        text, value_type = code
+        if value_type is bool:
+            return text
+        if value_type is not None:
+            return "({text} is not None)".format(text=text)
+        temporary = self.new_name("t")
+        return "(({temporary} := {text}) is not None and {temporary} is not " \
+               "False)".format(temporary=temporary, text=text)
+
+    def block(self, stmts: List[Stmt], indent: bool = True) -> None:
+        self.depth += indent
+        self.scopes.append({})
+        start = len(self.lines)
+        for stmt in stmts:
+            stmt.visit(self)
+        if len(self.lines) == start and indent:
+            self.emit("pass")
+        self.scopes.pop()
+        self.depth -= indent
+
+    def unsupported(self, node: object, *args) -> None:
+        raise Unsupported(type(node).__name__)
+
+    # statements
+    def visit_while(self, stmt: While) -> None:
+        self.emit("while {condition}:".format(
+            condition=self.truth(stmt.condition.visit(self))))
+        self.body(stmt.body)
+
+    def body(self, stmt: Stmt) -> None:
+        if isinstance(stmt, LazyBlock):
+            if stmt.body is None:
+                raise Unsupported("LazyBlock")
+            stmt = stmt.body
+        if isinstance(stmt, (Block, LocalBlock)):
+            self.block(stmt.statements)
+        else:
+            self.block([stmt])
+
+    def visit_for(self, stmt: For) -> None:
+        self.scopes.append({})
+        if stmt.initializer is not None:
+            stmt.initializer.visit(self)
+        self.loop(stmt)
+        self.scopes.pop()
+
+    def loop(self, stmt: For) -> None:
+        self.emit("while {condition}:".format(
+            condition=self.truth(stmt.condition.visit(self))))
+        self.body(stmt.body)
+        if stmt.update is not None:
+            self.depth += 1
+            self.emit(stmt.update.visit(self)[0])
+            self.depth -= 1
+
+    def visit_hoist(self, stmt: Hoist) -> None:
+        # invariant expressions are compiled in place
+        stmt.loop.visit(self)
+
+    def visit_block(self, stmt: Block) -> None:
+        self.block(stmt.statements, indent=False)
+
+    visit_local_block = visit_block
+
+    def visit_lazy_block(self, stmt: LazyBlock) -> None:
+        if stmt.body is None:
+            raise Unsupported("LazyBlock")
+        stmt.body.visit(self)
+
+    def visit_var(self, stmt: Var) -> None:
+        # the value is evaluated before the name is declared
+        if stmt.value is None:
+            text, value_type = "None", type(None)
+        else:
+            text, value_type = stmt.value.visit(self)
+        variable = self.new_name("v")
+        self.scopes[-1][stmt.name.lexeme] = variable
+        self.declare(variable, value_type)
+        self.emit("{variable} = {text}".format(variable=variable, text=text))
+
+    def visit_local_var(self, stmt: LocalVar) -> None:
+        if stmt.value is None:
+            text, value_type = "None", type(None)
+        else:
+            text, value_type = stmt.value.visit(self)
+        variable = self.new_name("v")
+        self.declared_slots[stmt.slot] = variable
+        self.declare(variable, value_type)
+        self.emit("{variable} = {text}".format(variable=variable, text=text))
+
+    def visit_expression(self, stmt: Expression) -> None:
+        expr = stmt.expression
+        if isinstance(expr, (Assignment, LocalAssignment)):
+            text, value_type = expr.value.visit(self)
+            if isinstance(expr, Assignment):
+                variable = self.variable(expr.name.lexeme)
+            else:
+                variable = self.slot(expr.slot)
+            self.store(variable, value_type)
+            self.emit("{variable} = {text}".format(variable=variable,
+                                                   text=text))
+            return
+        self.emit(expr.visit(self)[0])
+
+    visit_assignment_statement = visit_expression
+
+    def visit_print(self, stmt: Print) -> None:
+        self.emit("{function}({text})".format(
+            function=self.constant(self.interpreter.print_value),
+            text=stmt.expression.visit(self)[0]))
+
+    def visit_if(self, stmt: If) -> None:
+        self.emit("if {condition}:".format(
+            condition=self.truth(stmt.condition.visit(self))))
+        self.block([stmt.then_statement])
+        if stmt.else_statement is not None:
+            self.emit("else:")
+            self.block([stmt.else_statement])
+
+    def visit_break(self, stmt: Break) -> None:
+        self.emit("break")
+
+    visit_function = visit_return = visit_class = unsupported
+
+    # expressions
+    def visit_literal(self, expr: Literal) -> Code:
+        if expr.value is None or isinstance(expr.value, bool):
+            return repr(expr.value), type(expr.value)
+        return self.constant(expr.value), type(expr.value)
+
+    def visit_grouping(self, expr: Grouping) -> Code:
+        return expr.expression.visit(self)
+
+    def visit_invariant(self, expr: Invariant) -> Code:
+        return expr.expression.visit(self)
+
+    def visit_variable(self, expr: Variable) -> Code:
+        variable = self.variable(expr.name.lexeme)
+        return variable, self.types[variable]
+
+    def visit_local_variable(self, expr: LocalVariable) -> Code:
+        variable = self.slot(expr.slot)
+        return variable, self.types[variable]
+
+    def visit_assignment(self, expr: Assignment) -> Code:
+        text, value_type = expr.value.visit(self)
+        variable = self.variable(expr.name.lexeme)
+        return self.assign(variable, text, value_type)
+
+    def visit_local_assignment(self, expr: LocalAssignment) -> Code:
+        text, value_type = expr.value.visit(self)
+        return self.assign(self.slot(expr.slot), text, value_type)
+
+    # fused nodes are compiled like the nodes they replace
+    visit_increment = visit_assignment
+    visit_local_increment = visit_local_assignment
+
+    def assign(self, variable: str, text: str,
+               value_type: Optional[type]) -> Code:
+        self.store(variable, value_type)
+        return "({variable} := {text})".format(variable=variable,
+                                               text=text), value_type
+
+    def visit_logical(self, expr: Logical) -> Code:
+        left = expr.left.visit(self)
+        right_text, right_type = expr.right.visit(self)
+        temporary = self.new_name("t")
+        condition = self.truth(("({temporary} := {text})".format(
+            temporary=temporary, text=left[0]), left[1]))
+        if expr.operator.type == TokenType.OR:
+            text = "({temporary} if {condition} else {right})"
+        else:
+            text = "({right} if {condition} else {temporary})"
+        value_type = left[1] if left[1] == right_type else None
+        return text.format(temporary=temporary, condition=condition,
+                           right=right_text), value_type
+
+    def visit_binary(self, expr: Binary) -> Code:
+        left, left_type = expr.left.visit(self)
+        right, right_type = expr.right.visit(self)
+        operator = expr.operator
+        kind = operator.type
+        if kind == TokenType.EQUAL_EQUAL:
+            return "({left} == {right})".format(left=left, right=right), bool
+        if kind == TokenType.BANG_EQUAL:
+            return "(not {left} == {right})".format(left=left,
+                                                    right=right), bool
+        unchecked = isinstance(expr, UncheckedBinary)
+        numbers = unchecked or left_type is float and right_type is float
+        if kind == TokenType.PLUS and (unchecked or left_type is str and
+                                       right_type is str):
+            value_type = left_type if left_type == right_type else None
+            return "({left} + {right})".format(left=left,
+                                               right=right), value_type
+        if numbers and kind in ARITHMETIC_OPERATORS:
+            return "({left} {operator} {right})".format(
+                left=left, operator=ARITHMETIC_OPERATORS[kind],
+                right=right), float
+        if numbers and kind == TokenType.SLASH:
+            return "{divide}({token}, {left}, {right})".format(
+                divide=self.constant(divide), token=self.constant(operator),
+                left=left, right=right), float
+        if numbers and kind in COMPARISON_OPERATORS:
+            return "({left} {operator} {right})".format(
+                left=left, operator=COMPARISON_OPERATORS[kind],
+                right=right), bool
+        function = self.interpreter.binary_operators.get(
+            kind, self.interpreter.not_implemented)
+        return "{function}({token}, {left}, {right})".format(
+            function=self.constant(function), token=self.constant(operator),
+            left=left, right=right), None
+
+    visit_unchecked_binary = visit_guarded_binary = visit_compare = \
+        visit_binary
+
+    def visit_unary(self, expr: Unary) -> Code:
+        code = expr.right.visit(self)
+        kind = expr.operator.type
+        unchecked = isinstance(expr, UncheckedUnary)
+        if kind == TokenType.MINUS and (unchecked or code[1] is float):
+            return "(-{text})".format(text=code[0]), float
+        if kind == TokenType.BANG and unchecked:
+            return "(not {truth})".format(truth=self.truth(code)), bool
+        function = self.interpreter.unary_operators.get(
+            kind, self.interpreter.not_implemented)
+        return "{function}({token}, {text})".format(
+            function=self.constant(function),
+            token=self.constant(expr.operator), text=code[0]), None
+
+    visit_unchecked_unary = visit_guarded_unary = visit_unary
+
+    visit_deep = visit_array = visit_index = visit_slice = \
+        visit_index_assignment = visit_call = visit_tail_call = \
+        visit_property = visit_property_assignment = visit_this = \
+        visit_super = unsupported
+
+
+def compile_loop(interpreter: Interpreter, stmt: Stmt) -> Optional[CompiledLoop]:
+    # variables whose types change are compiled without a type until the
+    # loop keeps the types of all of the others
+    generic = set()
+    while True:
+        compiler = LoopCompiler(interpreter, generic)
+        try:
+            violations = compiler.generate(stmt)
+        except Unsupported:
+            return None
+        if not violations:
+            return compiler.build()
+        generic |= violations
+
+
+class JITInterpreter(Interpreter):
+    def __init__(self, stream, globals=None):
+        super(JITInterpreter, self).__init__(stream, globals)
+        self.iterations = {}
+        self.loops = {}
+        self.deoptimizations = {}
+        # loops that are never compiled
+        self.rejected = set()
+        # loops a profile found hot, they are compiled on their first entry
+        self.hot_loops = set()
+        self.compiled = 0
+        self.guard_failures = 0
+
+    def visit_while(self, stmt: While) -> object:
+        body = stmt.body
+        if stmt in self.rejected or \
+                not isinstance(body, (Block, LocalBlock, LazyBlock)):
+            return super(JITInterpreter, self).visit_while(stmt)
+        loop = self.loops.get(stmt)
+        if loop is None and stmt in self.hot_loops:
+            self.hot_loops.discard(stmt)
+            loop = self.compile(stmt)
+        if loop is not None:
+            if loop.run(self):
+                return None
+            self.deoptimize(stmt)
+
+        # bodies are blocks so the loop has no value
+        iterations = self.iterations.get(stmt, 0)
+        try:
+            while self.is_true(stmt.condition.visit(self)):
+                try:
+                    body.visit(self)
+                except PyLOXRuntimeError as e:
+                    if e.token != TokenType.BREAK:
+                        raise e
+                    break
+                if self.returning:
+                    break
+                iterations += 1
+                if iterations == HOT_LOOP_ITERATIONS:
+                    loop = self.compile(stmt)
+                    if loop is not None and loop.run(self):
+                        return None
+        finally:
+            self.iterations[stmt] = iterations
+        return None
+
+    def execute_loop(self, stmt: For) -> None:
+        # runs after the initializer, in the environment of the loop variable
+        if stmt in self.rejected:
+            return super(JITInterpreter, self).execute_loop(stmt)
+        loop = self.loops.get(stmt)
+        if loop is None and stmt in self.hot_loops:
+            self.hot_loops.discard(stmt)
+            loop = self.compile(stmt)
+        if loop is not None:
+            if loop.run(self):
+                return None
+            self.deoptimize(stmt)
+
+        statements, frame, fresh = self.loop_frame(stmt)
+        iterations = self.iterations.get(stmt, 0)
+        try:
+            while self.is_true(stmt.condition.visit(self)):
+                try:
+                    if fresh:
+                        self.execute_block(statements,
+                                           Environment(self.environment))
+                    elif frame is None:
+                        for child in statements:
+                            child.visit(self)
+                            if self.returning:
+                                break
+                    else:
+                        frame.memory.clear()
+                        self.execute_block(statements, frame)
+                except PyLOXRuntimeError as e:
+                    if e.token != TokenType.BREAK:
+                        raise e
+                    break
+                if self.returning:
+                    break
+                if stmt.update is not None:
+                    stmt.update.visit(self)
+                iterations += 1
+                if iterations == HOT_LOOP_ITERATIONS:
+                    loop = self.compile(stmt)
+                    if loop is not None and loop.run(self):
+                        return None
+        finally:
+            self.iterations[stmt] = iterations
+        return None
+
+    def compile(self, stmt: Stmt) -> Optional[CompiledLoop]:
+        loop = compile_loop(self, stmt)
+        if loop is None:
+            self.rejected.add(stmt)
+            return None
+        self.loops[stmt] = loop
+        self.compiled += 1
+        return loop
+
+    def deoptimize(self, stmt: Stmt) -> None:
+        # a guard failed, the loop is compiled again when it is hot
+        self.guard_failures += 1
+        del self.loops[stmt]
+        self.iterations[stmt] = 0
+        self.deoptimizations[stmt] = self.deoptimizations.get(stmt, 0) + 1
+        if self.deoptimizations[stmt] >= MAX_DEOPTIMIZATIONS:
+            self.rejected.add(stmt)
+
+    def statistics(self) -> List[str]:
+        return super(JITInterpreter, self).statistics() + [
+            "JIT: compiled {compiled} loops, {failures} guard failures, "
+            "{rejected} loops left to the interpreter".format(
+                compiled=self.compiled, failures=self.guard_failures,
+                rejected=len(self.rejected))]
@@ -0,0 +1,161 @@
+"""
+Loop invariant code motion
+binary, unary and grouping expressions inside a loop whose variables are
+neither assigned nor declared by the loop are replaced with Invariant
+expressions, the loop itself is wrapped in a Hoist statement that declares
+the temporaries
+temporaries are computed the first time they are evaluated inside the loop
+so runtime errors are raised at the same time with the same message
+arrays are mutable and calls might assign any variable, in loops that assign
+to an element or call a function only expressions without variables are
+hoisted, expressions in function bodies are never hoisted
+"""
+from typing import Callable, List, Set
+
+from PyLOX.expressions import Expr, Binary, Grouping, Literal, Unary, \
+    Variable, Assignment, Logical, Invariant, Deep, IndexAssignment, Call
+from PyLOX.statements import Stmt, Var, While, For, Hoist, LazyBlock, Function
+from PyLOX.token import Token, TokenType
+from PyLOX.transformer import Transformer, walk, assigned_names, \
+    mutates_arrays, has_calls
+
+
+class VariantCollector(Transformer):
+    # collects names that are assigned or declared inside a loop
+    def __init__(self):
+        self.names = set()
+        self.mutates_arrays = False
+        self.calls = False
+
+    def collect(self, *nodes) -> Set[str]:
+        for node in nodes:
+            if node is not None:
+                node.visit(self)
+        return self.names
+
+    def visit_var(self, stmt: Var) -> Stmt:
+        self.names.add(stmt.name.lexeme)
+        return super(VariantCollector, self).visit_var(stmt)
+
+    def visit_assignment(self, expr: Assignment) -> Expr:
+        self.names.add(expr.name.lexeme)
+        return super(VariantCollector, self).visit_assignment(expr)
+
+    def visit_index_assignment(self, expr: IndexAssignment) -> Expr:
+        self.mutates_arrays = True
+        return super(VariantCollector, self).visit_index_assignment(expr)
+
+    def visit_call(self, expr: Call) -> Expr:
+        self.calls = True
+        return super(VariantCollector, self).visit_call(expr)
+
+    def visit_deep(self, expr: Deep) -> Expr:
+        for node in walk(expr.expression):
+            if isinstance(node, Assignment):
+                self.names.add(node.name.lexeme)
+            elif isinstance(node, IndexAssignment):
+                self.mutates_arrays = True
+            elif isinstance(node, Call):
+                self.calls = True
+        return expr
+
+    def visit_lazy_block(self, stmt: LazyBlock) -> Stmt:
+        self.names |= assigned_names(stmt)
+        self.mutates_arrays = self.mutates_arrays or mutates_arrays(stmt)
+        self.calls = self.calls or has_calls(stmt)
+        return stmt
+
+
+class Hoister(Transformer):
+    def __init__(self, collector: VariantCollector,
+                 new_temporary: Callable[[Token], Token]):
+        self.variant = collector.names
+        # any variable might be changed without an assignment in the loop
+        self.opaque = collector.mutates_arrays or collector.calls
+        self.new_temporary = new_temporary
+        self.temporaries = []
+
+    def is_invariant(self, expr: Expr) -> bool:
+        if isinstance(expr, Literal):
+            return True
+        if isinstance(expr, Variable):
+            return not self.opaque and expr.name.lexeme not in self.variant
+        if isinstance(expr, Grouping):
+            return self.is_invariant(expr.expression)
+        if isinstance(expr, Unary):
+            return self.is_invariant(expr.right)
+        if isinstance(expr, (Binary, Logical)):
+            return self.is_invariant(expr.left) and self.is_invariant(expr.right)
+        return False
+
+    def hoist(self, expr: Expr, token: Token) -> Expr:
+        temporary = self.new_temporary(token)
+        self.temporaries.append(temporary)
+        return Invariant(temporary, expr)
+
+    def visit_binary(self, expr: Binary) -> Expr:
+        if self.is_invariant(expr):
+            return self.hoist(expr, expr.operator)
+        return super(Hoister, self).visit_binary(expr)
+
+    def visit_unary(self, expr: Unary) -> Expr:
+        if self.is_invariant(expr):
+            return self.hoist(expr, expr.operator)
+        return super(Hoister, self).visit_unary(expr)
+
+    def visit_grouping(self, expr: Grouping) -> Expr:
+        # groupings are hoisted only if they contain an operator
+        inner = expr.expression
+        while isinstance(inner, Grouping):
+            inner = inner.expression
+        if isinstance(inner, (Binary, Unary)) and self.is_invariant(inner):
+            return self.hoist(expr, inner.operator)
+        return super(Hoister, self).visit_grouping(expr)
+
+    def visit_invariant(self, expr: Invariant) -> Expr:
+        return expr
+
+    def visit_function(self, stmt: Function) -> Stmt:
+        # bodies might run after the loop when the names are changed
+        return stmt
+
+
+class LoopInvariantMotion(Transformer):
+    def __init__(self):
+        self.count = 0
+
+    def optimize(self, program: List[Stmt]) -> List[Stmt]:
+        return self.transform(program)
+
+    def new_temporary(self, token: Token) -> Token:
+        # $ can not appear in identifiers so temporaries never clash
+        name = "$licm{count}".format(count=self.count)
+        self.count += 1
+        return Token(TokenType.IDENTIFIER, name, name, token.offset,
+                     token.lines)
+
+    def wrap(self, loop: Stmt, hoister: Hoister) -> Stmt:
+        if hoister.temporaries:
+            return Hoist(hoister.temporaries, loop)
+        return loop
+
+    def visit_while(self, stmt: While) -> Stmt:
+        collector = VariantCollector()
+        collector.collect(stmt.condition, stmt.body)
+        hoister = Hoister(collector, self.new_temporary)
+        stmt.condition = stmt.condition.visit(hoister)
+        stmt.body = stmt.body.visit(hoister)
+        # nested loops hoist whatever is invariant only for themselves
+        stmt = super(LoopInvariantMotion, self).visit_while(stmt)
+        return self.wrap(stmt, hoister)
+
+    def visit_for(self, stmt: For) -> Stmt:
+        collector = VariantCollector()
+        collector.collect(stmt.condition, stmt.body, stmt.update)
+        hoister = Hoister(collector, self.new_temporary)
+        stmt.condition = stmt.condition.visit(hoister)
+        if stmt.update is not None:
+            stmt.update = stmt.update.visit(hoister)
+        stmt.body = stmt.body.visit(hoister)
+        stmt = super(LoopInvariantMotion, self).visit_for(stmt)
+        return self.wrap(stmt, hoister)
@@ -1,57 +1,191 @@
+import os
 import sys
 
+from PyLOX.front_end import parse
+from PyLOX.functions import missing
 from PyLOX.interpreter import Interpreter, PyLOXRuntimeError
-from PyLOX.parser import Parser
-from PyLOX.scanner import Scanner
+from PyLOX.optimizer import optimize
+from PyLOX.program import Program, execute, run_deep
+
+# the JIT, the profilers and snapshots are imported when their flags are
+# given, a plain run only loads the front end and the interpreter
 
 
 def main(args, stream=sys.stdout):
+    flags = {arg for arg in args[1:] if arg.startswith("--")}
+    args = [arg for arg in args if arg not in flags]
+    verbose = "--verbose" in flags
+    jobs = None
+    for flag in flags:
+        if flag.startswith("--jobs="):
+            jobs = int(flag[len("--jobs="):])
+    # --lazy parses block bodies on entry, --lazy=check still reports their
+    # errors before the program runs
+    lazy = "--lazy" in flags or "--lazy=check" in flags
+    check = "--lazy=check" in flags
+    # --pgo-record=FILE writes a profile of the run, --pgo-use=FILE
+    # specialises the program with a recorded one
+    profile_in = profile_out = None
+    for flag in flags:
+        if flag.startswith("--pgo-record="):
+            profile_out = flag[len("--pgo-record="):]
+        elif flag.startswith("--pgo-use="):
+            profile_in = flag[len("--pgo-use="):]
+    # --jit compiles hot loops, --memprofile charges allocations to the nodes
+    # that made them, each of them and --pgo-record runs its own interpreter
+    modes = [flag for flag in ("--jit", "--memprofile") if flag in flags]
+    if profile_out is not None:
+        modes.append("--pgo-record")
+    if len(modes) > 1:
+        print("{modes} cannot be used together".format(
+            modes=" and ".join(modes)))
+        usage(args[0])
+        return -1
+    interpreter_class = Interpreter
+    if "--jit" in flags:
+        from PyLOX.jit import JITInterpreter
+        interpreter_class = JITInterpreter
+    elif "--memprofile" in flags:
+        from PyLOX.memprofile import MemoryProfilingInterpreter
+        interpreter_class = MemoryProfilingInterpreter
+    elif profile_out is not None:
+        from PyLOX.pgo import ProfilingInterpreter
+        interpreter_class = ProfilingInterpreter
+    # --prelude=FILE runs a script before the program, with
+    # --snapshot=FILE its globals are saved after the first run and
+    # restored instead of running it again
+    prelude = snapshot = None
+    for flag in flags:
+        if flag.startswith("--prelude="):
+            prelude = flag[len("--prelude="):]
+        elif flag.startswith("--snapshot="):
+            snapshot = flag[len("--snapshot="):]
     if len(args) > 2:
-        print("Usage: {name} [script]".format(name=args[0]))
+        usage(args[0])
     elif len(args) == 2:
-        return run_file(args[1], stream)
+        return run_file(args[1], stream, verbose, jobs, lazy, check,
+                        interpreter_class, profile_in, profile_out, prelude,
+                        snapshot)
     else:
-        return run_prompt(stream)
+        return run_prompt(stream, verbose, interpreter_class)
+
+
+def usage(name):
+    print("Usage: {name} [--verbose] [--jobs=N] [--lazy[=check]] "
+          "[--jit | --pgo-record=FILE | --memprofile] [--pgo-use=FILE] "
+          "[--prelude=FILE [--snapshot=FILE]] [script]".format(name=name))
 
 
-def run_file(path, stream):
+def run_file(path, stream, verbose=False, jobs=None, lazy=False, check=False,
+             interpreter_class=Interpreter, profile_in=None, profile_out=None,
+             prelude=None, snapshot=None):
     with open(path, "r") as f:
         source = f.read()
-    interpreter = Interpreter(stream)
-    return run(source, interpreter)
+    interpreter = interpreter_class(stream)
+    # imports of the script are resolved from its directory
+    interpreter.directory = os.path.dirname(os.path.abspath(path))
+    if prelude is not None and run_prelude(prelude, interpreter, snapshot,
+                                           verbose, jobs, lazy, check) == -1:
+        return -1
+    # functions of a prelude read and write the globals of the script, so
+    # the script is only a whole program without one
+    return run(source, interpreter, whole_program=prelude is None,
+               verbose=verbose, jobs=jobs, lazy=lazy, check=check,
+               profile_in=profile_in, profile_out=profile_out)
 
 
-def run_prompt(stream):
-    interpreter = Interpreter(stream)
+def run_prelude(path, interpreter, snapshot=None, verbose=False, jobs=None,
+                lazy=False, check=False):
+    with open(path, "r") as f:
+        source = f.read()
+    if snapshot is not None:
+        from PyLOX.snapshot import snapshot_key, save_snapshot, \
+            restore_snapshot
+        key = snapshot_key(source, lazy)
+        if restore_snapshot(snapshot, interpreter, key):
+            return 0
+    # the program after the prelude uses its globals, imports of the
+    # prelude are resolved from its directory
+    directory = interpreter.directory
+    interpreter.directory = os.path.dirname(os.path.abspath(path))
+    try:
+        if run(source, interpreter, verbose=verbose, jobs=jobs, lazy=lazy,
+               check=check) == -1:
+            return -1
+    finally:
+        interpreter.directory = directory
+    if snapshot is not None:
+        save_snapshot(snapshot, interpreter, key)
+    return 0
+
+
+def run_prompt(stream, verbose=False, interpreter_class=Interpreter):
+    interpreter = interpreter_class(stream)
     while True:
         print("> ", end="")
         prompt = input()
         if prompt == "exit":
             # exit is an additional keyword for this interpreter
             return 0
-        run(prompt, interpreter)
+        run(prompt, interpreter, verbose=verbose)
 
 
-def run(source, interpreter):
-    scanner = Scanner(source)
-    tokens = scanner.scan_tokens()
-    if not scanner.valid:
-        # there was a problem with tokens
-        return -1
-    parser = Parser(tokens)
-    program = parser.parse()
-    if not parser.valid:
-        # there was a problem with parser
-        return -1
+def compile_program(source, whole_program=False, verbose=False, jobs=None,
+                    lazy=False, check=False, stream=None):
+    # errors are printed to the stream, standard output if it is None
+    program = parse(source, jobs, lazy, check, stream)
+    if program is None:
+        # there was a problem with tokens or parser
+        return None
+    return optimize(program, whole_program, verbose)
+
+
+def run(source, interpreter, whole_program=False, verbose=False, jobs=None,
+        lazy=False, check=False, profile_in=None, profile_out=None,
+        programs=None):
+    # programs caches optimized programs by source for processes that run
+    # the same sources again
+    program = missing if programs is None else \
+        programs.get((source, lazy, check))
+    if program is missing:
+        # the passes recurse as deep as the tree, so they run on a deep stack
+        # like the program
+        statements = run_deep(compile_program, source, whole_program,
+                              verbose, jobs, lazy, check)
+        if statements is None:
+            return -1
+        program = Program(statements)
+        if programs is not None:
+            programs.put((source, lazy, check), program)
+    if profile_in is not None or profile_out is not None:
+        from PyLOX.pgo import profile_key, load_profile, save_profile, \
+            apply_profile
+        key = profile_key(source, lazy)
+    if profile_in is not None:
+        profile = load_profile(profile_in, key)
+        if profile is not None:
+            statements, hot_loops = run_deep(apply_profile, list(program),
+                                             profile, verbose)
+            program = Program(statements)
+            # the JIT compiles the hot loops on their first entry
+            if hasattr(interpreter, "hot_loops"):
+                interpreter.hot_loops |= hot_loops
     #    ExpressionPrinter().print(program)
     try:
-        outcomes = [interpreter.interpret(stmt) for stmt in program]
+        # programs attached from shared memory are sequences of statements
+        outcomes = run_deep(execute, program, interpreter)
     except PyLOXRuntimeError as e:
         print(e)
         return -1
+    finally:
+        if profile_out is not None:
+            save_profile(profile_out, interpreter.profile(program, key))
     for outcome in outcomes:
         if outcome is not None:
             print(outcome)
+    if verbose or interpreter.reports_statistics:
+        for statistics in interpreter.statistics():
+            print(statistics)
 
 
 if __name__ == "__main__":
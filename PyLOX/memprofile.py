@@ -0,0 +1,176 @@
+"""
+Allocation profiler
+the run is split into segments at every entry and exit of a node visit, each
+segment belongs to the innermost node being visited and the bytes traced by
+tracemalloc above the level of its start are charged to the type and source
+line of that node, so temporaries freed within the segment are counted too
+charges are exclusive, a block is charged for its environment and not for
+the statements it runs, loops are also charged inclusively per iteration
+the profiler records while it runs, the JIT is not used, objects that
+python recycles from its free lists, like most floats, are not traced
+"""
+import tracemalloc
+from functools import wraps
+from typing import Callable, List, Optional, Tuple
+
+from PyLOX.expressions import Expr
+from PyLOX.interpreter import Interpreter
+from PyLOX.statements import Stmt
+from PyLOX.token import Token
+
+# number of sites listed by the report
+REPORTED_SITES = 10
+
+
+def first_line(node: object) -> Optional[int]:
+    # line of the first token of a node and its children
+    for value in vars(node).values():
+        if isinstance(value, Token):
+            return value.line
+        for child in value if isinstance(value, list) else [value]:
+            if isinstance(child, (Expr, Stmt)):
+                line = first_line(child)
+                if line is not None:
+                    return line
+    return None
+
+
+def measured(visit: Callable[[Interpreter, object], object]) \
+        -> Callable[[Interpreter, object], object]:
+    @wraps(visit)
+    def wrapped(self, node):
+        self.enter(node)
+        try:
+            return visit(self, node)
+        finally:
+            self.exit()
+
+    return wrapped
+
+
+def measured_loop(visit: Callable[[Interpreter, Stmt], object]) \
+        -> Callable[[Interpreter, Stmt], object]:
+    @wraps(visit)
+    def wrapped(self, stmt):
+        allocated = self.allocated
+        evaluations = self.executions.get(stmt.condition, 0)
+        try:
+            return visit(self, stmt)
+        finally:
+            # the last evaluation of the condition ends the loop
+            iterations = max(self.executions.get(stmt.condition, 0) -
+                             evaluations - 1, 0)
+            loop = self.loops.get(self.site(stmt))
+            if loop is None:
+                loop = self.loops[self.site(stmt)] = [0, 0]
+            loop[0] += iterations
+            loop[1] += self.allocated - allocated
+
+    return wrapped
+
+
+class MemoryProfilingInterpreter(Interpreter):
+    reports_statistics = True
+
+    def __init__(self, stream, globals=None):
+        super(MemoryProfilingInterpreter, self).__init__(stream, globals)
+        # innermost node first
+        self.stack = []
+        self.lines = {}
+        self.executions = {}
+        # site -> [executions, bytes, peak]
+        self.sites = {}
+        # site -> [iterations, bytes]
+        self.loops = {}
+        self.allocated = 0
+        self.peak = 0
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.bias = 0
+        self.bias = self.calibrate()
+        self.start()
+
+    def calibrate(self) -> int:
+        # bytes charged to a visit that allocates nothing, the profiler
+        # allocates them itself in every segment
+        visit = measured(lambda self, node: None)
+        node = Stmt()
+        charges = []
+        for _ in range(15):
+            self.start()
+            visit(self, node)
+            charges.append(self.sites.pop(self.site(node))[1])
+        self.lines.clear()
+        self.executions.clear()
+        return sorted(charges)[len(charges) // 2]
+
+    def start(self) -> None:
+        tracemalloc.reset_peak()
+        self.segment = tracemalloc.get_traced_memory()[0]
+
+    def charge(self) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        if peak > self.peak:
+            self.peak = peak
+        if self.stack:
+            allocated = max(peak - self.segment - self.bias, 0)
+            self.allocated += allocated
+            site = self.sites[self.stack[-1]]
+            site[1] += allocated
+            if peak > site[2]:
+                site[2] = peak
+
+    def site(self, node: object) -> Tuple[str, int]:
+        line = self.lines.get(node)
+        if line is None:
+            line = first_line(node)
+            if line is None:
+                line = self.stack[-1][1] if self.stack else 0
+            self.lines[node] = line
+        return type(node).__name__, line
+
+    def enter(self, node: object) -> None:
+        self.charge()
+        site = self.site(node)
+        if site not in self.sites:
+            self.sites[site] = [0, 0, 0]
+        self.sites[site][0] += 1
+        self.executions[node] = self.executions.get(node, 0) + 1
+        self.stack.append(site)
+        self.start()
+
+    def exit(self) -> None:
+        self.charge()
+        self.stack.pop()
+        self.start()
+
+    def statistics(self) -> List[str]:
+        report = ["Memory profile: {allocated} bytes allocated, peak {peak} "
+                  "bytes traced".format(allocated=self.allocated,
+                                        peak=self.peak)]
+        sites = sorted(self.sites.items(), key=lambda item: -item[1][1])
+        for (name, line), (executions, allocated, peak) in \
+                sites[:REPORTED_SITES]:
+            report.append("  {name} at line {line}: {executions} executions, "
+                          "{allocated} bytes, {rate:.1f} bytes per execution, "
+                          "peak {peak} bytes".format(
+                name=name, line=line, executions=executions,
+                allocated=allocated, rate=allocated / executions, peak=peak))
+        for (name, line), (iterations, allocated) in sorted(self.loops.items()):
+            report.append("  {name} loop at line {line}: {iterations} "
+                          "iterations, {allocated} bytes, {rate:.1f} bytes "
+                          "per iteration".format(
+                name=name, line=line, iterations=iterations,
+                allocated=allocated, rate=allocated / max(iterations, 1)))
+        return super(MemoryProfilingInterpreter, self).statistics() + report
+
+
+# every visitor of the interpreter is measured
+for name in dir(Interpreter):
+    if name.startswith("visit_"):
+        setattr(MemoryProfilingInterpreter, name,
+                measured(getattr(Interpreter, name)))
+MemoryProfilingInterpreter.visit_while = measured_loop(
+    MemoryProfilingInterpreter.visit_while)
+MemoryProfilingInterpreter.visit_for = measured_loop(
+    MemoryProfilingInterpreter.visit_for)
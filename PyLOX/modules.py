@@ -0,0 +1,55 @@
+"""
+Modules loaded by import statements
+a module is a script that runs in an environment of its own, the names it
+defines at its top level, and the names it imports, are then resolved
+through that environment by the importer
+modules are compiled once per process, the compiled statements are cached by
+the path of the module and reused while its modification time and size stay
+the same, so every interpreter and every job of a daemon worker parses a
+module only once
+every interpreter runs a module once and keeps its environment, importers
+share the bindings of the module, a write of the importer is seen by the
+functions of the module and the other way round
+relative paths are resolved from the directory of the importing script
+"""
+import os
+from typing import Optional, Tuple
+
+from PyLOX.front_end import parse
+from PyLOX.functions import LRUCache, missing
+from PyLOX.optimizer import optimize
+from PyLOX.statements import Stmt
+
+# number of compiled modules a process keeps
+MODULE_CACHE_SIZE = 64
+
+# path -> (modification time, size, statements)
+compiled_modules = LRUCache(MODULE_CACHE_SIZE)
+
+
+def module_path(path: str, directory: Optional[str]) -> str:
+    return os.path.normpath(os.path.join(directory or os.getcwd(), path))
+
+
+def module_version(path: str) -> Tuple[int, int]:
+    # modification time and size, raises OSError if the module can not be read
+    status = os.stat(path)
+    return status.st_mtime_ns, status.st_size
+
+
+def compile_module(path: str) -> Optional[Tuple[Stmt, ...]]:
+    # returns None if the module is not valid, errors are already reported,
+    # raises OSError if it can not be read
+    version = module_version(path)
+    entry = compiled_modules.get(path)
+    if entry is not missing and entry[0] == version:
+        return entry[1]
+    with open(path, "r") as f:
+        source = f.read()
+    program = parse(source, jobs=1)
+    if program is None:
+        return None
+    # names of the module are read by its importers
+    statements = tuple(optimize(program, whole_program=False))
+    compiled_modules.put(path, (version, statements))
+    return statements
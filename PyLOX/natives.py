@@ -0,0 +1,77 @@
+"""
+Registry of native functions
+python callables are bound to names that every interpreter defines in its
+globals, a binding declares the type of every argument, None accepts any
+value, and the interpreter checks the declared ones before the call so the
+callable receives the values as they are
+callables registered with native receive the token of the call before the
+arguments to report their errors, callables bound with bind take only the
+arguments, the value and arithmetic errors they raise are reported at the
+call
+callables return lox values: floats, strings, booleans, nil or arrays
+"""
+import math
+import time
+from typing import Callable, List, Optional
+
+from PyLOX.exceptions import PyLOXRuntimeError
+from PyLOX.functions import NativeFunction
+from PyLOX.numeric_array import NumericArray
+from PyLOX.token import Token
+
+# name -> (callable, argument types, whether it takes the token)
+registry = {}
+
+
+def bind(name: str, function: Callable[..., object], *types: Optional[type],
+         token: bool = False) -> None:
+    registry[name] = (function, types, token)
+
+
+def native(name: str, *types: Optional[type]) \
+        -> Callable[[Callable[..., object]], Callable[..., object]]:
+    def register(function: Callable[..., object]) -> Callable[..., object]:
+        bind(name, function, *types, token=True)
+        return function
+
+    return register
+
+
+def natives() -> List[NativeFunction]:
+    return [NativeFunction(name, len(types), function, types, token)
+            for name, (function, types, token) in registry.items()]
+
+
+@native("len", None)
+def length(token: Token, value: object) -> float:
+    if isinstance(value, (NumericArray, str)):
+        return float(len(value))
+    raise PyLOXRuntimeError(token, "len was expecting an array or a string "
+                                   "instead received {type}".format(
+        type=type(value)))
+
+
+@native("array", None)
+def new_array(token: Token, size: object) -> NumericArray:
+    if type(size) != float or not size.is_integer() or size < 0:
+        raise PyLOXRuntimeError(token, "array size must be a non negative "
+                                       "integer instead found {size}".format(
+            size=size))
+    return NumericArray.zeros(int(size))
+
+
+@native("substr", str, float, float)
+def substring(token: Token, string: str, start: float, size: float) -> str:
+    if not start.is_integer() or not size.is_integer() or start < 0 or \
+            size < 0 or start + size > len(string):
+        raise PyLOXRuntimeError(token, "substr was expecting a start and a "
+                                       "size within a string of length "
+                                       "{length} instead received {start} and "
+                                       "{size}".format(
+            length=len(string), start=start, size=size))
+    return string[int(start):int(start + size)]
+
+
+# seconds from an arbitrary point, for measuring durations
+bind("clock", time.perf_counter)
+bind("sqrt", math.sqrt, float)
@@ -0,0 +1,120 @@
+"""
+Numeric arrays of the language
+elements are stored as doubles in a numpy array when numpy is installed and
+in an array('d') otherwise
+element wise operations run over the whole buffer at once, either as a numpy
+operation or as a map of an operator function which loops in C
+comparisons produce arrays of 1 and 0
+numpy is imported when the first array is made, programs without arrays do
+not pay for its import
+"""
+import operator as operators
+from array import array
+from itertools import repeat
+from typing import Callable, Iterable, Union
+
+# the numpy module, None until it is loaded or when it is not installed
+numpy = None
+numpy_loaded = False
+
+COMPARISONS = {operators.gt, operators.ge, operators.lt, operators.le}
+
+
+def load_numpy() -> None:
+    global numpy, numpy_loaded
+    if numpy_loaded:
+        return
+    try:
+        import numpy as module
+    except ImportError:
+        module = None
+    # the module is set before the flag, so no thread sees the flag without
+    # the module and makes a typed array
+    numpy = module
+    numpy_loaded = True
+
+
+class NumericArray(object):
+    def __init__(self, values):
+        self.values = values
+
+    @classmethod
+    def from_values(cls, values: Iterable[float]) -> "NumericArray":
+        load_numpy()
+        if numpy is not None:
+            return cls(numpy.fromiter(values, dtype=numpy.float64))
+        return cls(array("d", values))
+
+    @classmethod
+    def zeros(cls, size: int) -> "NumericArray":
+        load_numpy()
+        if numpy is not None:
+            return cls(numpy.zeros(size))
+        return cls(array("d", bytes(8 * size)))
+
+    def __setstate__(self, state):
+        # arrays restored from a snapshot are made without from_values
+        load_numpy()
+        self.__dict__.update(state)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index: int) -> float:
+        # numpy scalars are not python floats
+        return float(self.values[index])
+
+    def __setitem__(self, index: int, value: float) -> None:
+        self.values[index] = value
+
+    def slice(self, start: int, stop: int) -> "NumericArray":
+        # slices are copies, numpy slices would be views
+        values = self.values[start:stop]
+        if numpy is not None:
+            values = values.copy()
+        return NumericArray(values)
+
+    def __eq__(self, rhs: object) -> bool:
+        if not isinstance(rhs, NumericArray):
+            return False
+        if len(self) != len(rhs):
+            return False
+        if numpy is not None:
+            return bool((self.values == rhs.values).all())
+        return self.values == rhs.values
+
+    def __str__(self):
+        elements = []
+        for value in self.values:
+            value = str(float(value))
+            if value[-2:] == ".0":
+                value = value[:-2]
+            elements.append(value)
+        return "[{elements}]".format(elements=", ".join(elements))
+
+    @staticmethod
+    def apply(function: Callable[[float, float], object],
+              lhs: Union["NumericArray", float],
+              rhs: Union["NumericArray", float]) -> "NumericArray":
+        # raises ValueError if lengths differ and ZeroDivisionError if a
+        # divisor is zero
+        lhs_values = lhs.values if isinstance(lhs, NumericArray) else lhs
+        rhs_values = rhs.values if isinstance(rhs, NumericArray) else rhs
+        if isinstance(lhs, NumericArray) and isinstance(rhs, NumericArray) \
+                and len(lhs) != len(rhs):
+            raise ValueError("arrays have different lengths")
+        if function is operators.truediv and \
+                (rhs_values == 0 if isinstance(rhs, float) else 0 in rhs_values):
+            raise ZeroDivisionError("division by zero")
+
+        if numpy is not None:
+            values = function(lhs_values, rhs_values)
+            if function in COMPARISONS:
+                values = values.astype(numpy.float64)
+            return NumericArray(values)
+
+        if isinstance(lhs, float):
+            lhs_values = repeat(lhs)
+        if isinstance(rhs, float):
+            rhs_values = repeat(rhs)
+        return NumericArray(array("d", map(function, lhs_values, rhs_values)))
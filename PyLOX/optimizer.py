@@ -0,0 +1,28 @@
+from typing import List
+
+from PyLOX.dead_store import DeadStoreElimination
+from PyLOX.fusion import Fusion
+from PyLOX.loop_invariant import LoopInvariantMotion
+from PyLOX.slots import resolve_slots
+from PyLOX.statements import Stmt
+from PyLOX.type_inference import TypeInference
+
+
+def optimize(program: List[Stmt], whole_program: bool = False,
+             verbose: bool = False) -> List[Stmt]:
+    program = LoopInvariantMotion().optimize(program)
+    program = TypeInference(whole_program).infer(program)
+    # globals of a prompt are read by the following prompts
+    dead_stores = DeadStoreElimination(keep_globals=not whole_program)
+    program = dead_stores.optimize(program)
+    if verbose:
+        print(dead_stores.statistics())
+    # function locals are moved to slots after the passes that only see
+    # variables
+    program = resolve_slots(program)
+    # fused nodes are only run, passes before see the unfused ones
+    fusion = Fusion()
+    program = fusion.fuse(program)
+    if verbose:
+        print(fusion.statistics())
+    return program
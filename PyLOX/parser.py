@@ -1,23 +1,33 @@
-from typing import Callable, List
+from typing import List, Optional, TextIO, Tuple
 
 from PyLOX.base_scanner import BaseScanner
+from PyLOX.classes import InlineCache
 from PyLOX.exceptions import PyLOXParserError
 from PyLOX.expressions import Expr, Binary, Grouping, Literal, Unary, \
-    Variable, Assignment, Logical
+    Variable, Assignment, Logical, Deep, Array, Index, Slice, \
+    IndexAssignment, Call, Property, PropertyAssignment, This, Super
 from PyLOX.statements import Stmt, Print, Var, Expression, Block, If, While, \
-    Break
-from PyLOX.token import TokenType
+    Break, For, LazyBlock, Function, Return, Class, Import
+from PyLOX.token import Token, TokenType
 
 """
 Parsing rules:
-    program             : declaration* EOF
-    declaration         : variableDeclaration | statement
+    program             : ( importStatement | declaration )* EOF
+    importStatement     : "import" STRING ";"
+    declaration         : classDeclaration | functionDeclaration
+                                | variableDeclaration | statement
     
+    classDeclaration    : "class" IDENTIFIER ( "<" IDENTIFIER )? "{" function* "}"
+    functionDeclaration : "fun" function
+                          a "// @memo" comment right before it caches the
+                          results of the function
+    function            : IDENTIFIER "(" parameters? ")" block
+    parameters          : IDENTIFIER ( "," IDENTIFIER )*
     variableDeclaration : "var" IDENTIFIER ( "=" expression )? ";"
     
     statement           : expressionStatement | printStatement | block 
                                 | ifStatement | whileStatement | forStatement
-                                | breakStatement
+                                | breakStatement | returnStatement
     expressionStatement : expression ";"
     printStatement      : "print" expression ";"
     block               : "{" declaration* "}"
@@ -26,45 +36,165 @@ Parsing rules:
     forStatement        : "for" "(" ( variableDeclaration | expressionStatement | ";" )
                                     expression ? ";" expression ? ")" statement
     breakStatement      : "break" ";"
+    returnStatement     : "return" expression? ";"
     
     expression          : assignment
-    assignment          : IDENTIFIER "=" assignment | logical_or
+    assignment          : ( IDENTIFIER | call "[" expression "]"
+                                | call "." IDENTIFIER ) "=" assignment
+                                | logical_or
     logical_or          : logical_and ( "or" logical_and )*
     logical_and         : equality ( "and" equality )*
     equality            : comparison ( ( "!=" | "==" ) comparison )*
     comparison          : addition ( ( ">" | ">=" | "<" | "<=" ) addition )*
     addition            : multiplication ( ( "+" | "-" ) multiplication )*
     multiplication      : unary ( ( "*" | "/" ) ) unary )*
-    unary               : ( "!" | "-" ) unary | primary
+    unary               : ( "!" | "-" ) unary | call
+    call                : primary ( "(" arguments? ")" | "[" subscript "]"
+                                | "." IDENTIFIER )*
+    subscript           : expression | expression? ":" expression?
+    arguments           : expression ( "," expression )*
     primary             : NUMBER | STRING | IDENTIFIER | "false" | "true" 
                                 | "nil"  | "(" expression ")"
+                                | "[" arguments? "]" | "this"
+                                | "super" "." IDENTIFIER
+
+Expression rules are parsed by precedence climbing over the tables below,
+higher numbers bind tighter
 """
 
+BINARY_PRECEDENCE = {
+    TokenType.EQUAL: 1,
+    TokenType.OR: 2,
+    TokenType.AND: 3,
+    TokenType.BANG_EQUAL: 4,
+    TokenType.EQUAL_EQUAL: 4,
+    TokenType.GREATER: 5,
+    TokenType.GREATER_EQUAL: 5,
+    TokenType.LESS: 5,
+    TokenType.LESS_EQUAL: 5,
+    TokenType.PLUS: 6,
+    TokenType.MINUS: 6,
+    TokenType.STAR: 7,
+    TokenType.SLASH: 7,
+}
+PREFIX_OPERATORS = {TokenType.BANG, TokenType.MINUS}
+PREFIX_PRECEDENCE = 8
+RIGHT_ASSOCIATIVE = {TokenType.EQUAL}
+LOGICAL_OPERATORS = {TokenType.AND, TokenType.OR}
+
+# expressions deeper than this are evaluated with an explicit stack
+DEEP_EXPRESSION_DEPTH = 64
+
 
 class Parser(BaseScanner):
-    def __init__(self, *args, **kwargs):
-        super(Parser, self).__init__(*args, **kwargs)
+    def __init__(self, source: List[Token], lazy: bool = False,
+                 check: bool = False, stream: Optional[TextIO] = None):
+        super(Parser, self).__init__(source)
         self.valid = True
+        # errors are printed to the stream, standard output if it is None
+        self.stream = stream
+        # lazy parser only matches the braces of blocks, their bodies are
+        # parsed when they are executed for the first time
+        self.lazy = lazy
+        # checked lazy parser reports the errors in bodies immediately
+        self.check = check
+        # number of functions and loops the parser is in, the loops are
+        # counted from the innermost function
+        self.functions = 0
+        self.loops = 0
+        # classes the parser is in, whether they have a superclass
+        self.classes = []
+        # whether the innermost function is an initializer
+        self.initializer = False
 
     def parse(self) -> List[Stmt]:
+        # comments are skipped after every token but the first ones, they
+        # stay in the source to be read as pragmas
+        while self.peek() == TokenType.COMMENT:
+            super(Parser, self).advance()
         return self.program()
 
     def program(self) -> List[Stmt]:
         declarations = []
         while not self.match([TokenType.EOF]):
             try:
-                declarations.append(self.declaration())
+                if self.peek() == TokenType.IMPORT:
+                    declarations.append(self.import_statement(top_level=True))
+                else:
+                    declarations.append(self.declaration())
             except PyLOXParserError as e:
                 self.valid = False
-                print(e)
+                print(e, file=self.stream)
                 self.synchronize()
         return declarations
 
     def declaration(self) -> Stmt:
+        memo = self.pragma("memo")
+        if self.match([TokenType.CLASS]):
+            return self.class_declaration()
+        if self.match([TokenType.FUNC]):
+            return self.function_declaration(memo)
         if self.match([TokenType.VAR]):
             return self.variable_declaration()
         return self.statement()
 
+    def pragma(self, name: str) -> bool:
+        # pragmas are line comments like "// @memo" before the current token
+        index = self.head - 1
+        while index >= 0 and self.source[index] == TokenType.COMMENT:
+            if self.source[index].lexeme[2:].strip() == "@" + name:
+                return True
+            index -= 1
+        return False
+
+    def class_declaration(self) -> Stmt:
+        # class is already consumed
+        name = self.consume(TokenType.IDENTIFIER, "IDENTIFIER")
+        if self.match([TokenType.LESS]):
+            superclass = Variable(self.consume(TokenType.IDENTIFIER,
+                                               "IDENTIFIER"))
+            if superclass.name.lexeme == name.lexeme:
+                self.error(superclass.name, "a class can not inherit from "
+                                            "itself")
+        else:
+            superclass = None
+        self.consume(TokenType.LEFT_BRACE, "{")
+        methods = []
+        self.classes.append(superclass is not None)
+        try:
+            while self.peek() != TokenType.RIGHT_BRACE and \
+                    not self.is_finished():
+                methods.append(self.function_declaration(method=True))
+        finally:
+            self.classes.pop()
+        self.consume(TokenType.RIGHT_BRACE, "}")
+        return Class(name, superclass, methods)
+
+    def function_declaration(self, memo: bool = False,
+                             method: bool = False) -> Stmt:
+        # fun is already consumed, methods do not have it
+        name = self.consume(TokenType.IDENTIFIER, "IDENTIFIER")
+        self.consume(TokenType.LEFT_PAREN, "(")
+        parameters = []
+        if self.peek() != TokenType.RIGHT_PAREN:
+            parameters.append(self.consume(TokenType.IDENTIFIER, "IDENTIFIER"))
+            while self.match([TokenType.COMMA]):
+                parameters.append(self.consume(TokenType.IDENTIFIER,
+                                               "IDENTIFIER"))
+        self.consume(TokenType.RIGHT_PAREN, ")")
+        # function bodies are never lazy, their locals are resolved to slots
+        # before they run
+        lazy, loops, initializer = self.lazy, self.loops, self.initializer
+        self.lazy, self.loops = False, 0
+        self.initializer = method and name.lexeme == "init"
+        self.functions += 1
+        try:
+            body = self.eager_block()
+        finally:
+            self.lazy, self.loops, self.initializer = lazy, loops, initializer
+            self.functions -= 1
+        return Function(name, parameters, body.statements, None, memo)
+
     def variable_declaration(self) -> Stmt:
         # var is already consumed
         identifier = self.consume(TokenType.IDENTIFIER, "IDENTIFIER")
@@ -83,9 +213,22 @@ class Parser(BaseScanner):
             TokenType.WHILE: self.while_statement,
             TokenType.FOR: self.for_statement,
             TokenType.BREAK: self.break_statement,
+            TokenType.RETURN: self.return_statement,
+            TokenType.IMPORT: self.import_statement,
         }
         return branches.get(self.peek(), self.expression_statement)()
 
+    def import_statement(self, top_level: bool = False) -> Stmt:
+        keyword = self.peek()
+        self.consume(TokenType.IMPORT, "import")
+        if not top_level:
+            # modules define their names in the globals of the importer
+            raise PyLOXParserError(keyword, "import statement seen outside of "
+                                            "the top level")
+        path = self.consume(TokenType.STRING, "STRING")
+        self.consume(TokenType.SEMICOLON, ";")
+        return Import(keyword, path)
+
     def print_statement(self) -> Stmt:
         self.consume(TokenType.PRINT, "print")
         expr = self.expression()
@@ -98,6 +241,34 @@ class Parser(BaseScanner):
         return Expression(expr)
 
     def block(self) -> Stmt:
+        if self.lazy:
+            return self.lazy_block()
+        return self.eager_block()
+
+    def lazy_block(self) -> Stmt:
+        brace = self.peek()
+        start = self.head
+        self.consume(TokenType.LEFT_BRACE, "{")
+        depth = 1
+        while depth > 0:
+            token = self.peek()
+            if token == TokenType.EOF:
+                raise PyLOXParserError(token, 'Parser was expecting "}}" '
+                                              'instead found "{found}"'.format(
+                    found=token))
+            if token == TokenType.LEFT_BRACE:
+                depth += 1
+            elif token == TokenType.RIGHT_BRACE:
+                depth -= 1
+            self.advance()
+        tokens = self.source[start:self.head]
+        if self.check:
+            checker = Parser(tokens + [self.peek()], stream=self.stream)
+            checker.eager_block()
+            self.valid = self.valid and checker.valid
+        return LazyBlock(brace, tokens, None)
+
+    def eager_block(self) -> Stmt:
         self.consume(TokenType.LEFT_BRACE, "{")
         declarations = []
         while self.peek() != TokenType.RIGHT_BRACE and not self.is_finished():
@@ -123,7 +294,7 @@ class Parser(BaseScanner):
         self.consume(TokenType.LEFT_PAREN, "(")
         condition = self.expression()
         self.consume(TokenType.RIGHT_PAREN, ")")
-        statement = self.statement()
+        statement = self.loop_body()
         return While(condition, statement)
 
     def for_statement(self) -> Stmt:
@@ -146,107 +317,231 @@ class Parser(BaseScanner):
             update = self.expression()
             self.consume(TokenType.RIGHT_PAREN, ")")
 
-        body = self.statement()
-        if update is not None:
-            body = Block([body, Expression(update)])
-        body = While(condition, body)
-        if initializer is not None:
-            body = Block([initializer, body])
-        return body
+        body = self.loop_body()
+        return For(initializer, condition, update, body)
+
+    def loop_body(self) -> Stmt:
+        self.loops += 1
+        try:
+            return self.statement()
+        finally:
+            self.loops -= 1
 
     def break_statement(self) -> Stmt:
         token = self.peek()
         self.consume(TokenType.BREAK, "break")
+        if self.functions > 0 and self.loops == 0:
+            # it would break the loop of the caller
+            raise PyLOXParserError(token, "break statement seen outside of a "
+                                          "loop")
         self.consume(TokenType.SEMICOLON, ";")
         return Break(token)
 
+    def return_statement(self) -> Stmt:
+        keyword = self.peek()
+        self.consume(TokenType.RETURN, "return")
+        if self.functions == 0:
+            raise PyLOXParserError(keyword, "return statement seen outside of "
+                                            "a function")
+        if self.peek() == TokenType.SEMICOLON:
+            value = None
+        else:
+            if self.initializer:
+                # initializers always return their instance
+                self.error(keyword, "a value can not be returned from an "
+                                    "initializer")
+            value = self.expression()
+        self.consume(TokenType.SEMICOLON, ";")
+        return Return(keyword, value)
+
     def expression(self) -> Expr:
-        return self.assignment()
+        # operator precedence parsing with explicit stacks so deeply nested
+        # expressions do not recurse, parentheses are pushed as markers
+        operands = []
+        operators = []
+        open_parentheses = 0
+        while True:
+            # expecting an operand
+            token = self.peek()
+            if token.type in PREFIX_OPERATORS:
+                self.advance()
+                operators.append((token, PREFIX_PRECEDENCE))
+                continue
+            if token.type == TokenType.LEFT_PAREN:
+                self.advance()
+                operators.append((token, None))
+                open_parentheses += 1
+                continue
+            operands.append((self.call(), 1))
+
+            # expecting an operator or a closing parenthesis
+            while True:
+                token = self.peek()
+                precedence = BINARY_PRECEDENCE.get(token.type)
+                if precedence is not None:
+                    break
+                if token.type != TokenType.RIGHT_PAREN or open_parentheses == 0:
+                    self.reduce_all(operands, operators)
+                    return self.finish_expression(operands)
+                self.advance()
+                while operators[-1][1] is not None:
+                    self.reduce(operands, operators)
+                operators.pop()
+                open_parentheses -= 1
+                expr, depth = operands.pop()
+                # a parenthesised primary can be called, indexed and have
+                # properties like any other
+                grouping = Grouping(expr)
+                expr = self.postfix(grouping)
+                operands.append((expr, depth + (1 if expr is grouping else 2)))
+
+            while operators and operators[-1][1] is not None and \
+                    (operators[-1][1] > precedence or
+                     operators[-1][1] == precedence and
+                     token.type not in RIGHT_ASSOCIATIVE):
+                self.reduce(operands, operators)
+            self.advance()
+            operators.append((token, precedence))
+
+    def reduce(self, operands: List[Tuple[Expr, int]],
+               operators: List[Tuple[Token, int]]) -> None:
+        operator, precedence = operators.pop()
+        right, right_depth = operands.pop()
+        if precedence == PREFIX_PRECEDENCE:
+            operands.append((Unary(operator, right), right_depth + 1))
+            return
+        left, left_depth = operands.pop()
+        depth = max(left_depth, right_depth) + 1
+        if operator.type == TokenType.EQUAL:
+            if isinstance(left, Index):
+                operands.append((IndexAssignment(left.array, left.bracket,
+                                                 left.index, right), depth))
+                return
+            if isinstance(left, Property):
+                operands.append((PropertyAssignment(left.object, left.name,
+                                                    right, left.cache), depth))
+                return
+            if not isinstance(left, Variable):
+                self.error(operator, "Invalid assignment target")
+                operands.append((right, right_depth))
+                return
+            operands.append((Assignment(left.name, right), depth))
+        elif operator.type in LOGICAL_OPERATORS:
+            operands.append((Logical(left, operator, right), depth))
+        else:
+            operands.append((Binary(left, operator, right), depth))
+
+    def reduce_all(self, operands: List[Tuple[Expr, int]],
+                   operators: List[Tuple[Token, int]]) -> None:
+        while operators:
+            if operators[-1][1] is None:
+                # an opening parenthesis was never closed
+                raise PyLOXParserError(self.peek(), 'Parser was expecting ")"'
+                                                    ' instead found "{found}"'
+                                       .format(found=self.peek()))
+            self.reduce(operands, operators)
+
+    def finish_expression(self, operands: List[Tuple[Expr, int]]) -> Expr:
+        expr, depth = operands.pop()
+        if depth > DEEP_EXPRESSION_DEPTH:
+            # interpreter evaluates these without recursion
+            return Deep(expr)
+        return expr
 
-    def assignment(self) -> Expr:
-        expr = self.logical_or()
-        if self.match([TokenType.EQUAL]):
-            if not isinstance(expr, Variable):
-                print(PyLOXParserError(self.peek(-1), "Invalid assignment target"))
-                self.valid = False
-                return self.assignment()
+    def call(self) -> Expr:
+        return self.postfix(self.primary())
 
-            assignee = self.assignment()
-            return Assignment(expr.name, assignee)
-        return expr
+    def postfix(self, expr: Expr) -> Expr:
+        while True:
+            token = self.peek()
+            if token.type == TokenType.LEFT_PAREN:
+                self.advance()
+                arguments = self.arguments(TokenType.RIGHT_PAREN)
+                self.consume(TokenType.RIGHT_PAREN, ")")
+                expr = Call(expr, token, arguments)
+            elif token.type == TokenType.LEFT_BRACKET:
+                self.advance()
+                expr = self.subscript(expr, token)
+                self.consume(TokenType.RIGHT_BRACKET, "]")
+            elif token.type == TokenType.DOT:
+                self.advance()
+                name = self.consume(TokenType.IDENTIFIER, "IDENTIFIER")
+                expr = Property(expr, name, InlineCache())
+            else:
+                return expr
 
-    def logical_or(self) -> Expr:
-        left = self.logical_and()
-        while self.match([TokenType.OR]):
-            operator = self.peek(-1)
-            right = self.logical_and()
-            left = Logical(left, operator, right)
-        return left
-
-    def logical_and(self) -> Expr:
-        left = self.equality()
-        while self.match([TokenType.AND]):
-            operator = self.peek(-1)
-            right = self.equality()
-            left = Logical(left, operator, right)
-        return left
-
-    def binary_expression(self, types: List[TokenType],
-                          child_parser: Callable) -> Expr:
-        left = child_parser()
-        while self.match(types):
-            operator = self.peek(-1)
-            right = child_parser()
-            left = Binary(left, operator, right)
-        return left
-
-    def equality(self) -> Expr:
-        return self.binary_expression([TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL],
-                                      self.comparison)
-
-    def comparison(self) -> Expr:
-        return self.binary_expression([TokenType.LESS, TokenType.LESS_EQUAL,
-                                       TokenType.GREATER, TokenType.GREATER_EQUAL],
-                                      self.addition)
-
-    def addition(self) -> Expr:
-        return self.binary_expression([TokenType.PLUS, TokenType.MINUS],
-                                      self.multiplication)
-
-    def multiplication(self) -> Expr:
-        return self.binary_expression([TokenType.STAR, TokenType.SLASH],
-                                      self.unary)
-
-    def unary(self) -> Expr:
-        if self.match([TokenType.BANG, TokenType.MINUS]):
-            operator = self.peek(-1)
-            right = self.unary()
-            return Unary(operator, right)
-        return self.primary()
+    def subscript(self, array: Expr, bracket: Token) -> Expr:
+        # [ is already consumed
+        if self.peek() == TokenType.COLON:
+            start = None
+        else:
+            start = self.expression()
+            if self.peek() != TokenType.COLON:
+                return Index(array, bracket, start)
+        self.consume(TokenType.COLON, ":")
+        if self.peek() == TokenType.RIGHT_BRACKET:
+            stop = None
+        else:
+            stop = self.expression()
+        return Slice(array, bracket, start, stop)
+
+    def arguments(self, closing: TokenType) -> List[Expr]:
+        # opening token is already consumed, closing one is not
+        arguments = []
+        if self.peek() == closing:
+            return arguments
+        arguments.append(self.expression())
+        while self.match([TokenType.COMMA]):
+            arguments.append(self.expression())
+        return arguments
 
     def primary(self) -> Expr:
-        if self.match([TokenType.FALSE]):
+        token = self.peek()
+        kind = token.type
+        if kind == TokenType.NUMBER or kind == TokenType.STRING:
+            self.advance()
+            return Literal(token.literal)
+        if kind == TokenType.IDENTIFIER:
+            self.advance()
+            return Variable(token)
+        if kind == TokenType.FALSE:
+            self.advance()
             return Literal(False)
-        if self.match([TokenType.TRUE]):
+        if kind == TokenType.TRUE:
+            self.advance()
             return Literal(True)
-        if self.match([TokenType.NIL]):
+        if kind == TokenType.NIL:
+            self.advance()
             return Literal(None)
-        if self.match([TokenType.STRING, TokenType.NUMBER]):
-            token = self.peek(-1)
-            return Literal(token.literal)
-        if self.match([TokenType.IDENTIFIER]):
-            token = self.peek(-1)
-            return Variable(token)
-        if self.match([TokenType.LEFT_PAREN]):
-            expr = self.expression()
-            self.consume(TokenType.RIGHT_PAREN, ")")
-            return Grouping(expr)
+        if kind == TokenType.LEFT_BRACKET:
+            self.advance()
+            elements = self.arguments(TokenType.RIGHT_BRACKET)
+            self.consume(TokenType.RIGHT_BRACKET, "]")
+            return Array(token, elements)
+        if kind == TokenType.THIS:
+            self.advance()
+            if not self.classes:
+                self.error(token, "this can not be used outside of a class")
+            return This(token)
+        if kind == TokenType.SUPER:
+            self.advance()
+            if not self.classes or not self.classes[-1]:
+                self.error(token, "super can not be used outside of a "
+                                  "subclass")
+            self.consume(TokenType.DOT, ".")
+            method = self.consume(TokenType.IDENTIFIER, "IDENTIFIER")
+            return Super(token, method)
 
         # I am not sure what I was expecting
         raise PyLOXParserError(self.peek(), "Parser was expecting a literal "
                                             "instead found {token}".format(
             token=self.peek()))
 
+    def error(self, token: Token, message: str) -> None:
+        # reports an error that does not need the parser to synchronize
+        print(PyLOXParserError(token, message), file=self.stream)
+        self.valid = False
+
     def synchronize(self) -> None:
         # search for end/start of a statement
         while not self.match([TokenType.SEMICOLON]):
@@ -257,7 +552,8 @@ class Parser(BaseScanner):
                            TokenType.IF,
                            TokenType.WHILE,
                            TokenType.PRINT,
-                           TokenType.RETURN]):
+                           TokenType.RETURN,
+                           TokenType.IMPORT]):
                 # we need keyword for next statement
                 self.rewind()
                 return
@@ -0,0 +1,268 @@
+"""
+Profile guided optimization
+a recording run counts the operand types of every checked operator site and
+the iterations of every while and for loop and writes them to a profile
+file, later runs of the same source load the profile before the program
+starts
+sites are identified by their position in a walk of the optimized program,
+the profile is keyed by a hash of the source and the parser mode so it is
+only used for the tree it was recorded on, bodies of lazy blocks are parsed
+at runtime and are not profiled
+the executions of a site are the sum of the counts of its operand types,
+and the iterations of a loop are the executions of its body
+hot sites that only saw numbers, or strings for additions, are replaced with
+guarded variants that skip the checks while the operands keep that type,
+hot loops are compiled by the JIT on their first entry instead of warming up
+"""
+import hashlib
+import json
+from typing import Dict, List, Optional, Set, Tuple
+
+from PyLOX.exceptions import PyLOXRuntimeError
+from PyLOX.expressions import Expr, Binary, Unary, UncheckedBinary, \
+    UncheckedUnary, GuardedBinary, GuardedUnary
+from PyLOX.interpreter import Interpreter
+from PyLOX.environment import Environment
+from PyLOX.statements import Stmt, While, For
+from PyLOX.token import TokenType
+from PyLOX.transformer import Transformer, copy_tree
+
+PROFILE_VERSION = 2
+
+# executions after which a site is specialised
+HOT_SITE_EXECUTIONS = 100
+
+# iterations after which a loop is compiled on its first entry
+HOT_LOOP_ITERATIONS = 1000
+
+SPECIALISED_BINARY = {
+    float: {TokenType.PLUS, TokenType.MINUS, TokenType.STAR, TokenType.SLASH,
+            TokenType.GREATER, TokenType.GREATER_EQUAL, TokenType.LESS,
+            TokenType.LESS_EQUAL},
+    str: {TokenType.PLUS},
+}
+SPECIALISED_UNARY = {
+    float: {TokenType.MINUS},
+}
+TYPES = {"float": float, "str": str}
+
+
+def profile_key(source: str, lazy: bool) -> str:
+    digest = hashlib.sha256(source.encode("utf-8"))
+    digest.update(b"lazy" if lazy else b"eager")
+    return digest.hexdigest()
+
+
+class SiteIndexer(Transformer):
+    # lists the profiled nodes in the order of a walk of the program
+    def __init__(self):
+        self.nodes = []
+
+    def index(self, program: List[Stmt]) -> List[object]:
+        self.transform(program)
+        return self.nodes
+
+    def visit_binary(self, expr: Binary) -> Expr:
+        self.nodes.append(expr)
+        return super(SiteIndexer, self).visit_binary(expr)
+
+    def visit_unary(self, expr: Unary) -> Expr:
+        self.nodes.append(expr)
+        return super(SiteIndexer, self).visit_unary(expr)
+
+    def visit_while(self, stmt: While) -> Stmt:
+        self.nodes.append(stmt)
+        return super(SiteIndexer, self).visit_while(stmt)
+
+    def visit_for(self, stmt: For) -> Stmt:
+        self.nodes.append(stmt)
+        return super(SiteIndexer, self).visit_for(stmt)
+
+
+class ProfilingInterpreter(Interpreter):
+    # records operand types and loop iterations while the program runs
+    def __init__(self, stream, globals=None):
+        super(ProfilingInterpreter, self).__init__(stream, globals)
+        self.sites = {}
+        self.loops = {}
+
+    def record(self, expr: Expr, types: tuple) -> None:
+        site = self.sites.get(expr)
+        if site is None:
+            site = self.sites[expr] = {}
+        site[types] = site.get(types, 0) + 1
+
+    def visit_binary(self, expr: Binary) -> object:
+        op = self.binary_operators.get(expr.operator.type, self.not_implemented)
+        lhs = expr.left.visit(self)
+        rhs = expr.right.visit(self)
+        self.record(expr, (type(lhs), type(rhs)))
+        return op(expr.operator, lhs, rhs)
+
+    def visit_unary(self, expr: Unary) -> object:
+        op = self.unary_operators.get(expr.operator.type, self.not_implemented)
+        inner = expr.right.visit(self)
+        self.record(expr, (type(inner),))
+        return op(expr.operator, inner)
+
+    # guarded sites of an applied profile are recorded again
+    visit_guarded_binary = visit_binary
+    visit_guarded_unary = visit_unary
+
+    def visit_while(self, stmt: While) -> object:
+        result = None
+        iterations = 0
+        try:
+            while self.is_true(stmt.condition.visit(self)):
+                iterations += 1
+                try:
+                    result = stmt.body.visit(self)
+                except PyLOXRuntimeError as e:
+                    if e.token != TokenType.BREAK:
+                        raise e
+                    break
+                if self.returning:
+                    break
+        finally:
+            self.loops[stmt] = self.loops.get(stmt, 0) + iterations
+        return result
+
+    def execute_loop(self, stmt: For) -> None:
+        statements, frame, fresh = self.loop_frame(stmt)
+        iterations = 0
+        try:
+            while self.is_true(stmt.condition.visit(self)):
+                iterations += 1
+                try:
+                    if fresh:
+                        self.execute_block(statements,
+                                           Environment(self.environment))
+                    elif frame is None:
+                        for child in statements:
+                            child.visit(self)
+                            if self.returning:
+                                break
+                    else:
+                        frame.memory.clear()
+                        self.execute_block(statements, frame)
+                except PyLOXRuntimeError as e:
+                    if e.token != TokenType.BREAK:
+                        raise e
+                    break
+                if self.returning:
+                    break
+                if stmt.update is not None:
+                    stmt.update.visit(self)
+        finally:
+            self.loops[stmt] = self.loops.get(stmt, 0) + iterations
+
+    def profile(self, program: List[Stmt], key: str) -> Dict[str, object]:
+        sites = {}
+        loops = {}
+        for position, node in enumerate(SiteIndexer().index(program)):
+            if node in self.sites:
+                sites[str(position)] = {
+                    "operator": node.operator.lexeme,
+                    "types": [[[value_type.__name__ for value_type in types],
+                               count]
+                              for types, count in self.sites[node].items()],
+                }
+            elif node in self.loops:
+                loops[str(position)] = self.loops[node]
+        return {"version": PROFILE_VERSION, "key": key, "sites": sites,
+                "loops": loops}
+
+
+def save_profile(path: str, profile: Dict[str, object]) -> None:
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=1, sort_keys=True)
+
+
+def load_profile(path: str, key: str) -> Optional[Dict[str, object]]:
+    # profiles of other sources or versions are ignored
+    try:
+        with open(path, "r") as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        print("Profile {path} can not be read: {error}".format(path=path,
+                                                                error=e))
+        return None
+    if profile.get("version") != PROFILE_VERSION or profile.get("key") != key:
+        print("Profile {path} was recorded for another source".format(
+            path=path))
+        return None
+    return profile
+
+
+class ProfileApplier(Transformer):
+    def __init__(self, profile: Dict[str, object], positions: Dict[int, int]):
+        self.sites = profile["sites"]
+        self.loops = profile["loops"]
+        self.positions = positions
+        self.hot_loops = set()
+        self.specialised = 0
+
+    def apply(self, program: List[Stmt]) -> List[Stmt]:
+        return self.transform(program)
+
+    def expected(self, expr: Expr, operands: int,
+                 specialised: Dict[type, Set[TokenType]]) -> Optional[type]:
+        # the single type every operand had at a hot site
+        site = self.sites.get(str(self.positions[id(expr)]))
+        if site is None or site["operator"] != expr.operator.lexeme or \
+                len(site["types"]) != 1:
+            return None
+        types, count = site["types"][0]
+        expected = TYPES.get(types[0])
+        if count < HOT_SITE_EXECUTIONS or types != [types[0]] * operands or \
+                expr.operator.type not in specialised.get(expected, ()):
+            return None
+        return expected
+
+    def visit_binary(self, expr: Binary) -> Expr:
+        expr = super(ProfileApplier, self).visit_binary(expr)
+        if isinstance(expr, UncheckedBinary):
+            return expr
+        expected = self.expected(expr, 2, SPECIALISED_BINARY)
+        if expected is None:
+            return expr
+        self.specialised += 1
+        return GuardedBinary(expr.left, expr.operator, expr.right, expected)
+
+    def visit_unary(self, expr: Unary) -> Expr:
+        expr = super(ProfileApplier, self).visit_unary(expr)
+        if isinstance(expr, UncheckedUnary):
+            return expr
+        expected = self.expected(expr, 1, SPECIALISED_UNARY)
+        if expected is None:
+            return expr
+        self.specialised += 1
+        return GuardedUnary(expr.operator, expr.right, expected)
+
+    def hot(self, stmt: Stmt) -> None:
+        iterations = self.loops.get(str(self.positions[id(stmt)]), 0)
+        if iterations >= HOT_LOOP_ITERATIONS:
+            self.hot_loops.add(stmt)
+
+    def visit_while(self, stmt: While) -> Stmt:
+        self.hot(stmt)
+        return super(ProfileApplier, self).visit_while(stmt)
+
+    def visit_for(self, stmt: For) -> Stmt:
+        self.hot(stmt)
+        return super(ProfileApplier, self).visit_for(stmt)
+
+
+def apply_profile(program: List[Stmt], profile: Dict[str, object],
+                  verbose: bool = False) -> Tuple[List[Stmt], Set[Stmt]]:
+    # returns a copy of the program with its hot sites specialised and its
+    # hot loops, the program itself may be cached or shared by other runs
+    program = copy_tree(program)
+    positions = {id(node): position for position, node
+                 in enumerate(SiteIndexer().index(program))}
+    applier = ProfileApplier(profile, positions)
+    program = applier.apply(program)
+    if verbose:
+        print("Profile: specialised {sites} sites, {loops} hot loops".format(
+            sites=applier.specialised, loops=len(applier.hot_loops)))
+    return program, applier.hot_loops
@@ -0,0 +1,157 @@
+"""
+Compiled programs
+a program holds the optimized statements of a source and running it does not
+change it, the interpreter that runs it is the context of the run: it holds
+the environment chain, the slots of the running function, the state of
+return statements and the output stream
+any number of interpreters can run one program at once from their own
+threads, the tree is only written while it runs by inline caches, which
+replace their entry at once, and by lazy blocks parsed on first execution
+programs are compiled and run on threads whose stack and recursion limit
+allow deep recursion, a lox call takes several python frames so the default
+limit would stop programs at a depth of about a hundred calls, the threads
+are kept and reused, and the limit is only raised while they run
+"""
+import os
+import queue
+import sys
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional, TypeVar
+
+from PyLOX.exceptions import PyLOXRuntimeError
+from PyLOX.interpreter import Interpreter
+from PyLOX.statements import Stmt
+
+# nested calls a program can make at least before a stack overflow is
+# reported
+MAX_CALL_DEPTH = 10000
+
+# python frames a call takes at most, with the blocks and expressions of its
+# body
+FRAMES_PER_CALL = 20
+
+# native stack of the threads that run programs, it is reserved and only
+# used as deep as the program recurses
+STACK_SIZE = 512 << 20
+
+# set on the threads that run programs
+deep_stack = threading.local()
+
+T = TypeVar("T")
+
+
+class DeepStack(object):
+    # threads with a deep stack that run functions for other threads, an idle
+    # thread is reused and a new one is started when all of them are busy
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        # a forked process does not have the threads of its parent
+        self.lock = threading.Lock()
+        # task queues of the idle threads
+        self.idle = []
+        self.running = 0
+        self.limit = None
+
+    def run(self, function: Callable[..., T], *args, **kwargs) -> T:
+        with self.lock:
+            tasks = self.idle.pop() if self.idle else None
+        if tasks is None:
+            tasks = queue.SimpleQueue()
+            size = threading.stack_size(STACK_SIZE)
+            try:
+                threading.Thread(target=self.work, args=(tasks,),
+                                 daemon=True).start()
+            finally:
+                threading.stack_size(size)
+        results = queue.SimpleQueue()
+        tasks.put((function, args, kwargs, results))
+        returned, value = results.get()
+        if not returned:
+            raise value
+        return value
+
+    def work(self, tasks: queue.SimpleQueue) -> None:
+        deep_stack.active = True
+        while True:
+            function, args, kwargs, results = tasks.get()
+            self.enter()
+            try:
+                outcome = (True, function(*args, **kwargs))
+            except BaseException as e:
+                outcome = (False, e)
+            finally:
+                self.leave()
+            with self.lock:
+                self.idle.append(tasks)
+            results.put(outcome)
+
+    def enter(self) -> None:
+        # the recursion limit is shared by every thread of the process
+        with self.lock:
+            if self.running == 0:
+                self.limit = sys.getrecursionlimit()
+                sys.setrecursionlimit(max(self.limit,
+                                          MAX_CALL_DEPTH * FRAMES_PER_CALL))
+            self.running += 1
+
+    def leave(self) -> None:
+        with self.lock:
+            self.running -= 1
+            if self.running == 0:
+                sys.setrecursionlimit(self.limit)
+
+
+workers = DeepStack()
+os.register_at_fork(after_in_child=workers.reset)
+
+
+def run_deep(function: Callable[..., T], *args, **kwargs) -> T:
+    # runs the function on a thread with a deep stack, its result or
+    # exception is passed to the caller
+    if getattr(deep_stack, "active", False):
+        return function(*args, **kwargs)
+    return workers.run(function, *args, **kwargs)
+
+
+class Program(object):
+    __slots__ = ("statements",)
+
+    def __init__(self, statements: Iterable[Stmt]):
+        object.__setattr__(self, "statements", tuple(statements))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("programs can not be changed")
+
+    def __len__(self):
+        return len(self.statements)
+
+    def __iter__(self) -> Iterator[Stmt]:
+        return iter(self.statements)
+
+    def __getitem__(self, index: int) -> Stmt:
+        return self.statements[index]
+
+    def run(self, interpreter: Interpreter) -> List[object]:
+        return run_deep(execute, self, interpreter)
+
+
+def execute(program: Iterable[Stmt], interpreter: Interpreter) -> List[object]:
+    return [interpreter.interpret(stmt) for stmt in program]
+
+
+def run_concurrently(program: Program, interpreters: List[Interpreter],
+                     jobs: Optional[int] = None) -> List[object]:
+    # runs the program in every interpreter on a pool of threads, a run that
+    # fails returns its runtime error instead of its outcomes
+    from concurrent.futures import ThreadPoolExecutor
+
+    def run(interpreter: Interpreter) -> object:
+        try:
+            return program.run(interpreter)
+        except PyLOXRuntimeError as e:
+            return e
+
+    with ThreadPoolExecutor(jobs or len(interpreters) or 1) as executor:
+        return list(executor.map(run, interpreters))
@@ -1,12 +1,14 @@
 from typing import Any, List
 
 from PyLOX.base_scanner import BaseScanner
-from PyLOX.token import TokenType, Token
+from PyLOX.token import TokenType, Token, LineIndex
 
 # characters
-valid_characters = set("1234567890qwertyuiopasdfghjklzxcvbnmQWERTYUIOPASDFGHJKLZXCVBNM*,;.+-_{}()*!=<>/" + '"')
+valid_characters = set("1234567890qwertyuiopasdfghjklzxcvbnmQWERTYUIOPASDFGHJKLZXCVBNM*,;.+-_{}()*!=<>/[]:" + '"')
 digits = set("0123456789")
 alpha = set("QWERTYUIOPASDFGHJKLZXCVBNM_qwertyuiopasdfghjklzxcvbnm")
+whitespaces = set(" \t")
+newlines = set("\r\n")
 
 # character to tokens
 single_character_tokens = {
@@ -19,7 +21,10 @@ single_character_tokens = {
     "(": TokenType.LEFT_PAREN,
     "{": TokenType.LEFT_BRACE,
     ")": TokenType.RIGHT_PAREN,
-    "}": TokenType.RIGHT_BRACE
+    "}": TokenType.RIGHT_BRACE,
+    "[": TokenType.LEFT_BRACKET,
+    "]": TokenType.RIGHT_BRACKET,
+    ":": TokenType.COLON
 }
 
 # maps to 3-tuple
@@ -48,15 +53,19 @@ keywords = {
     "true": TokenType.TRUE,
     "var": TokenType.VAR,
     "while": TokenType.WHILE,
-    "break": TokenType.BREAK
+    "break": TokenType.BREAK,
+    "import": TokenType.IMPORT
 }
 
 
 class Scanner(BaseScanner):
-    def __init__(self, source):
+    def __init__(self, source, line=0, stream=None):
         super(Scanner, self).__init__(source)
-        self.line = 0
-        self.column = 0
+        # errors are printed to the stream, standard output if it is None
+        self.stream = stream
+        # tokens only keep their offsets, lines and columns are computed
+        # from the index when they are requested
+        self.lines = LineIndex(source, line)
         self.valid = True
 
     def scan_tokens(self) -> List[Token]:
@@ -66,37 +75,26 @@ class Scanner(BaseScanner):
             token = self.scan_token()
             tokens.append(token)
 
-        tokens.append(Token(TokenType.EOF, "", None, self.line, self.column))
+        tokens.append(Token(TokenType.EOF, "", None, self.head, self.lines))
         return tokens
 
     def tokenize(self, type: TokenType, literal: Any = None) -> Token:
         # creates a token using recorded part of the source
+        offset = self.recording_head
         lexeme = self.stop_recording()
-        return Token(type, lexeme, literal, self.line, self.column)
-
-    def register_newline(self) -> None:
-        # register a newline
-        self.line += 1
-        self.column = 0
-
-    def advance(self):
-        # overwrite advance to increment column
-        self.column += 1
-        super(Scanner, self).advance()
+        return Token(type, lexeme, literal, offset, self.lines)
 
     def is_current_char_whitespace(self) -> bool:
         # returns true if current character corresponds to a whitespace
-        return self.peek() in set(" \t")
+        return self.peek() in whitespaces
 
     def is_current_char_newline(self) -> bool:
         # returns true if current character is a newline
-        return self.peek() in set("\r\n")
+        return self.peek() in newlines
 
     def consume_newline(self) -> None:
-        self.match("\r\n")
         while self.is_current_char_newline():
             self.consume()
-        self.register_newline()
 
     def consume_whitespace(self) -> None:
         while True:
@@ -224,8 +222,9 @@ class Scanner(BaseScanner):
         self.report("", message)
 
     def report(self, where: str, message: str) -> None:
+        line, column = self.lines.position(self.head)
         print("[line {line}, column {column}] {where}: {message}".format(
-            line=self.line,
-            column=self.column,
+            line=line,
+            column=column,
             where=where,
-            message=message))
+            message=message), file=self.stream)
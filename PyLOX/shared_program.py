@@ -0,0 +1,118 @@
+"""
+Programs shared between processes
+an optimized program is serialised into a single buffer that holds no
+addresses, so it can be placed in shared memory and read by every process
+that attaches to it
+the buffer starts with a header and a table of offsets, then the line
+indexes of the program, which hold its source, and one pickle for every top
+level statement, tokens refer to the line indexes by their position so the
+source is stored once
+attached programs decode a statement the first time it is requested, a
+process only builds the part of the tree it runs
+"""
+import io
+import pickle
+import struct
+from multiprocessing.shared_memory import SharedMemory
+from typing import List
+
+from PyLOX.statements import Stmt
+from PyLOX.token import LineIndex
+
+MAGIC = b"PLOX"
+FORMAT_VERSION = 1
+
+# magic, version and number of statements
+header = struct.Struct("<4sHI")
+offset = struct.Struct("<Q")
+
+
+class ProgramPickler(pickle.Pickler):
+    def __init__(self, file: io.BytesIO, lines: List[LineIndex]):
+        super(ProgramPickler, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.lines = lines
+
+    def persistent_id(self, obj: object) -> object:
+        if type(obj) is not LineIndex:
+            return None
+        for position, lines in enumerate(self.lines):
+            if lines is obj:
+                return position
+        self.lines.append(obj)
+        return len(self.lines) - 1
+
+
+class ProgramUnpickler(pickle.Unpickler):
+    def __init__(self, file: io.BytesIO, lines: List[LineIndex]):
+        super(ProgramUnpickler, self).__init__(file)
+        self.lines = lines
+
+    def persistent_load(self, pid: object) -> LineIndex:
+        return self.lines[pid]
+
+
+def encode(program: List[Stmt]) -> bytes:
+    # raises RecursionError for trees too deep to pickle
+    lines = []
+    statements = []
+    for stmt in program:
+        file = io.BytesIO()
+        ProgramPickler(file, lines).dump(stmt)
+        statements.append(file.getvalue())
+    sections = [pickle.dumps(lines, pickle.HIGHEST_PROTOCOL)] + statements
+    # the offsets of the sections and of the end of the buffer
+    start = header.size + offset.size * (len(sections) + 1)
+    offsets = []
+    for section in sections:
+        offsets.append(start)
+        start += len(section)
+    offsets.append(start)
+    return b"".join([header.pack(MAGIC, FORMAT_VERSION, len(statements))] +
+                    [offset.pack(position) for position in offsets] + sections)
+
+
+class SharedProgram(object):
+    # a sequence of the statements of a buffer, the memory the buffer lives
+    # in is kept open as long as the program is used
+    def __init__(self, buffer: memoryview, memory: SharedMemory = None):
+        magic, version, count = header.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("buffer does not hold a program of format "
+                             "{version}".format(version=FORMAT_VERSION))
+        self.buffer = buffer
+        self.memory = memory
+        self.offsets = [offset.unpack_from(buffer, header.size +
+                                           offset.size * index)[0]
+                        for index in range(count + 2)]
+        self.lines = pickle.loads(self.section(0))
+        self.statements = [None] * count
+
+    def section(self, index: int) -> memoryview:
+        return self.buffer[self.offsets[index]:self.offsets[index + 1]]
+
+    def __len__(self):
+        return len(self.statements)
+
+    def __getitem__(self, index: int) -> Stmt:
+        stmt = self.statements[index]
+        if stmt is None:
+            file = io.BytesIO(self.section(index + 1))
+            stmt = self.statements[index] = ProgramUnpickler(
+                file, self.lines).load()
+        return stmt
+
+
+def publish(program: List[Stmt]) -> SharedMemory:
+    # the caller unlinks the memory once no process attaches to it anymore
+    data = encode(program)
+    memory = SharedMemory(create=True, size=len(data))
+    memory.buf[:len(data)] = data
+    return memory
+
+
+def attach(name: str) -> SharedProgram:
+    # attaching registers the memory with the resource tracker, processes
+    # that share the tracker of the publisher, like the workers of the
+    # daemon, register it again, which changes nothing
+    memory = SharedMemory(name)
+    return SharedProgram(memory.buf, memory)
@@ -0,0 +1,201 @@
+"""
+Slot resolution of function locals
+parameters and variables declared inside a function are stored in a list
+that is allocated with its final size on every call, variables and
+assignments that refer to them are replaced with their slot indices
+variables captured by a nested function stay in environments so every
+closure keeps its own copy, blocks of a function that declare nothing in an
+environment are replaced with LocalBlock statements which do not create one
+captured parameters are copied from their slots into the environment of the
+call when the function starts
+calls in return statements are marked as tail calls
+methods are resolved like functions, names of classes and methods are never
+stored in slots
+"""
+from typing import Dict, List, Optional
+
+from PyLOX.expressions import Expr, Variable, Assignment, Deep, Call, \
+    LocalVariable, LocalAssignment, TailCall
+from PyLOX.statements import Stmt, Var, Block, For, Function, Return, \
+    LocalVar, LocalBlock, Class
+from PyLOX.token import Token
+from PyLOX.transformer import Transformer, walk
+
+
+class Binding(object):
+    def __init__(self, function: Optional[Function]):
+        # function is None for variables outside of functions
+        self.function = function
+        self.captured = False
+        self.slot = None
+
+    def is_local(self) -> bool:
+        return self.function is not None and not self.captured
+
+
+class SlotResolver(Transformer):
+    # maps declarations and references to bindings, finds captured variables
+    def __init__(self):
+        self.scopes = [{}]
+        self.functions = []
+        self.bindings = {}
+
+    def resolve(self, program: List[Stmt]) -> Dict[int, Binding]:
+        self.transform(program)
+        return self.bindings
+
+    def declare(self, name: Token, node: object) -> Binding:
+        binding = Binding(self.functions[-1] if self.functions else None)
+        self.scopes[-1][name.lexeme] = binding
+        self.bindings[id(node)] = binding
+        return binding
+
+    def reference(self, name: Token, node: Expr) -> None:
+        for scope in reversed(self.scopes):
+            if name.lexeme in scope:
+                binding = scope[name.lexeme]
+                current = self.functions[-1] if self.functions else None
+                if binding.function is not current:
+                    binding.captured = True
+                self.bindings[id(node)] = binding
+                return
+
+    def visit_var(self, stmt: Var) -> Stmt:
+        super(SlotResolver, self).visit_var(stmt)
+        self.declare(stmt.name, stmt)
+        return stmt
+
+    def visit_block(self, stmt: Block) -> Stmt:
+        self.scopes.append({})
+        super(SlotResolver, self).visit_block(stmt)
+        self.scopes.pop()
+        return stmt
+
+    def visit_for(self, stmt: For) -> Stmt:
+        self.scopes.append({})
+        super(SlotResolver, self).visit_for(stmt)
+        self.scopes.pop()
+        return stmt
+
+    def visit_function(self, stmt: Function) -> Stmt:
+        # function names are always kept in environments
+        self.declare(stmt.name, stmt).captured = True
+        return self.resolve_function(stmt)
+
+    def visit_class(self, stmt: Class) -> Stmt:
+        self.declare(stmt.name, stmt).captured = True
+        if stmt.superclass is not None:
+            stmt.superclass.visit(self)
+        for method in stmt.methods:
+            self.resolve_function(method)
+        return stmt
+
+    def resolve_function(self, stmt: Function) -> Stmt:
+        self.functions.append(stmt)
+        self.scopes.append({})
+        for parameter in stmt.parameters:
+            self.declare(parameter, parameter)
+        super(SlotResolver, self).visit_function(stmt)
+        self.scopes.pop()
+        self.functions.pop()
+        return stmt
+
+    def visit_variable(self, expr: Variable) -> Expr:
+        self.reference(expr.name, expr)
+        return expr
+
+    def visit_assignment(self, expr: Assignment) -> Expr:
+        super(SlotResolver, self).visit_assignment(expr)
+        self.reference(expr.name, expr)
+        return expr
+
+    def visit_deep(self, expr: Deep) -> Expr:
+        for node in walk(expr.expression):
+            if isinstance(node, (Variable, Assignment)):
+                self.reference(node.name, node)
+        return expr
+
+
+class SlotRewriter(Transformer):
+    def __init__(self, bindings: Dict[int, Binding]):
+        self.bindings = bindings
+        self.sizes = []
+
+    def local(self, node: object) -> Optional[Binding]:
+        binding = self.bindings.get(id(node))
+        if binding is not None and binding.is_local():
+            return binding
+        return None
+
+    def allocate(self, binding: Binding) -> int:
+        binding.slot = self.sizes[-1]
+        self.sizes[-1] += 1
+        return binding.slot
+
+    def replace(self, expr: Expr) -> Expr:
+        binding = self.local(expr)
+        if binding is None:
+            return expr
+        if isinstance(expr, Assignment):
+            return LocalAssignment(expr.name, binding.slot, expr.value)
+        return LocalVariable(expr.name, binding.slot)
+
+    def visit_function(self, stmt: Function) -> Stmt:
+        self.sizes.append(0)
+        prologue = []
+        for parameter in stmt.parameters:
+            binding = self.bindings[id(parameter)]
+            slot = self.allocate(binding)
+            if binding.captured:
+                prologue.append(Var(parameter, LocalVariable(parameter, slot)))
+        body = self.transform(stmt.body)
+        if prologue or self.declares(body):
+            # every call gets an environment for its captured variables
+            body = [Block(prologue + body)]
+        stmt.body = body
+        stmt.size = self.sizes.pop()
+        return stmt
+
+    def visit_var(self, stmt: Var) -> Stmt:
+        super(SlotRewriter, self).visit_var(stmt)
+        binding = self.local(stmt)
+        if binding is None:
+            return stmt
+        return LocalVar(stmt.name, stmt.value, self.allocate(binding))
+
+    def visit_block(self, stmt: Block) -> Stmt:
+        super(SlotRewriter, self).visit_block(stmt)
+        if self.sizes and not self.declares(stmt.statements):
+            return LocalBlock(stmt.statements)
+        return stmt
+
+    def visit_return(self, stmt: Return) -> Stmt:
+        super(SlotRewriter, self).visit_return(stmt)
+        if type(stmt.value) is Call:
+            stmt.value = TailCall(stmt.value.callee, stmt.value.paren,
+                                  stmt.value.arguments)
+        return stmt
+
+    def visit_variable(self, expr: Variable) -> Expr:
+        return self.replace(expr)
+
+    def visit_assignment(self, expr: Assignment) -> Expr:
+        super(SlotRewriter, self).visit_assignment(expr)
+        return self.replace(expr)
+
+    def visit_deep(self, expr: Deep) -> Expr:
+        # children are replaced in place, recursion could exhaust the stack
+        for node in walk(expr.expression):
+            for field, value in vars(node).items():
+                if isinstance(value, (Variable, Assignment)):
+                    setattr(node, field, self.replace(value))
+        return expr
+
+    def declares(self, stmts: List[Stmt]) -> bool:
+        # checks if statements declare a name in the environment
+        return any(isinstance(stmt, (Var, Function, Class)) for stmt in stmts)
+
+
+def resolve_slots(program: List[Stmt]) -> List[Stmt]:
+    bindings = SlotResolver().resolve(program)
+    return SlotRewriter(bindings).transform(program)
@@ -0,0 +1,107 @@
+"""
+Snapshots of the interpreter after a prelude
+a snapshot holds the global environment of an interpreter that ran a
+prelude, with every value reachable from it: functions with their
+declarations and closures, classes with their shapes, instances and arrays,
+and the environments of the modules it imported
+native functions are stored by their name and are replaced by the natives
+of the interpreter the snapshot is restored into
+snapshots are keyed by a hash of the prelude source and the parser mode and
+carry a format version and the modification time and size of every module
+the prelude imported, a snapshot that does not match, or whose modules
+changed, is ignored and the prelude is run again
+"""
+import hashlib
+import pickle
+from typing import Dict, Iterable, Optional, Tuple
+
+from PyLOX.functions import NativeFunction
+from PyLOX.interpreter import Interpreter
+from PyLOX.modules import module_version
+
+SNAPSHOT_VERSION = 5
+
+
+def snapshot_key(source: str, lazy: bool) -> str:
+    digest = hashlib.sha256(source.encode("utf-8"))
+    digest.update(b"lazy" if lazy else b"eager")
+    return digest.hexdigest()
+
+
+def module_versions(paths: Iterable[str]) \
+        -> Dict[str, Optional[Tuple[int, int]]]:
+    # None for a module that can not be read anymore
+    versions = {}
+    for path in paths:
+        try:
+            versions[path] = module_version(path)
+        except OSError:
+            versions[path] = None
+    return versions
+
+
+class SnapshotPickler(pickle.Pickler):
+    def persistent_id(self, obj: object) -> object:
+        if type(obj) is NativeFunction:
+            return obj.name
+        return None
+
+
+class SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, natives: Dict[str, NativeFunction]):
+        super(SnapshotUnpickler, self).__init__(file)
+        self.natives = natives
+
+    def persistent_load(self, pid: object) -> NativeFunction:
+        return self.natives[pid]
+
+
+def save_snapshot(path: str, interpreter: Interpreter, key: str) -> bool:
+    try:
+        with open(path, "wb") as f:
+            # the header is checked before the values are loaded
+            pickle.dump({"version": SNAPSHOT_VERSION, "key": key,
+                         "modules": module_versions(interpreter.modules)}, f)
+            SnapshotPickler(f, pickle.HIGHEST_PROTOCOL).dump({
+                "environment": interpreter.environment,
+                "memoized": interpreter.memoized,
+                "modules": interpreter.modules})
+    except (OSError, pickle.PicklingError, RecursionError) as e:
+        print("Snapshot {path} can not be written: {error}".format(
+            path=path, error=e))
+        return False
+    return True
+
+
+def restore_snapshot(path: str, interpreter: Interpreter, key: str) -> bool:
+    # returns False if the prelude has to be run
+    natives = {name: value for name, value
+               in interpreter.environment.memory.items()
+               if type(value) is NativeFunction}
+    try:
+        with open(path, "rb") as f:
+            header = pickle.load(f)
+            if not isinstance(header, dict) or \
+                    header.get("version") != SNAPSHOT_VERSION or \
+                    header.get("key") != key:
+                print("Snapshot {path} was taken for another prelude".format(
+                    path=path))
+                return False
+            modules = header.get("modules")
+            if not isinstance(modules, dict) or \
+                    module_versions(modules) != modules:
+                print("Snapshot {path} was taken before a module of the "
+                      "prelude changed".format(path=path))
+                return False
+            snapshot = SnapshotUnpickler(f, natives).load()
+    except FileNotFoundError:
+        return False
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+            ImportError, KeyError, TypeError) as e:
+        print("Snapshot {path} can not be read: {error}".format(path=path,
+                                                                 error=e))
+        return False
+    interpreter.environment = interpreter.globals = snapshot["environment"]
+    interpreter.memoized = snapshot["memoized"]
+    interpreter.modules = snapshot["modules"]
+    return True
@@ -43,7 +43,8 @@ class Block(Stmt):
 
 
 class If(Stmt):
-    def __init__(self, condition: Expr, then_statement: Stmt, else_statement: Stmt):
+    def __init__(self, condition: Expr, then_statement: Stmt,
+                 else_statement: Stmt):
         self.condition = condition
         self.then_statement = then_statement
         self.else_statement = else_statement
@@ -67,3 +68,99 @@ class Break(Stmt):
 
     def visit(self, visitor, *args, **kwargs):
         return visitor.visit_break(self, *args, **kwargs)
+
+
+class For(Stmt):
+    def __init__(self, initializer: Stmt, condition: Expr, update: Expr,
+                 body: Stmt):
+        self.initializer = initializer
+        self.condition = condition
+        self.update = update
+        self.body = body
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_for(self, *args, **kwargs)
+
+
+class Hoist(Stmt):
+    def __init__(self, temporaries: List[Token], loop: Stmt):
+        self.temporaries = temporaries
+        self.loop = loop
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_hoist(self, *args, **kwargs)
+
+
+class LazyBlock(Stmt):
+    def __init__(self, brace: Token, tokens: List[Token], body: Block):
+        self.brace = brace
+        self.tokens = tokens
+        self.body = body
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_lazy_block(self, *args, **kwargs)
+
+
+class Function(Stmt):
+    def __init__(self, name: Token, parameters: List[Token], body: List[Stmt],
+                 size: int, memo: bool):
+        self.name = name
+        self.parameters = parameters
+        self.body = body
+        self.size = size
+        self.memo = memo
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_function(self, *args, **kwargs)
+
+
+class Return(Stmt):
+    def __init__(self, keyword: Token, value: Expr):
+        self.keyword = keyword
+        self.value = value
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_return(self, *args, **kwargs)
+
+
+class LocalVar(Stmt):
+    def __init__(self, name: Token, value: Expr, slot: int):
+        self.name = name
+        self.value = value
+        self.slot = slot
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_local_var(self, *args, **kwargs)
+
+
+class LocalBlock(Stmt):
+    def __init__(self, statements: List[Stmt]):
+        self.statements = statements
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_local_block(self, *args, **kwargs)
+
+
+class Class(Stmt):
+    def __init__(self, name: Token, superclass: Expr, methods: List[Function]):
+        self.name = name
+        self.superclass = superclass
+        self.methods = methods
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_class(self, *args, **kwargs)
+
+
+class Import(Stmt):
+    def __init__(self, keyword: Token, path: Token):
+        self.keyword = keyword
+        self.path = path
+
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_import(self, *args, **kwargs)
+
+
+# statements of a single assignment, produced by the fusion pass
+class AssignmentStatement(Expression):
+    def visit(self, visitor, *args, **kwargs):
+        return visitor.visit_assignment_statement(self, *args, **kwargs)
@@ -1,12 +1,22 @@
-from enum import Enum, auto
+import re
+from bisect import bisect_right
+from itertools import count
 
+# numbers of the token types, from one so that every type is true
+auto = count(1).__next__
 
-class TokenType(Enum):
+
+class TokenType(int):
+    # token types are ints that know their name, they compare and hash as
+    # fast as ints and the types are plain class attributes, which are read
+    # faster than the members of an enum
     # Single-character tokens
     LEFT_PAREN = auto()
     RIGHT_PAREN = auto()
     LEFT_BRACE = auto()
     RIGHT_BRACE = auto()
+    LEFT_BRACKET = auto()
+    RIGHT_BRACKET = auto()
     COMMA = auto()
     DOT = auto()
     MINUS = auto()
@@ -14,6 +24,7 @@ class TokenType(Enum):
     SEMICOLON = auto()
     SLASH = auto()
     STAR = auto()
+    COLON = auto()
 
     # One or two charavter tokens
     BANG = auto()
@@ -48,6 +59,7 @@ class TokenType(Enum):
     VAR = auto()
     WHILE = auto()
     BREAK = auto()
+    IMPORT = auto()
 
     # internal use only
     MULTILINE_COMMENT = auto()
@@ -55,18 +67,68 @@ class TokenType(Enum):
     INVALID = auto()
     EOF = auto()
 
+    def __new__(cls, value: int, name: str):
+        self = super(TokenType, cls).__new__(cls, value)
+        self.name = name
+        return self
+
     def __str__(self):
         return self.name
 
+    def __repr__(self):
+        return "TokenType.{name}".format(name=self.name)
+
+    def __format__(self, spec: str) -> str:
+        return format(self.name, spec)
+
+    def __reduce__(self):
+        # unpickled types are the same objects as the ones of this process
+        return getattr, (TokenType, self.name)
+
+
+for name, value in list(vars(TokenType).items()):
+    if type(value) is int:
+        setattr(TokenType, name, TokenType(value, name))
+del name, value
+
+
+# every run of newline characters starts a single new line
+newline_runs = re.compile(r"[\r\n]+")
+
+
+class LineIndex(object):
+    # maps source offsets to lines and columns, the offsets of line starts
+    # are computed the first time a position is requested
+    def __init__(self, source: str, line: int = 0):
+        self.source = source
+        self.line = line
+        self.starts = None
+
+    def position(self, offset: int):
+        if self.starts is None:
+            self.starts = [0] + [match.end() for match in
+                                 newline_runs.finditer(self.source)]
+        index = bisect_right(self.starts, offset) - 1
+        return self.line + index, offset - self.starts[index]
+
 
 class Token(object):
     def __init__(self, type: TokenType, lexeme: str, literal: object,
-                 line: int, column: int):
+                 offset: int, lines: LineIndex):
         self.type = type
         self.lexeme = lexeme
         self.literal = literal
-        self.line = line
-        self.column = column
+        self.offset = offset
+        self.lines = lines
+
+    # positions refer to the end of the token
+    @property
+    def line(self) -> int:
+        return self.lines.position(self.offset + len(self.lexeme))[0]
+
+    @property
+    def column(self) -> int:
+        return self.lines.position(self.offset + len(self.lexeme))[1]
 
     def __str__(self):
         return "Token({type} {lexeme} {literal})".format(type=self.type,
@@ -74,13 +136,19 @@ class Token(object):
                                                          literal=self.literal)
 
     def __eq__(self, rhs: object) -> bool:
-        if isinstance(rhs, Token):
-            return self.type == rhs.type and self.literal == rhs.literal
-        elif isinstance(rhs, TokenType):
+        if type(rhs) is TokenType:
             return self.type == rhs
+        elif isinstance(rhs, Token):
+            return self.type == rhs.type and self.literal == rhs.literal
         raise ValueError("Expecting an instance of Token or TokeType, "
                          "instead received instance of{type}".format(
             type=type(rhs)))
 
     def __hash__(self):
         return hash(self.type)
+
+    def __reduce__(self):
+        # cheaper to unpickle than the instance dictionary, tokens are sent
+        # between processes by the parallel front end
+        return Token, (self.type, self.lexeme, self.literal, self.offset,
+                       self.lines)
@@ -0,0 +1,304 @@
+"""
+A base visitor for passes that rewrite the syntax tree
+every visit function transforms the children of the node in place and returns
+the node that should replace the visited one
+statements which are transformed into None are removed from their block
+subclasses overwrite the visit functions of the nodes they are interested in
+"""
+import copy
+from typing import Iterator, List, Set
+
+from PyLOX.expressions import Expr, Binary, Grouping, Literal, Unary, \
+    Variable, Assignment, Logical, Invariant, Deep, Array, Index, Slice, \
+    IndexAssignment, Call, LocalVariable, LocalAssignment, Property, \
+    PropertyAssignment, This, Super, Increment, LocalIncrement, Compare
+from PyLOX.statements import Stmt, Var, Print, Expression, Block, If, While, \
+    Break, For, Hoist, LazyBlock, Function, Return, LocalVar, LocalBlock, \
+    Class, AssignmentStatement, Import
+from PyLOX.token import TokenType
+
+
+def walk(expr: Expr) -> Iterator[Expr]:
+    # iterates over an expression tree without recursion
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        yield node
+        for value in vars(node).values():
+            if isinstance(value, Expr):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(item for item in value if isinstance(item, Expr))
+
+
+def copy_tree(program: List[Stmt]) -> List[Stmt]:
+    # copies the nodes of a program without recursion so a pass can rewrite
+    # them in place, tokens and values are shared
+    copies = {}
+    stack = list(program)
+    while stack:
+        node = stack.pop()
+        if id(node) in copies:
+            continue
+        copies[id(node)] = copy.copy(node)
+        for value in vars(node).values():
+            if isinstance(value, (Expr, Stmt)):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(item for item in value
+                             if isinstance(item, (Expr, Stmt)))
+    for node in copies.values():
+        for name, value in vars(node).items():
+            if isinstance(value, (Expr, Stmt)):
+                setattr(node, name, copies[id(value)])
+            elif isinstance(value, list):
+                setattr(node, name, [copies.get(id(item), item)
+                                     for item in value])
+    return [copies[id(stmt)] for stmt in program]
+
+
+def referenced_names(stmt: LazyBlock) -> Set[str]:
+    return {token.lexeme for token in stmt.tokens
+            if token.type == TokenType.IDENTIFIER}
+
+
+def mutates_arrays(stmt: LazyBlock) -> bool:
+    return any(token.type == TokenType.RIGHT_BRACKET and
+               following.type == TokenType.EQUAL
+               for token, following in zip(stmt.tokens, stmt.tokens[1:]))
+
+
+def has_calls(stmt: LazyBlock) -> bool:
+    return any(token.type in (TokenType.IDENTIFIER, TokenType.RIGHT_PAREN,
+                              TokenType.RIGHT_BRACKET) and
+               following.type == TokenType.LEFT_PAREN
+               for token, following in zip(stmt.tokens, stmt.tokens[1:]))
+
+
+def declares_functions(stmt: Stmt) -> bool:
+    # methods of classes are functions too
+    finder = FunctionFinder()
+    stmt.visit(finder)
+    return finder.found
+
+
+def assigned_names(stmt: LazyBlock) -> Set[str]:
+    return {token.lexeme for token, following in zip(stmt.tokens,
+                                                     stmt.tokens[1:])
+            if token.type == TokenType.IDENTIFIER and
+            following.type == TokenType.EQUAL}
+
+
+class Transformer(object):
+    def transform(self, program: List[Stmt]) -> List[Stmt]:
+        statements = [stmt.visit(self) for stmt in program]
+        return [stmt for stmt in statements if stmt is not None]
+
+    def visit_var(self, stmt: Var) -> Stmt:
+        if stmt.value is not None:
+            stmt.value = stmt.value.visit(self)
+        return stmt
+
+    def visit_expression(self, stmt: Expression) -> Stmt:
+        stmt.expression = stmt.expression.visit(self)
+        return stmt
+
+    def visit_assignment_statement(self, stmt: AssignmentStatement) -> Stmt:
+        return self.visit_expression(stmt)
+
+    def visit_print(self, stmt: Print) -> Stmt:
+        stmt.expression = stmt.expression.visit(self)
+        return stmt
+
+    def visit_block(self, stmt: Block) -> Stmt:
+        stmt.statements = self.transform(stmt.statements)
+        return stmt
+
+    def visit_if(self, stmt: If) -> Stmt:
+        stmt.condition = stmt.condition.visit(self)
+        stmt.then_statement = stmt.then_statement.visit(self)
+        if stmt.else_statement is not None:
+            stmt.else_statement = stmt.else_statement.visit(self)
+        return stmt
+
+    def visit_while(self, stmt: While) -> Stmt:
+        stmt.condition = stmt.condition.visit(self)
+        stmt.body = stmt.body.visit(self)
+        return stmt
+
+    def visit_for(self, stmt: For) -> Stmt:
+        if stmt.initializer is not None:
+            stmt.initializer = stmt.initializer.visit(self)
+        stmt.condition = stmt.condition.visit(self)
+        if stmt.update is not None:
+            stmt.update = stmt.update.visit(self)
+        stmt.body = stmt.body.visit(self)
+        return stmt
+
+    def visit_break(self, stmt: Break) -> Stmt:
+        return stmt
+
+    def visit_hoist(self, stmt: Hoist) -> Stmt:
+        stmt.loop = stmt.loop.visit(self)
+        return stmt
+
+    def visit_lazy_block(self, stmt: LazyBlock) -> Stmt:
+        # lazy blocks are optimized when they are parsed
+        return stmt
+
+    def visit_function(self, stmt: Function) -> Stmt:
+        stmt.body = self.transform(stmt.body)
+        return stmt
+
+    def visit_return(self, stmt: Return) -> Stmt:
+        if stmt.value is not None:
+            stmt.value = stmt.value.visit(self)
+        return stmt
+
+    def visit_class(self, stmt: Class) -> Stmt:
+        if stmt.superclass is not None:
+            stmt.superclass = stmt.superclass.visit(self)
+        stmt.methods = [method.visit(self) for method in stmt.methods]
+        return stmt
+
+    def visit_import(self, stmt: Import) -> Stmt:
+        return stmt
+
+    def visit_local_var(self, stmt: LocalVar) -> Stmt:
+        if stmt.value is not None:
+            stmt.value = stmt.value.visit(self)
+        return stmt
+
+    def visit_local_block(self, stmt: LocalBlock) -> Stmt:
+        stmt.statements = self.transform(stmt.statements)
+        return stmt
+
+    def visit_logical(self, expr: Logical) -> Expr:
+        expr.left = expr.left.visit(self)
+        expr.right = expr.right.visit(self)
+        return expr
+
+    def visit_assignment(self, expr: Assignment) -> Expr:
+        expr.value = expr.value.visit(self)
+        return expr
+
+    def visit_increment(self, expr: Increment) -> Expr:
+        return self.visit_assignment(expr)
+
+    def visit_variable(self, expr: Variable) -> Expr:
+        return expr
+
+    def visit_local_variable(self, expr: LocalVariable) -> Expr:
+        return expr
+
+    def visit_local_assignment(self, expr: LocalAssignment) -> Expr:
+        expr.value = expr.value.visit(self)
+        return expr
+
+    def visit_local_increment(self, expr: LocalIncrement) -> Expr:
+        return self.visit_local_assignment(expr)
+
+    def visit_binary(self, expr: Binary) -> Expr:
+        expr.left = expr.left.visit(self)
+        expr.right = expr.right.visit(self)
+        return expr
+
+    def visit_unchecked_binary(self, expr: Binary) -> Expr:
+        return self.visit_binary(expr)
+
+    def visit_guarded_binary(self, expr: Binary) -> Expr:
+        return self.visit_binary(expr)
+
+    def visit_compare(self, expr: Compare) -> Expr:
+        return self.visit_binary(expr)
+
+    def visit_grouping(self, expr: Grouping) -> Expr:
+        expr.expression = expr.expression.visit(self)
+        return expr
+
+    def visit_literal(self, expr: Literal) -> Expr:
+        return expr
+
+    def visit_unary(self, expr: Unary) -> Expr:
+        expr.right = expr.right.visit(self)
+        return expr
+
+    def visit_unchecked_unary(self, expr: Unary) -> Expr:
+        return self.visit_unary(expr)
+
+    def visit_guarded_unary(self, expr: Unary) -> Expr:
+        return self.visit_unary(expr)
+
+    def visit_invariant(self, expr: Invariant) -> Expr:
+        expr.expression = expr.expression.visit(self)
+        return expr
+
+    def visit_deep(self, expr: Deep) -> Expr:
+        # deep expressions are not rewritten, recursing into them could
+        # exhaust the stack
+        return expr
+
+    def visit_array(self, expr: Array) -> Expr:
+        expr.elements = [element.visit(self) for element in expr.elements]
+        return expr
+
+    def visit_index(self, expr: Index) -> Expr:
+        expr.array = expr.array.visit(self)
+        expr.index = expr.index.visit(self)
+        return expr
+
+    def visit_slice(self, expr: Slice) -> Expr:
+        expr.array = expr.array.visit(self)
+        if expr.start is not None:
+            expr.start = expr.start.visit(self)
+        if expr.stop is not None:
+            expr.stop = expr.stop.visit(self)
+        return expr
+
+    def visit_index_assignment(self, expr: IndexAssignment) -> Expr:
+        expr.array = expr.array.visit(self)
+        expr.index = expr.index.visit(self)
+        expr.value = expr.value.visit(self)
+        return expr
+
+    def visit_call(self, expr: Call) -> Expr:
+        expr.callee = expr.callee.visit(self)
+        expr.arguments = [argument.visit(self) for argument in expr.arguments]
+        return expr
+
+    def visit_tail_call(self, expr: Call) -> Expr:
+        return self.visit_call(expr)
+
+    def visit_property(self, expr: Property) -> Expr:
+        expr.object = expr.object.visit(self)
+        return expr
+
+    def visit_property_assignment(self, expr: PropertyAssignment) -> Expr:
+        expr.object = expr.object.visit(self)
+        expr.value = expr.value.visit(self)
+        return expr
+
+    def visit_this(self, expr: This) -> Expr:
+        return expr
+
+    def visit_super(self, expr: Super) -> Expr:
+        return expr
+
+
+class FunctionFinder(Transformer):
+    def __init__(self):
+        self.found = False
+
+    def visit_function(self, stmt: Function) -> Stmt:
+        self.found = True
+        return stmt
+
+    def visit_class(self, stmt: Class) -> Stmt:
+        self.found = True
+        return stmt
+
+    def visit_lazy_block(self, stmt: LazyBlock) -> Stmt:
+        self.found = self.found or any(token.type in (TokenType.FUNC,
+                                                      TokenType.CLASS)
+                                       for token in stmt.tokens)
+        return stmt
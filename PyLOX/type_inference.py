@@ -0,0 +1,366 @@
+"""
+A flow sensitive type inference pass
+it follows the types of the variables through the program and proves the
+operand types of arithmetic and comparison operators
+operators whose operands are proven are replaced with their unchecked
+variants, every other site keeps the runtime type checks
+types are represented with python types, None stands for an unknown type
+calls forget the types of the variables that a function body might assign,
+globals are forgotten too unless the program is whole, imports forget the
+types of all globals, function bodies are
+analysed without knowing the types of the variables they capture
+fields of instances are not followed, their types are unknown
+"""
+from typing import Dict, List, Optional, Set
+
+from PyLOX.expressions import Expr, Binary, Grouping, Literal, Unary, \
+    Variable, Assignment, Logical, Invariant, Deep, Array, Index, Slice, \
+    IndexAssignment, Call, UncheckedBinary, UncheckedUnary, Property, \
+    PropertyAssignment, This, Super
+from PyLOX.numeric_array import NumericArray
+from PyLOX.statements import Stmt, Var, Print, Expression, Block, If, While, \
+    Break, For, Hoist, LazyBlock, Function, Return, Class, Import
+from PyLOX.token import TokenType
+from PyLOX.transformer import Transformer, walk, assigned_names, has_calls
+
+NUMERIC_OPERATORS = {TokenType.MINUS, TokenType.STAR, TokenType.SLASH}
+COMPARISON_OPERATORS = {TokenType.GREATER, TokenType.GREATER_EQUAL,
+                        TokenType.LESS, TokenType.LESS_EQUAL}
+EQUALITY_OPERATORS = {TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL}
+
+State = List[Dict[str, Optional[type]]]
+
+
+def merge(lhs: State, rhs: State) -> State:
+    # a variable keeps its type only if both states agree on it
+    merged = []
+    for lhs_scope, rhs_scope in zip(lhs, rhs):
+        scope = {}
+        for name in lhs_scope.keys() | rhs_scope.keys():
+            lhs_type = lhs_scope.get(name)
+            scope[name] = lhs_type if lhs_type == rhs_scope.get(name) else None
+        merged.append(scope)
+    return merged
+
+
+class FunctionAssignments(Transformer):
+    # collects the names that function bodies assign
+    def __init__(self):
+        self.names = set()
+        self.depth = 0
+
+    def collect(self, program: List[Stmt]) -> Set[str]:
+        self.transform(program)
+        return self.names
+
+    def visit_function(self, stmt: Function) -> Stmt:
+        self.depth += 1
+        super(FunctionAssignments, self).visit_function(stmt)
+        self.depth -= 1
+        return stmt
+
+    def visit_assignment(self, expr: Assignment) -> Expr:
+        if self.depth > 0:
+            self.names.add(expr.name.lexeme)
+        return super(FunctionAssignments, self).visit_assignment(expr)
+
+    def visit_deep(self, expr: Deep) -> Expr:
+        if self.depth > 0:
+            self.names |= {node.name.lexeme for node in walk(expr.expression)
+                           if isinstance(node, Assignment)}
+        return expr
+
+    def visit_lazy_block(self, stmt: LazyBlock) -> Stmt:
+        if any(token.type in (TokenType.FUNC, TokenType.CLASS)
+               for token in stmt.tokens):
+            self.names |= assigned_names(stmt)
+        return stmt
+
+
+class TypeInference(object):
+    def __init__(self, whole_program: bool = False):
+        self.whole_program = whole_program
+        self.scopes = [{}]
+        self.break_states = []
+        self.proven = {}
+        self.assigned_by_calls = set()
+        # number of function bodies being analysed
+        self.functions = 0
+
+    def infer(self, program: List[Stmt]) -> List[Stmt]:
+        self.assigned_by_calls = FunctionAssignments().collect(program)
+        for stmt in program:
+            stmt.visit(self)
+        return UncheckedRewriter(self.proven).transform(program)
+
+    # state handling
+    def snapshot(self) -> State:
+        return [dict(scope) for scope in self.scopes]
+
+    def restore(self, state: State) -> None:
+        self.scopes = [dict(scope) for scope in state]
+
+    def lookup(self, name: str) -> Optional[type]:
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return None
+
+    def update(self, name: str, value_type: Optional[type]) -> None:
+        for scope in reversed(self.scopes):
+            if name in scope:
+                scope[name] = value_type
+                return
+
+    def call(self) -> None:
+        # a call might run any function body
+        for index, scope in enumerate(self.scopes):
+            for name in scope:
+                if name in self.assigned_by_calls or index == 0 and \
+                        self.functions == 0 and not self.whole_program:
+                    scope[name] = None
+
+    def prove(self, expr: Expr, proven: bool) -> None:
+        # a site is proven only if it is proven at every visit
+        self.proven[id(expr)] = self.proven.get(id(expr), True) and proven
+
+    def analyse_loop(self, condition: Expr, body: Stmt, update: Expr) -> None:
+        entry = self.snapshot()
+        while True:
+            self.break_states.append([])
+            condition.visit(self)
+            exit_state = self.snapshot()
+            body.visit(self)
+            if update is not None:
+                update.visit(self)
+            break_states = self.break_states.pop()
+            head = merge(entry, self.scopes)
+            if head == entry:
+                break
+            entry = head
+            self.restore(entry)
+        for state in break_states:
+            exit_state = merge(exit_state, state)
+        self.restore(exit_state)
+
+    # statements
+    def visit_var(self, stmt: Var) -> None:
+        if stmt.value is None:
+            value_type = type(None)
+        else:
+            value_type = stmt.value.visit(self)
+        self.scopes[-1][stmt.name.lexeme] = value_type
+
+    def visit_expression(self, stmt: Expression) -> None:
+        stmt.expression.visit(self)
+
+    def visit_print(self, stmt: Print) -> None:
+        stmt.expression.visit(self)
+
+    def visit_block(self, stmt: Block) -> None:
+        self.scopes.append({})
+        for child in stmt.statements:
+            child.visit(self)
+        self.scopes.pop()
+
+    def visit_if(self, stmt: If) -> None:
+        stmt.condition.visit(self)
+        before = self.snapshot()
+        stmt.then_statement.visit(self)
+        after_then = self.snapshot()
+        self.restore(before)
+        if stmt.else_statement is not None:
+            stmt.else_statement.visit(self)
+        self.restore(merge(after_then, self.scopes))
+
+    def visit_while(self, stmt: While) -> None:
+        self.analyse_loop(stmt.condition, stmt.body, None)
+
+    def visit_for(self, stmt: For) -> None:
+        self.scopes.append({})
+        if stmt.initializer is not None:
+            stmt.initializer.visit(self)
+        self.analyse_loop(stmt.condition, stmt.body, stmt.update)
+        self.scopes.pop()
+
+    def visit_break(self, stmt: Break) -> None:
+        # lazy blocks are analysed without their enclosing loop
+        if self.break_states:
+            self.break_states[-1].append(self.snapshot())
+
+    def visit_hoist(self, stmt: Hoist) -> None:
+        stmt.loop.visit(self)
+
+    def visit_lazy_block(self, stmt: LazyBlock) -> None:
+        for name in assigned_names(stmt):
+            self.update(name, None)
+        if has_calls(stmt):
+            self.call()
+
+    def visit_function(self, stmt: Function) -> None:
+        self.analyse_function(stmt)
+        self.scopes[-1][stmt.name.lexeme] = None
+
+    def visit_class(self, stmt: Class) -> None:
+        if stmt.superclass is not None:
+            stmt.superclass.visit(self)
+        for method in stmt.methods:
+            self.analyse_function(method)
+        self.scopes[-1][stmt.name.lexeme] = None
+
+    def visit_import(self, stmt: Import) -> None:
+        # the module might define any global
+        for name in self.scopes[0]:
+            self.scopes[0][name] = None
+
+    def analyse_function(self, stmt: Function) -> None:
+        # body runs when the function is called, captured variables might
+        # have any type then
+        scopes, break_states = self.scopes, self.break_states
+        self.scopes = [{parameter.lexeme: None for parameter in stmt.parameters}]
+        self.break_states = []
+        self.functions += 1
+        for child in stmt.body:
+            child.visit(self)
+        self.functions -= 1
+        self.scopes, self.break_states = scopes, break_states
+
+    def visit_return(self, stmt: Return) -> None:
+        if stmt.value is not None:
+            stmt.value.visit(self)
+
+    # expressions
+    def visit_literal(self, expr: Literal) -> Optional[type]:
+        return type(expr.value)
+
+    def visit_grouping(self, expr: Grouping) -> Optional[type]:
+        return expr.expression.visit(self)
+
+    def visit_variable(self, expr: Variable) -> Optional[type]:
+        return self.lookup(expr.name.lexeme)
+
+    def visit_assignment(self, expr: Assignment) -> Optional[type]:
+        value_type = expr.value.visit(self)
+        self.update(expr.name.lexeme, value_type)
+        return value_type
+
+    def visit_invariant(self, expr: Invariant) -> Optional[type]:
+        return expr.expression.visit(self)
+
+    def visit_deep(self, expr: Deep) -> Optional[type]:
+        # sites inside are not proven, only assignments are followed
+        for node in walk(expr.expression):
+            if isinstance(node, Assignment):
+                self.update(node.name.lexeme, None)
+            elif isinstance(node, Call):
+                self.call()
+        return None
+
+    def visit_logical(self, expr: Logical) -> Optional[type]:
+        left_type = expr.left.visit(self)
+        before = self.snapshot()
+        right_type = expr.right.visit(self)
+        # right hand side might be short circuited
+        self.restore(merge(before, self.scopes))
+        return left_type if left_type == right_type else None
+
+    def visit_unary(self, expr: Unary) -> Optional[type]:
+        inner_type = expr.right.visit(self)
+        self.prove(expr, inner_type is float)
+        if expr.operator == TokenType.MINUS:
+            return float
+        return bool
+
+    def visit_unchecked_unary(self, expr: Unary) -> Optional[type]:
+        return self.visit_unary(expr)
+
+    def visit_guarded_unary(self, expr: Unary) -> Optional[type]:
+        return self.visit_unary(expr)
+
+    def visit_binary(self, expr: Binary) -> Optional[type]:
+        left_type = expr.left.visit(self)
+        right_type = expr.right.visit(self)
+        operator = expr.operator.type
+        if operator in EQUALITY_OPERATORS:
+            return bool
+        if operator == TokenType.PLUS:
+            proven = left_type == right_type and left_type in (float, str)
+            self.prove(expr, proven)
+            return left_type if proven else None
+        proven = left_type is float and right_type is float
+        self.prove(expr, proven)
+        if not proven:
+            # operators are applied element wise if an operand is an array
+            return None
+        if operator in COMPARISON_OPERATORS:
+            return bool
+        if operator in NUMERIC_OPERATORS:
+            return float
+        return None
+
+    def visit_unchecked_binary(self, expr: Binary) -> Optional[type]:
+        return self.visit_binary(expr)
+
+    def visit_guarded_binary(self, expr: Binary) -> Optional[type]:
+        return self.visit_binary(expr)
+
+    def visit_array(self, expr: Array) -> Optional[type]:
+        for element in expr.elements:
+            element.visit(self)
+        return NumericArray
+
+    def visit_index(self, expr: Index) -> Optional[type]:
+        expr.array.visit(self)
+        expr.index.visit(self)
+        return float
+
+    def visit_slice(self, expr: Slice) -> Optional[type]:
+        expr.array.visit(self)
+        for bound in (expr.start, expr.stop):
+            if bound is not None:
+                bound.visit(self)
+        return NumericArray
+
+    def visit_index_assignment(self, expr: IndexAssignment) -> Optional[type]:
+        expr.array.visit(self)
+        expr.index.visit(self)
+        return expr.value.visit(self)
+
+    def visit_call(self, expr: Call) -> Optional[type]:
+        expr.callee.visit(self)
+        for argument in expr.arguments:
+            argument.visit(self)
+        self.call()
+        return None
+
+    def visit_property(self, expr: Property) -> Optional[type]:
+        expr.object.visit(self)
+        return None
+
+    def visit_property_assignment(self, expr: PropertyAssignment) \
+            -> Optional[type]:
+        expr.object.visit(self)
+        return expr.value.visit(self)
+
+    def visit_this(self, expr: This) -> Optional[type]:
+        return None
+
+    def visit_super(self, expr: Super) -> Optional[type]:
+        return None
+
+
+class UncheckedRewriter(Transformer):
+    def __init__(self, proven: Dict[int, bool]):
+        self.proven = proven
+
+    def visit_binary(self, expr: Binary) -> Expr:
+        expr = super(UncheckedRewriter, self).visit_binary(expr)
+        if self.proven.get(id(expr), False):
+            return UncheckedBinary(expr.left, expr.operator, expr.right)
+        return expr
+
+    def visit_unary(self, expr: Unary) -> Expr:
+        expr = super(UncheckedRewriter, self).visit_unary(expr)
+        if self.proven.get(id(expr), False):
+            return UncheckedUnary(expr.operator, expr.right)
+        return expr
@@ -0,0 +1,32 @@
+import contextlib
+import io
+
+from PyLOX.expressions import Expr
+from PyLOX.interpreter import Interpreter
+from PyLOX.main import run
+from PyLOX.statements import Stmt
+
+
+def evaluate(source, interpreter=None, **options):
+    # returns the output of the program with its errors, a new interpreter
+    # runs the source as a whole program
+    output = io.StringIO()
+    if interpreter is None:
+        interpreter = Interpreter(output)
+        options.setdefault("whole_program", True)
+    interpreter.stream = output
+    with contextlib.redirect_stdout(output):
+        run(source, interpreter, jobs=1, **options)
+    return output.getvalue()
+
+
+def nodes(program):
+    # every node of a program
+    stack = list(program)
+    while stack:
+        node = stack.pop()
+        yield node
+        for value in vars(node).values():
+            for item in value if isinstance(value, list) else [value]:
+                if isinstance(item, (Expr, Stmt)):
+                    stack.append(item)
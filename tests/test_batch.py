@@ -0,0 +1,134 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from PyLOX.batch import BatchEvaluator, Column, evaluate_batch, main
+from PyLOX.main import compile_program
+
+BRANCHES = """
+var sign = 0;
+var size = "small";
+if (x < 0) { sign = -1; } else { sign = 1; }
+if (x > 10) size = "large";
+var scaled = x * sign;
+"""
+
+
+def compile(source):
+    return compile_program(source, stream=io.StringIO())
+
+
+class TestBatch(unittest.TestCase):
+    def batch(self, source, inputs):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            outputs = evaluate_batch(compile(source), inputs, output)
+        return outputs, output.getvalue()
+
+    def test_masked_if_else(self):
+        outputs, output = self.batch(BRANCHES, {"x": [-3.0, 5.0, 20.0, 0.0]})
+        self.assertEqual(outputs, {"sign": [-1.0, 1.0, 1.0, 1.0],
+                                   "size": ["small", "small", "large",
+                                            "small"],
+                                   "scaled": [3.0, 5.0, 20.0, 0.0]})
+        self.assertEqual(output, "")
+
+    def test_branches_are_evaluated_as_columns(self):
+        program = compile(BRANCHES)
+        evaluator = BatchEvaluator(3, io.StringIO())
+        values = evaluator.evaluate(program, {
+            "x": Column.from_values([-1.0, 2.0, 30.0])})
+        self.assertIsInstance(values["sign"], Column)
+        self.assertEqual(evaluator.failed_records(), [])
+
+    def test_division_by_zero_falls_back_per_record(self):
+        source = "var y = 10 / x; var z = y + 1;"
+        program = compile(source)
+        evaluator = BatchEvaluator(3, io.StringIO())
+        evaluator.evaluate(program, {
+            "x": Column.from_values([2.0, 0.0, -5.0])})
+        self.assertEqual(evaluator.failed_records(), [1])
+        outputs, output = self.batch(source, {"x": [2.0, 0.0, -5.0]})
+        self.assertEqual(outputs, {"y": [5.0, None, -2.0],
+                                   "z": [6.0, None, -1.0]})
+        # only the failing record is reported, by the interpreter
+        self.assertEqual(output.count("Zero division error"), 1)
+
+    def test_division_by_zero_in_untaken_branch(self):
+        outputs, output = self.batch(
+            "var y = 0; if (x != 0) y = 1 / x;", {"x": [4.0, 0.0]})
+        self.assertEqual(outputs, {"y": [0.25, 0.0]})
+        self.assertEqual(output, "")
+
+    def test_string_columns(self):
+        source = """
+            var same = name == "bob";
+            var known = name or "anonymous";
+            var greeting = "hello " + name;
+        """
+        outputs, output = self.batch(source, {"name": ["ann", "bob", "cy"]})
+        self.assertEqual(outputs, {"same": [False, True, False],
+                                   "known": ["ann", "bob", "cy"],
+                                   "greeting": ["hello ann", "hello bob",
+                                                "hello cy"]})
+        self.assertEqual(output, "")
+        # a record that cannot be concatenated keeps nil values
+        outputs, output = self.batch(source, {"name": ["ann", None]})
+        self.assertEqual(outputs, {"same": [False, None],
+                                   "known": ["ann", None],
+                                   "greeting": ["hello ann", None]})
+        self.assertEqual(output.count("Runtime error"), 1)
+
+    def test_unsupported_statements_run_per_record(self):
+        outputs, output = self.batch(
+            "var total = 0; for (var i = 0; i < x; i = i + 1) "
+            "total = total + i;", {"x": [3.0, 5.0]})
+        self.assertEqual(outputs, {"total": [3.0, 10.0]})
+
+    def test_invalid_inputs(self):
+        program = compile("var y = x;")
+        for inputs in [{}, {"x": []}, {"x": [1.0], "z": [1.0, 2.0]}]:
+            with self.assertRaisesRegex(ValueError, "non zero number"):
+                evaluate_batch(program, inputs, io.StringIO())
+
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def main(self, source, records):
+        script = os.path.join(self.directory, "script.lox")
+        inputs = os.path.join(self.directory, "inputs.csv")
+        with open(script, "w") as f:
+            f.write(source)
+        with open(inputs, "w") as f:
+            f.write(records)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status = main(["batch", script, inputs], output)
+        return status, output.getvalue()
+
+    def test_csv(self):
+        status, output = self.main(
+            "var half = x / 2; var label = name + \"!\"; var big = x > 2;",
+            "x,name\n1,a\n4,b\n")
+        self.assertEqual(status, 0)
+        self.assertEqual(output.splitlines(), ["half,label,big",
+                                               "0.5,a!,false",
+                                               "2,b!,true"])
+
+    def test_empty_csv(self):
+        status, output = self.main("var y = x;", "x\n")
+        self.assertEqual(status, -1)
+        self.assertIn("non zero number of records", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
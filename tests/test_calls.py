@@ -0,0 +1,87 @@
+import io
+import sys
+import threading
+import unittest
+
+from helpers import evaluate
+from PyLOX.interpreter import Interpreter
+from PyLOX.program import run_deep
+
+
+class TestCallDepth(unittest.TestCase):
+    def test_deep_recursion(self):
+        self.assertEqual(evaluate("""
+            fun s(n) { if (n < 1) return 0; return n + s(n - 1); }
+            print s(1000);
+            print s(5000);
+        """), "500500\n12502500\n")
+
+    def test_deep_method_recursion(self):
+        self.assertEqual(evaluate("""
+            class Node {
+                init(depth) { this.depth = depth; }
+                count() {
+                    if (this.depth < 1) { return 1; }
+                    { var child = Node(this.depth - 1); return 1 + child.count(); }
+                }
+            }
+            print Node(2000).count();
+        """), "2001\n")
+
+    def test_stack_overflow(self):
+        self.assertIn("stack overflow", evaluate("""
+            fun f(n) { return 1 + f(n + 1); }
+            print f(0);
+        """))
+
+
+class TestDeepStack(unittest.TestCase):
+    def test_recursion_limit_is_restored(self):
+        limit = sys.getrecursionlimit()
+        self.assertEqual(evaluate("fun s(n) { if (n < 1) return 0; "
+                                  "return n + s(n - 1); } print s(3000);"),
+                         "4501500\n")
+        self.assertEqual(sys.getrecursionlimit(), limit)
+
+    def test_threads_are_reused(self):
+        threads = [run_deep(threading.get_ident) for _ in range(3)]
+        self.assertEqual(len(set(threads)), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
+
+    def test_deeply_nested_program(self):
+        # parsing and the passes recurse as deep as the blocks
+        depth = 3000
+        self.assertEqual(evaluate("var x = 1;" + "{" * depth + "print x;" +
+                                  "}" * depth), "1\n")
+
+
+class TestMemoization(unittest.TestCase):
+    def test_memoized_fibonacci(self):
+        # every value is computed once, the first descent is 1000 calls deep
+        self.assertEqual(evaluate("""
+            // @memo
+            fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+            print fib(150);
+            print fib(1000);
+        """), "9.969216677189305e+30\n4.346655768693743e+208\n")
+
+    def test_declarations_in_loops(self):
+        # every run of a declaration makes a new function with its own cache,
+        # only the latest one of a declaration is kept for the statistics
+        interpreter = Interpreter(io.StringIO())
+        self.assertEqual(evaluate("""
+            fun outer(k) {
+                // @memo
+                fun square(n) { return n * n + k; }
+                return square(k);
+            }
+            var total = 0;
+            for (var i = 0; i < 100; i = i + 1) { total = total + outer(i); }
+            print total;
+        """, interpreter, whole_program=True), "333300\n")
+        self.assertEqual(len(interpreter.memoized), 1)
+        self.assertEqual(len(interpreter.statistics()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
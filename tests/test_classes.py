@@ -0,0 +1,101 @@
+import unittest
+
+from helpers import evaluate
+from PyLOX.classes import LoxClass, LoxInstance
+
+
+class TestShapes(unittest.TestCase):
+    def test_same_fields_share_shapes(self):
+        klass = LoxClass("A", None, {})
+        self.assertIs(klass.shape.add("x").add("y"),
+                      klass.shape.add("x").add("y"))
+        self.assertIsNot(klass.shape.add("x").add("y"),
+                         klass.shape.add("y").add("x"))
+        self.assertEqual(klass.shape.add("y").add("x").slots,
+                         {"y": 0, "x": 1})
+
+    def test_classes_have_their_own_shapes(self):
+        first = LoxClass("A", None, {})
+        second = LoxClass("A", None, {})
+        self.assertIsNot(first.shape.add("x"), second.shape.add("x"))
+        self.assertIs(LoxInstance(second.shape.add("x")).shape.klass, second)
+
+
+class TestInlineCaches(unittest.TestCase):
+    def test_redefined_class(self):
+        self.assertEqual(evaluate("""
+            fun describe(o) { return o.name(); }
+            class A { name() { return "first"; } }
+            var first = A();
+            print describe(first);
+            class A { name() { return "second"; } }
+            print describe(A());
+            print describe(first);
+        """), "first\nsecond\nfirst\n")
+
+    def test_redefined_class_in_a_loop(self):
+        self.assertEqual(evaluate("""
+            fun value(o) { return o.value(); }
+            for (var i = 0; i < 3; i = i + 1) {
+                class A { value() { return i * 10; } }
+                print value(A());
+            }
+        """), "0\n10\n20\n")
+
+    def test_polymorphic_sites(self):
+        self.assertEqual(evaluate("""
+            class P {}
+            fun x(o) { return o.x; }
+            fun set(o, value) { o.z = value; }
+            var first = P();
+            { first.x = 1; first.y = 2; }
+            var second = P();
+            { second.y = 3; second.x = 4; }
+            var third = P();
+            for (var i = 0; i < 2; i = i + 1) {
+                print x(first) + x(second);
+                set(first, i);
+                set(second, i + 10);
+                set(third, i + 20);
+            }
+            print first.z + second.z + third.z;
+        """), "5\n5\n33\n")
+
+    def test_fields_shadow_methods(self):
+        self.assertEqual(evaluate("""
+            class A { f() { return "method"; } }
+            fun call(o) { return o.f(); }
+            fun other() { return "field"; }
+            var plain = A();
+            var shadowed = A();
+            { shadowed.f = other; }
+            print call(plain);
+            print call(shadowed);
+            print call(plain);
+        """), "method\nfield\nmethod\n")
+
+    def test_inherited_and_overridden_methods(self):
+        self.assertEqual(evaluate("""
+            class Base { name() { return "base"; } kind() { return "any"; } }
+            class Derived < Base { name() { return "derived"; } }
+            fun describe(o) { return o.name() + " " + o.kind(); }
+            print describe(Base());
+            print describe(Derived());
+            print describe(Base());
+        """), "base any\nderived any\nbase any\n")
+
+    def test_missing_property(self):
+        output = evaluate("""
+            class A {}
+            fun y(o) { return o.y; }
+            var a = A();
+            { a.y = 1; }
+            print y(a);
+            print y(A());
+        """).splitlines()
+        self.assertEqual(output[0], "1")
+        self.assertIn("undefined property y", output[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+
+from PyLOX.daemon import Daemon, main, submit
+
+LOOP = "var x = 0; for (var i = 0; i < 300; i = i + 1) { x = x + i; } print x;"
+
+
+class TestDaemon(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.directory, "daemon.sock")
+        # one worker, so a repeated job finds the program in its cache
+        cls.daemon = Daemon(cls.path, 1)
+        threading.Thread(target=cls.daemon.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.daemon.shutdown()
+        cls.daemon.server_close()
+        shutil.rmtree(cls.directory)
+
+    def write(self, name, source):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            f.write(source)
+        return path
+
+    def test_source(self):
+        first = submit(self.path, {"source": LOOP})
+        self.assertEqual((first["output"], first["status"]), ("44850\n", 0))
+        self.assertEqual(set(first["timings"]), {"worker", "total"})
+        second = submit(self.path, {"source": LOOP})
+        self.assertEqual(second["output"], "44850\n")
+        self.assertTrue(second["cached"])
+        self.assertIn((LOOP, False), self.daemon.published)
+
+    def test_flags(self):
+        for flags in [{"jit": True}, {"lazy": True}]:
+            result = submit(self.path, dict(flags, source=LOOP))
+            self.assertEqual(result["output"], "44850\n")
+
+    def test_path_and_imports(self):
+        self.write("module.lox", "fun twice(x) { return 2 * x; }")
+        script = self.write("script.lox",
+                            "import \"module.lox\"; print twice(21);")
+        result = submit(self.path, {"path": script})
+        self.assertEqual((result["output"], result["status"]), ("42\n", 0))
+
+    def test_errors(self):
+        runtime = submit(self.path, {"source": "print 1; print \"a\" - 1;"})
+        self.assertEqual(runtime["status"], -1)
+        self.assertTrue(runtime["output"].startswith("1\nRuntime error"))
+        parser = submit(self.path, {"source": "var a = ;"})
+        self.assertEqual(parser["status"], -1)
+        self.assertIn("Parser was expecting", parser["output"])
+        missing = submit(self.path,
+                         {"path": os.path.join(self.directory, "none.lox")})
+        self.assertIn("Job can not be read", missing["output"])
+
+    def test_undecodable_jobs(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(self.path)
+            connection.sendall(b"[1]\nnot json\n")
+            with connection.makefile("rb") as response:
+                results = [json.loads(response.readline()) for _ in range(2)]
+        self.assertIn("a job is a JSON object", results[0]["output"])
+        self.assertIn("Job can not be decoded", results[1]["output"])
+
+    def test_jobs_do_not_share_globals(self):
+        submit(self.path, {"source": "var shared = 1;"})
+        self.assertIn("shared is not defined",
+                      submit(self.path, {"source": "print shared;"})["output"])
+
+    def test_concurrent_jobs(self):
+        stdout = sys.stdout
+        results = {}
+
+        def job(index):
+            source = "var a = ;" if index % 2 else \
+                LOOP.replace("print x;", "print x + {index};".format(
+                    index=index))
+            results[index] = submit(self.path, {"source": source})
+
+        threads = [threading.Thread(target=job, args=(index,))
+                   for index in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIs(sys.stdout, stdout)
+        for index, result in results.items():
+            if index % 2:
+                self.assertIn("Parser was expecting", result["output"])
+            else:
+                self.assertEqual(result["output"],
+                                 "{sum}\n".format(sum=44850 + index))
+
+    def test_client(self):
+        script = self.write("client.lox", "print 1 + 2;")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status = main(["daemon", "--connect=" + self.path, script])
+        self.assertEqual((output.getvalue(), status), ("3\n", 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
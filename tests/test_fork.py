@@ -0,0 +1,87 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from helpers import evaluate
+from PyLOX.daemon import Daemon, submit
+from PyLOX.interpreter import Interpreter
+
+PRELUDE = """
+var arr = [1, 2, 3];
+var alias = arr;
+class K { init() { this.v = 1; this.other = nil; } }
+var k = K();
+k.other = K();
+fun bump() { arr[1] = arr[1] + 1; return arr[1]; }
+"""
+
+
+class TestFork(unittest.TestCase):
+    def setUp(self):
+        self.prelude = Interpreter(io.StringIO())
+        evaluate(PRELUDE, self.prelude)
+
+    def test_writes_stay_private(self):
+        first = self.prelude.fork()
+        evaluate("arr[0] = 99; k.v = 42; k.other.v = 7; var x = 1;", first)
+        self.assertEqual(evaluate("print arr[0]; print alias[0]; print k.v; "
+                                  "print k.other.v; print bump();", first),
+                         "99\n99\n42\n7\n3\n")
+        second = self.prelude.fork()
+        self.assertEqual(evaluate("print arr[0]; print k.v; print k.other.v; "
+                                  "print bump();", second),
+                         "1\n1\n1\n3\n")
+        self.assertIn("x is not defined", evaluate("print x;", second))
+        self.assertEqual(evaluate("print arr[1]; print k.v;", self.prelude),
+                         "2\n1\n")
+
+    def test_parent_keeps_writing(self):
+        first = self.prelude.fork()
+        evaluate("arr[0] = 5; var y = 2; k.v = 3;", self.prelude)
+        self.assertEqual(evaluate("print arr[0]; print alias[0]; print y; "
+                                  "print k.v;", self.prelude),
+                         "5\n5\n2\n3\n")
+        self.assertEqual(evaluate("print arr[0]; print k.v;", first),
+                         "1\n1\n")
+        # later forks start from the writes of the parent
+        second = self.prelude.fork()
+        self.assertEqual(evaluate("{ alias[0] = 8; } print arr[0]; print y; "
+                                  "print k.v;", second), "8\n2\n3\n")
+        self.assertEqual(evaluate("print arr[0];", self.prelude), "5\n")
+
+    def test_fork_of_a_fork(self):
+        first = self.prelude.fork()
+        evaluate("arr[2] = 30; var z = 1;", first)
+        second = first.fork()
+        self.assertEqual(evaluate("{ arr[2] = 31; } print z; print alias[2];",
+                                  second), "1\n31\n")
+        self.assertEqual(evaluate("print arr[2];", first), "30\n")
+
+
+class TestDaemon(unittest.TestCase):
+    def test_prelude_reads_a_global_of_the_job(self):
+        directory = tempfile.mkdtemp()
+        try:
+            prelude = os.path.join(directory, "prelude.lox")
+            with open(prelude, "w") as f:
+                f.write("fun show() { print greeting; }")
+            path = os.path.join(directory, "daemon.sock")
+            with Daemon(path, 1, prelude) as daemon:
+                threading.Thread(target=daemon.serve_forever,
+                                 daemon=True).start()
+                try:
+                    for _ in range(2):
+                        result = submit(path, {"source": "var greeting = "
+                                                         "\"hi\"; show();"})
+                        self.assertEqual(result["output"], "hi\n")
+                finally:
+                    daemon.shutdown()
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import io
+import unittest
+
+from PyLOX.front_end import parse_parallel, parse_sequential, split_points
+from PyLOX.interpreter import Interpreter
+from PyLOX.program import execute, run_deep
+
+# enough chunks for a point at every boundary of a small source
+EVERY_BOUNDARY = 1000
+
+LARGE = "".join("var a{index} = {index};\nprint a{index};\n".format(
+    index=index) for index in range(40)) + """var s = "a;
+b";
+{
+    var q = 1;
+}
+if (a1 < 2) print "then";
+else print "else";
+print s - 1;
+"""
+
+
+def lines(source, points):
+    # the lines that start at the points
+    return [source[point:].partition("\n")[0] for point in points]
+
+
+def run_program(program):
+    output = io.StringIO()
+    try:
+        run_deep(execute, program, Interpreter(output))
+    except Exception as e:
+        print(e, file=output)
+    return output.getvalue()
+
+
+class TestSplitPoints(unittest.TestCase):
+    def assertSplits(self, source, expected):
+        points = split_points(source, EVERY_BOUNDARY)
+        self.assertEqual(lines(source, points), expected)
+
+    def test_statement_boundaries(self):
+        self.assertSplits("var a = 1;\nvar b = 2;\nprint a;\n",
+                          ["var b = 2;", "print a;", ""])
+
+    def test_not_in_strings(self):
+        self.assertSplits("var s = \"a;\nb\";\nprint s;\n", ["print s;", ""])
+
+    def test_not_in_braces_or_parentheses(self):
+        self.assertSplits("{\nvar a = 1;\n}\nprint (1 +\n2);\nprint 3;\n",
+                          ["print (1 +", "print 3;", ""])
+
+    def test_not_before_else(self):
+        self.assertSplits("if (true) {}\nelse {}\nprint 1;\n",
+                          ["print 1;", ""])
+
+    def test_comments(self):
+        self.assertSplits("print 1 // ends;\n+ 2;\n/* a;\n/* b;\n*/ c;\n*/\n"
+                          "print 3; // x\nprint 4;\n",
+                          ["/* a;", "print 4;", ""])
+
+    def test_count(self):
+        self.assertEqual(len(split_points(LARGE, 4)), 3)
+
+
+class TestParallelParse(unittest.TestCase):
+    def test_same_program(self):
+        self.assertEqual(run_program(parse_parallel(LARGE, 2)),
+                         run_program(parse_sequential(LARGE)))
+        self.assertIn("(87: 9)", run_program(parse_parallel(LARGE, 2)))
+
+    def test_errors_are_reported_sequentially(self):
+        source = "var ;\n" + LARGE + "print ;\n"
+        parallel = io.StringIO()
+        sequential = io.StringIO()
+        self.assertIsNone(parse_parallel(source, 2, stream=parallel))
+        self.assertIsNone(parse_sequential(source, stream=sequential))
+        self.assertEqual(parallel.getvalue(), sequential.getvalue())
+        self.assertEqual(len(parallel.getvalue().splitlines()), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestGenerators(unittest.TestCase):
+    def assertGenerates(self, generator, description, module):
+        # the generator reproduces the checked in module from its description
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "output.py")
+            subprocess.run([sys.executable,
+                            os.path.join(ROOT, "tools", generator),
+                            os.path.join(ROOT, "PyLOX", description), output],
+                           check=True)
+            with open(output, "r") as f:
+                generated = f.read()
+        with open(os.path.join(ROOT, "PyLOX", module), "r") as f:
+            self.assertEqual(generated, f.read())
+
+    def test_expressions(self):
+        self.assertGenerates("generate_expressions.py", "expressions",
+                             "expressions.py")
+
+    def test_statements(self):
+        self.assertGenerates("generate_statements.py", "statements",
+                             "statements.py")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import io
+import unittest
+
+from helpers import evaluate
+from PyLOX.interpreter import Interpreter
+from PyLOX.jit import JITInterpreter, HOT_LOOP_ITERATIONS
+
+
+class TestJITEquivalence(unittest.TestCase):
+    def assertSameOutput(self, source, compiled=1):
+        interpreter = JITInterpreter(io.StringIO())
+        self.assertEqual(evaluate(source, interpreter, whole_program=True),
+                         evaluate(source))
+        self.assertGreaterEqual(interpreter.compiled, compiled)
+        return interpreter
+
+    def test_while_loop(self):
+        self.assertSameOutput("""
+            var total = 0;
+            var i = 0;
+            while (i < 1000) { total = total + i * 2; i = i + 1; }
+            print total;
+            print i;
+        """)
+
+    def test_for_loop(self):
+        self.assertSameOutput("""
+            var total = 0;
+            for (var i = 0; i < 1000; i = i + 1) {
+                var square = i * i;
+                total = total + square;
+            }
+            print total;
+        """)
+
+    def test_for_loop_in_function(self):
+        self.assertSameOutput("""
+            fun sum(n) {
+                var total = 0;
+                for (var i = 0; i < n; i = i + 1) { total = total + i; }
+                return total;
+            }
+            print sum(1000);
+        """)
+
+    def test_break(self):
+        self.assertSameOutput("""
+            var s = "";
+            for (var i = 0; i < 1000; i = i + 1) {
+                if (i > 500) { s = s + "x"; }
+                if (i == 510) break;
+            }
+            print s;
+            var j = 0;
+            while (true) { j = j + 1; if (j == 900) break; }
+            print j;
+        """)
+
+    def test_type_change_in_loop(self):
+        self.assertSameOutput("""
+            var t = 0;
+            for (var i = 0; i < 1000; i = i + 1) {
+                if (i == 600) { t = "s"; }
+                if (i < 600) { t = t + 1; } else { t = t + "y"; }
+            }
+            print t;
+        """)
+
+    def test_guard_failure(self):
+        # the second run of the loop enters it with a string
+        interpreter = self.assertSameOutput("""
+            var value = 0;
+            var step = 1;
+            fun repeat(n) {
+                var i = 0;
+                while (i < n) { value = value + step; i = i + 1; }
+            }
+            repeat(1000);
+            print value;
+            value = "a";
+            step = "b";
+            repeat(1000);
+            print value;
+        """)
+        self.assertGreaterEqual(interpreter.guard_failures, 1)
+
+    def test_runtime_error_in_compiled_loop(self):
+        self.assertSameOutput("""
+            var total = 0;
+            for (var i = 0; i < 1000; i = i + 1) {
+                total = total + i;
+                if (i == {iteration}) { print total; total = total / 0; }
+            }
+            print "not reached";
+        """.replace("{iteration}", str(2 * HOT_LOOP_ITERATIONS)))
+
+    def test_checked_operator_error(self):
+        self.assertSameOutput("""
+            var value = 0;
+            var i = 0;
+            while (i < 1000) {
+                if (i == 700) { value = nil; }
+                value = value + 1;
+                i = i + 1;
+            }
+        """)
+
+
+if __name__ == "__main__":
+    unittest.main()
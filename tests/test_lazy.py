@@ -0,0 +1,76 @@
+import io
+import unittest
+
+from helpers import evaluate, nodes
+from PyLOX.interpreter import Interpreter
+from PyLOX.main import compile_program
+from PyLOX.program import execute, run_deep
+from PyLOX.statements import LazyBlock
+
+BROKEN = """print 1;
+if (false) {
+    print (;
+}
+print 2;
+{
+    var a = 1;
+    print a +;
+}
+print 3;
+"""
+
+PROGRAM = """
+fun counter() {
+    var count = 0;
+    fun increment() { count = count + 1; return count; }
+    return increment;
+}
+var increment = counter();
+for (var i = 0; i < 3; i = i + 1) {
+    var twice = i * 2;
+    if (twice > 1) { print increment(); } else { print twice; }
+}
+{ var outer = "a"; { var inner = outer + "b"; print inner; } }
+"""
+
+
+class TestLazyBlocks(unittest.TestCase):
+    def test_same_results(self):
+        self.assertEqual(evaluate(PROGRAM, lazy=True), evaluate(PROGRAM))
+
+    def test_errors_are_reported_on_entry(self):
+        output = evaluate(BROKEN, lazy=True).splitlines()
+        self.assertEqual(output[:2], ["1", "2"])
+        # at the position of the error in the source
+        self.assertIn("[line 7, column 14]: Parser was expecting a literal",
+                      output[2])
+        self.assertIn("block can not be parsed", output[3])
+        self.assertEqual(len(output), 4)
+
+    def test_checked_errors_are_reported_before_running(self):
+        output = evaluate(BROKEN, lazy=True, check=True).splitlines()
+        self.assertEqual(len(output), 2)
+        self.assertIn("[line 2, column 12]", output[0])
+        self.assertIn("[line 7, column 14]", output[1])
+
+    def test_unclosed_block(self):
+        self.assertIn('Parser was expecting "}"',
+                      evaluate("print 1; { print 2;", lazy=True))
+
+    def test_bodies_are_parsed_once_on_entry(self):
+        program = compile_program(
+            "for (var i = 0; i < 3; i = i + 1) { print i; } "
+            "if (false) { print 5; }", lazy=True, stream=io.StringIO())
+        blocks = [node for node in nodes(program)
+                  if isinstance(node, LazyBlock)]
+        self.assertEqual(len(blocks), 2)
+        self.assertTrue(all(block.body is None for block in blocks))
+        output = io.StringIO()
+        run_deep(execute, program, Interpreter(output))
+        self.assertEqual(output.getvalue(), "0\n1\n2\n")
+        self.assertEqual(sorted(block.body is None for block in blocks),
+                         [False, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
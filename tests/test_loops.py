@@ -0,0 +1,74 @@
+import unittest
+
+from helpers import evaluate
+
+
+class TestFor(unittest.TestCase):
+    def assertPrints(self, source, expected):
+        # at the top level and in the slots of a function
+        self.assertEqual(evaluate(source), expected)
+        self.assertEqual(evaluate("fun main() {" + source + "} main();"),
+                         expected)
+
+    def test_body_declarations_start_fresh(self):
+        self.assertPrints("""
+            for (var i = 0; i < 3; i = i + 1) {
+                var seen;
+                print seen;
+                seen = i;
+            }
+        """, "nil\nnil\nnil\n")
+
+    def test_body_shadows_the_loop_variable(self):
+        self.assertPrints("""
+            var i = "outer";
+            for (var i = 0; i < 2; i = i + 1) {
+                var i2 = i * 10;
+                { var i = "inner"; print i; }
+                print i2;
+            }
+            print i;
+        """, "inner\n0\ninner\n10\nouter\n")
+
+    def test_closures_keep_their_iteration(self):
+        self.assertPrints("""
+            var first;
+            var second;
+            for (var i = 0; i < 2; i = i + 1) {
+                var j = i;
+                fun get() { return j; }
+                if (i == 0) first = get; else second = get;
+            }
+            print first();
+            print second();
+        """, "0\n1\n")
+
+    def test_loop_variable_is_scoped_to_the_loop(self):
+        self.assertIn("i is not defined", evaluate("""
+            for (var i = 0; i < 2; i = i + 1) {}
+            print i;
+        """))
+
+    def test_break_and_return(self):
+        self.assertEqual(evaluate("""
+            fun find(limit) {
+                for (var i = 0; i < 100; i = i + 1) {
+                    var square = i * i;
+                    if (square > limit) return i;
+                }
+                return nil;
+            }
+            print find(50);
+            for (var i = 0; ; i = i + 1) { if (i == 3) break; print i; }
+        """), "8\n0\n1\n2\n")
+
+    def test_clauses_are_optional(self):
+        self.assertPrints("""
+            var i = 0;
+            for (; i < 2;) { print i; i = i + 1; }
+            for (i = 5; i < 7; i = i + 1) print i;
+        """, "0\n1\n5\n6\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from PyLOX.main import main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs a script and prints whether numpy was imported, the finder sees the
+# import even when numpy is not installed
+IMPORTS = """
+import sys
+
+requested = []
+
+
+class Finder(object):
+    def find_spec(self, name, path, target=None):
+        if name.partition(".")[0] == "numpy":
+            requested.append(name)
+        return None
+
+
+sys.meta_path.insert(0, Finder())
+from PyLOX.main import main
+main(["lox", sys.argv[1]])
+print(bool(requested))
+"""
+
+
+class TestFlags(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.script = os.path.join(self.directory, "script.lox")
+        with open(self.script, "w") as f:
+            f.write("print 1;")
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def main(self, *flags):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            status = main(["lox"] + list(flags) + [self.script], output)
+        return status, output.getvalue()
+
+    def test_conflicting_flags(self):
+        profile = "--pgo-record=" + os.path.join(self.directory, "profile")
+        for flags, message in [
+                (["--jit", "--memprofile"], "--jit and --memprofile"),
+                (["--jit", profile], "--jit and --pgo-record"),
+                (["--memprofile", profile], "--memprofile and --pgo-record")]:
+            status, output = self.main(*flags)
+            self.assertEqual(status, -1)
+            self.assertIn(message + " cannot be used together", output)
+            self.assertIn("Usage:", output)
+            self.assertNotIn("1\n", output)
+        self.assertFalse(os.path.exists(profile[len("--pgo-record="):]))
+
+    def test_single_mode(self):
+        for flag in ["--jit", "--memprofile"]:
+            status, output = self.main(flag)
+            self.assertNotEqual(status, -1)
+            self.assertTrue(output.startswith("1\n"))
+
+    def imports_numpy(self, source):
+        with open(self.script, "w") as f:
+            f.write(source)
+        output = subprocess.run([sys.executable, "-c", IMPORTS, self.script],
+                                cwd=ROOT, check=True, stdout=subprocess.PIPE,
+                                universal_newlines=True).stdout
+        return output.splitlines()
+
+    def test_numpy_is_imported_on_first_use(self):
+        self.assertEqual(self.imports_numpy("print 1;"), ["1", "False"])
+        self.assertEqual(self.imports_numpy("print array(2);"),
+                         ["[0, 0]", "True"])
+
+
+if __name__ == "__main__":
+    unittest.main()
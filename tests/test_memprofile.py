@@ -0,0 +1,48 @@
+import io
+import re
+import tracemalloc
+import unittest
+
+from helpers import evaluate
+from PyLOX.memprofile import MemoryProfilingInterpreter
+
+SOURCE = """var small = 1;
+var big = array(100000);
+fun f(n) { return n + 1; }
+for (var i = 0; i < 5; i = i + 1) { f(i); }
+print len(big);
+"""
+
+
+class TestMemoryProfile(unittest.TestCase):
+    def setUp(self):
+        self.tracing = tracemalloc.is_tracing()
+        output = evaluate(SOURCE, MemoryProfilingInterpreter(io.StringIO()),
+                          whole_program=True)
+        self.output, _, report = output.partition("Memory profile:")
+        self.report = report.splitlines()
+
+    def tearDown(self):
+        if not self.tracing:
+            tracemalloc.stop()
+
+    def test_program_output(self):
+        self.assertEqual(self.output, evaluate(SOURCE))
+
+    def test_allocations_are_charged_to_their_line(self):
+        # array elements are eight bytes each
+        match = re.match(r"  Call at line 1: 1 executions, (\d+) bytes",
+                         self.report[1])
+        self.assertIsNotNone(match, self.report[1])
+        self.assertGreaterEqual(int(match.group(1)), 800000)
+
+    def test_executions_and_iterations(self):
+        self.assertTrue(any(line.startswith("  Call at line 3: 5 executions")
+                            for line in self.report))
+        self.assertTrue(any(line.startswith("  For loop at line 3: 5 "
+                                            "iterations")
+                            for line in self.report))
+
+
+if __name__ == "__main__":
+    unittest.main()
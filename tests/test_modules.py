@@ -0,0 +1,85 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from helpers import evaluate
+from PyLOX.interpreter import Interpreter
+
+COUNTER = """
+var count = 0;
+fun inc() { count = count + 1; }
+fun get() { return count; }
+"""
+
+
+class TestImport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(os.path.join(self.directory, "counter.lox"), "w") as f:
+            f.write(COUNTER)
+        with open(os.path.join(self.directory, "twice.lox"), "w") as f:
+            f.write("import \"counter.lox\"; fun twice() { inc(); inc(); }")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def interpreter(self):
+        interpreter = Interpreter(io.StringIO())
+        interpreter.directory = self.directory
+        return interpreter
+
+    def test_bindings_are_shared(self):
+        self.assertEqual(evaluate("""
+            import "counter.lox";
+            inc(); inc();
+            print count;
+            { count = 10; }
+            print get();
+            var i = 0;
+            while (i < 300) { count = count + 1; i = i + 1; }
+            print get();
+        """, self.interpreter()), "2\n10\n310\n")
+
+    def test_imported_names_are_exported(self):
+        self.assertEqual(evaluate("""
+            import "twice.lox";
+            twice();
+            inc();
+            print count;
+        """, self.interpreter()), "3\n")
+
+    def test_importer_names_shadow_the_module(self):
+        self.assertEqual(evaluate("""
+            import "counter.lox";
+            var count = 5;
+            inc();
+            print count;
+            print get();
+        """, self.interpreter()), "5\n1\n")
+
+    def test_forks_keep_their_writes(self):
+        prelude = self.interpreter()
+        evaluate("import \"counter.lox\"; inc();", prelude)
+        first = prelude.fork()
+        self.assertEqual(evaluate("inc(); { count = count + 5; } print get();",
+                                  first), "7\n")
+        second = prelude.fork()
+        self.assertEqual(evaluate("inc(); print count;", second), "2\n")
+        self.assertEqual(evaluate("print get();", first), "7\n")
+        self.assertEqual(evaluate("print count;", prelude), "1\n")
+
+    def test_fork_imports(self):
+        prelude = self.interpreter()
+        evaluate("var count = 3;", prelude)
+        first = prelude.fork()
+        self.assertEqual(evaluate("import \"counter.lox\"; inc(); "
+                                  "print count; print get();", first),
+                         "3\n1\n")
+        second = prelude.fork()
+        self.assertIn("inc is not defined", evaluate("inc();", second))
+
+
+if __name__ == "__main__":
+    unittest.main()
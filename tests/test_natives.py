@@ -0,0 +1,66 @@
+import math
+import unittest
+
+from helpers import evaluate
+from PyLOX.exceptions import PyLOXRuntimeError
+from PyLOX.natives import bind, native, registry
+
+
+class TestNatives(unittest.TestCase):
+    def test_builtins(self):
+        self.assertEqual(evaluate("""
+            print len("abc");
+            print len([1, 2]);
+            print substr("hello", 1, 3);
+            print sqrt(16);
+            print clock() <= clock();
+            print len;
+            var root = sqrt;
+            print root(4);
+        """), "3\n2\nell\n4\nTrue\n<native fn len>\n2\n")
+
+    def test_declared_types_are_checked(self):
+        self.assertIn("sqrt was expecting <<class 'float'>> as argument 1 "
+                      "instead received <<class 'str'>>",
+                      evaluate("print sqrt(\"a\");"))
+        self.assertIn("substr was expecting <<class 'float'>> as argument 3",
+                      evaluate("print substr(\"a\", 0, nil);"))
+
+    def test_errors(self):
+        self.assertIn("sqrt: math domain error", evaluate("print sqrt(-1);"))
+        self.assertIn("len was expecting 1 arguments instead received 0",
+                      evaluate("print len();"))
+        self.assertIn("len was expecting an array or a string",
+                      evaluate("print len(1);"))
+        self.assertIn("substr was expecting a start and a size within a "
+                      "string of length 2", evaluate("print substr(\"ab\", "
+                                                     "1, 5);"))
+
+    def test_globals_shadow_natives(self):
+        self.assertEqual(evaluate("var len = 2; print len;"), "2\n")
+
+
+class TestRegistry(unittest.TestCase):
+    def tearDown(self):
+        for name in ["hypot", "checked"]:
+            registry.pop(name, None)
+
+    def test_bind(self):
+        bind("hypot", math.hypot, float, float)
+        self.assertEqual(evaluate("print hypot(3, 4);"), "5\n")
+        self.assertIn("hypot was expecting 2 arguments",
+                      evaluate("print hypot(3);"))
+
+    def test_native(self):
+        @native("checked", None)
+        def checked(token, value):
+            if value is None:
+                raise PyLOXRuntimeError(token, "checked got nil")
+            return value
+
+        self.assertEqual(evaluate("print checked(\"a\");"), "a\n")
+        self.assertIn("checked got nil", evaluate("print checked(nil);"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import operator
+import pickle
+import unittest
+
+from helpers import evaluate
+from PyLOX.numeric_array import NumericArray
+
+DECLARATIONS = "var a = [1, 2, 3]; var b = [4, 5, 6];"
+
+
+class TestNumericArray(unittest.TestCase):
+    def test_element_wise(self):
+        a = NumericArray.from_values([1.0, 2.0, 3.0])
+        b = NumericArray.from_values([4.0, 5.0, 6.0])
+        self.assertEqual(str(NumericArray.apply(operator.add, a, b)),
+                         "[5, 7, 9]")
+        self.assertEqual(str(NumericArray.apply(operator.sub, 1.0, a)),
+                         "[0, -1, -2]")
+        self.assertEqual(str(NumericArray.apply(operator.truediv, a, 2.0)),
+                         "[0.5, 1, 1.5]")
+        self.assertEqual(str(NumericArray.apply(operator.ge, b, 5.0)),
+                         "[0, 1, 1]")
+
+    def test_errors(self):
+        a = NumericArray.from_values([1.0, 0.0])
+        with self.assertRaises(ValueError):
+            NumericArray.apply(operator.add, a,
+                               NumericArray.from_values([1.0]))
+        with self.assertRaises(ZeroDivisionError):
+            NumericArray.apply(operator.truediv, 1.0, a)
+        with self.assertRaises(ZeroDivisionError):
+            NumericArray.apply(operator.truediv, a, 0.0)
+
+    def test_elements(self):
+        a = NumericArray.zeros(3)
+        a[1] = 2.5
+        self.assertEqual(len(a), 3)
+        self.assertIs(type(a[1]), float)
+        self.assertEqual(a, NumericArray.from_values([0.0, 2.5, 0.0]))
+        self.assertNotEqual(a, NumericArray.zeros(2))
+
+    def test_slices_are_copies(self):
+        a = NumericArray.from_values([1.0, 2.0, 3.0])
+        part = a.slice(1, 3)
+        part[0] = 9.0
+        self.assertEqual(str(part), "[9, 3]")
+        self.assertEqual(str(a), "[1, 2, 3]")
+
+    def test_pickled(self):
+        a = NumericArray.from_values([1.0, 2.0])
+        self.assertEqual(pickle.loads(pickle.dumps(a)), a)
+
+
+class TestArrays(unittest.TestCase):
+    def test_operators(self):
+        self.assertEqual(evaluate(DECLARATIONS + """
+            print a + b;
+            print a * 2;
+            print a / b;
+            print a < b;
+            print a == [1, 2, 3];
+        """), "[5, 7, 9]\n[2, 4, 6]\n[0.25, 0.4, 0.5]\n[1, 1, 1]\nTrue\n")
+
+    def test_elements(self):
+        self.assertEqual(evaluate(DECLARATIONS + """
+            print len(a);
+            print a[1:];
+            { var c = a[0:2]; c[0] = 9; print c; }
+            print a;
+            var z = array(2);
+            { z[1] = a[2] + 0.5; }
+            print z;
+        """), "3\n[2, 3]\n[9, 2]\n[1, 2, 3]\n[0, 3.5]\n")
+
+    def test_runtime_errors(self):
+        self.assertIn("arrays of different lengths",
+                      evaluate(DECLARATIONS + "print a + [1];"))
+        self.assertIn("Zero division error",
+                      evaluate(DECLARATIONS + "print a / [1, 0, 1];"))
+        self.assertIn("out of range", evaluate(DECLARATIONS + "print a[3];"))
+        self.assertIn("non negative integer", evaluate("print array(-1);"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,315 @@
+import io
+import unittest
+
+from helpers import evaluate, nodes
+from PyLOX.dead_store import DeadStoreElimination
+from PyLOX.exceptions import PyLOXRuntimeError
+from PyLOX.expressions import Binary, Invariant, UncheckedBinary
+from PyLOX.front_end import parse
+from PyLOX.fusion import Fusion
+from PyLOX.interpreter import Interpreter
+from PyLOX.loop_invariant import LoopInvariantMotion
+from PyLOX.program import execute, run_deep
+from PyLOX.slots import resolve_slots
+from PyLOX.type_inference import TypeInference
+
+
+def parse_program(source):
+    return parse(source, jobs=1, stream=io.StringIO())
+
+
+class TestTypeInference(unittest.TestCase):
+    def unchecked(self, source, whole_program=True):
+        # lexemes of the operators of the program that are not checked
+        program = TypeInference(whole_program).infer(parse_program(source))
+        operators = [node for node in nodes(program)
+                     if isinstance(node, (Binary, UncheckedBinary))]
+        return sorted(node.operator.lexeme for node in operators
+                      if type(node) is UncheckedBinary)
+
+    def test_proven_operands(self):
+        self.assertEqual(self.unchecked("""
+            var a = 1;
+            var b = "s";
+            print a * 2 < a;
+            print b + b;
+            print a + b;
+        """), ["*", "+", "<"])
+
+    def test_branches_merge(self):
+        self.assertEqual(self.unchecked("""
+            var a = 1;
+            var b = 2;
+            if (a < b) a = "s"; else b = 3;
+            print a - 1;
+            print b - 1;
+        """), ["-", "<"])
+
+    def test_loops_reach_a_fixed_point(self):
+        self.assertEqual(self.unchecked("""
+            var a = 1;
+            var i = 0;
+            while (i < 10) {
+                print a * 2;
+                a = "x";
+                i = i + 1;
+            }
+        """), ["+", "<"])
+
+    def test_calls_forget_assigned_variables(self):
+        self.assertEqual(self.unchecked("""
+            var a = 1;
+            var b = 1;
+            fun f() { a = "s"; }
+            f();
+            print a - 1;
+            print b - 1;
+        """), ["-"])
+
+    def test_partial_programs_forget_globals_at_calls(self):
+        source = "var a = 1; g(); print a - 1;"
+        self.assertEqual(self.unchecked(source), ["-"])
+        self.assertEqual(self.unchecked(source, whole_program=False), [])
+
+    def test_unproven_sites_report_errors(self):
+        self.assertIn("MINUS was expecting", evaluate("""
+            var a = 1;
+            fun f() { a = "s"; }
+            f();
+            print a - 1;
+        """))
+        output = evaluate("""
+            var a = 1;
+            var i = 0;
+            while (i < 2) { print a * 2; a = 3; i = i + 1; }
+            print a + "s";
+        """).splitlines()
+        self.assertEqual(output[:2], ["2", "6"])
+        self.assertIn("PLUS was expecting", output[2])
+
+
+
+class TestLoopInvariantMotion(unittest.TestCase):
+    def hoisted(self, source):
+        # lexemes of the operators of the hoisted expressions
+        program = LoopInvariantMotion().optimize(parse_program(source))
+        return sorted(node.expression.operator.lexeme
+                      for node in nodes(program)
+                      if isinstance(node, Invariant))
+
+    def test_invariants_are_hoisted(self):
+        self.assertEqual(self.hoisted("""
+            var a = 2;
+            var b = 3;
+            for (var i = 0; i < 3; i = i + 1) {
+                var c = a * b;
+                print c + i;
+            }
+        """), ["*"])
+
+    def test_variants_stay(self):
+        self.assertEqual(self.hoisted("""
+            var a = 2;
+            var i = 0;
+            while (i < 3) { print a * 2; a = a + 1; i = i + 1; }
+        """), [])
+
+    def test_calls_and_array_writes_keep_variables(self):
+        self.assertEqual(self.hoisted("""
+            var a = 2;
+            var i = 0;
+            fun f() { a = 10; }
+            while (i < 2) { print a * 2; print 3 * 4; f(); i = i + 1; }
+        """), ["*"])
+        self.assertEqual(self.hoisted("""
+            var values = array(2);
+            var i = 0;
+            while (i < 2) { print -values; values[0] = 5; i = i + 1; }
+        """), [])
+
+    def test_function_bodies_are_not_hoisted(self):
+        self.assertEqual(self.hoisted("""
+            var a = 2;
+            var i = 0;
+            while (i < 2) { fun f() { return a * 2; } i = i + 1; }
+        """), [])
+
+    def test_results(self):
+        self.assertEqual(evaluate("""
+            var a = 2;
+            var i = 0;
+            fun f() { a = 10; }
+            while (i < 2) { print a * 2; f(); i = i + 1; }
+            var values = array(1);
+            for (var j = 0; j < 2; j = j + 1) {
+                print values[0] + 1;
+                values[0] = 5;
+            }
+            for (var k = 0; k < 2; k = k + 1) {
+                for (var l = 0; l < 2; l = l + 1) print k * 10 + l;
+            }
+        """), "4\n20\n1\n6\n0\n1\n10\n11\n")
+
+    def test_errors_are_raised_in_the_loop(self):
+        self.assertEqual(evaluate("""
+            var s = "x";
+            while (false) print s - 1;
+            print "done";
+        """), "done\n")
+        output = evaluate("""
+            var s = "x";
+            for (var i = 0; i < 3; i = i + 1) { print i; print s - 1; }
+        """).splitlines()
+        self.assertEqual(output[0], "0")
+        self.assertIn("MINUS was expecting", output[1])
+        self.assertEqual(len(output), 2)
+
+
+
+class TestDeadStoreElimination(unittest.TestCase):
+    def removed(self, source):
+        dead_stores = DeadStoreElimination()
+        dead_stores.optimize(parse_program(source))
+        return (dead_stores.removed_declarations, dead_stores.removed_stores,
+                dead_stores.removed_statements)
+
+    def test_dead_stores_are_removed(self):
+        self.assertEqual(self.removed("""
+            var unused = 1;
+            var x = 1;
+            x = 2;
+            print x;
+            { var y = 3; y; }
+        """), (2, 1, 1))
+
+    def test_effects_are_kept(self):
+        self.assertEqual(self.removed("""
+            fun f() { print "called"; return 1; }
+            var a = f();
+            var b = "a" - 1;
+        """), (0, 0, 0))
+        self.assertEqual(evaluate("""
+            fun f() { print "called"; return 1; }
+            { var a = f(); }
+            { var b = "a" - 1; }
+            print "after";
+        """).splitlines()[0], "called")
+        self.assertNotIn("after", evaluate("{ var b = \"a\" - 1; } "
+                                           "print \"after\";"))
+
+    def test_stores_read_by_functions(self):
+        self.assertEqual(evaluate("""
+            fun make() {
+                var n = 0;
+                fun increment() { n = n + 1; return n; }
+                return increment;
+            }
+            var increment = make();
+            { increment(); }
+            print increment();
+            var a = 1;
+            fun show() { print a; }
+            { a = 2; show(); a = 3; }
+        """), "2\n2\n")
+
+    def test_stores_read_by_later_iterations(self):
+        self.assertEqual(evaluate("""
+            var last = -1;
+            for (var i = 0; i < 3; i = i + 1) { print last; last = i; }
+            var x = 1;
+            while (true) { x = 2; break; }
+            print x;
+        """), "-1\n0\n1\n2\n")
+
+    def test_globals_of_partial_programs_are_kept(self):
+        interpreter = Interpreter(io.StringIO())
+        evaluate("var a = 5; var b = a; b = 6;", interpreter)
+        self.assertEqual(evaluate("print a; print b;", interpreter), "5\n6\n")
+
+
+
+# programs whose fused nodes meet floats, other values and errors
+FUSED = [
+    """
+    var total = 0;
+    for (var i = 0; i < 10; i = i + 1) { total = total + 0.5; }
+    var j = 10;
+    while (0 < j) j = j - 3;
+    print total; print j;
+    """,
+    """
+    fun count(limit) {
+        var n = 0;
+        var steps = 0;
+        while (n <= limit) { n = n + 2; steps = steps + 1; }
+        return steps;
+    }
+    print count(9);
+    """,
+    """
+    fun make() {
+        var n = 0;
+        fun next() { n = n + 1; return n; }
+        return next;
+    }
+    var next = make();
+    { next(); next(); }
+    print next();
+    """,
+    """
+    var values = [1, 2];
+    { values = values + 1; }
+    print values;
+    var s = "a";
+    { s = s + 1; }
+    """,
+    """
+    fun f(n) { n = n - 1; return n; }
+    print f(nil);
+    """,
+    """
+    var limit = "ten";
+    for (var i = 0; i < limit; i = i + 1) print i;
+    """,
+    """
+    var x = 3;
+    if (x >= 3) print "yes"; else print "no";
+    if (x > nil) print "never";
+    """,
+]
+
+
+class TestFusion(unittest.TestCase):
+    def run_program(self, source, fuse):
+        program = parse_program(source)
+        program = LoopInvariantMotion().optimize(program)
+        program = TypeInference(True).infer(program)
+        program = DeadStoreElimination().optimize(program)
+        program = resolve_slots(program)
+        fusion = Fusion()
+        if fuse:
+            program = fusion.fuse(program)
+        output = io.StringIO()
+        try:
+            run_deep(execute, program, Interpreter(output))
+        except PyLOXRuntimeError as e:
+            print(e, file=output)
+        return output.getvalue(), fusion
+
+    def test_fused_programs_run_the_same(self):
+        for source in FUSED:
+            with self.subTest(source=source):
+                fused, fusion = self.run_program(source, True)
+                unfused, _ = self.run_program(source, False)
+                self.assertEqual(fused, unfused)
+                self.assertGreater(fusion.increments + fusion.comparisons +
+                                   fusion.assignments, 0)
+
+    def test_fused_nodes(self):
+        _, fusion = self.run_program(FUSED[0], True)
+        self.assertEqual((fusion.increments, fusion.comparisons,
+                          fusion.assignments), (3, 2, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+from helpers import evaluate
+
+DECLARATIONS = """
+fun f(x) { return x * 2; }
+var a = [1, 2, 3];
+class P { init() { this.x = 7; } get() { return this.x; } }
+var p = P();
+"""
+
+
+class TestGroupingPostfix(unittest.TestCase):
+    def test_call(self):
+        self.assertEqual(evaluate(DECLARATIONS + "print (f)(1);"), "2\n")
+
+    def test_index(self):
+        self.assertEqual(evaluate(DECLARATIONS + "print (a)[0]; "
+                                                 "print (a + a)[1]; "
+                                                 "print ((a))[1:3];"),
+                         "1\n4\n[2, 3]\n")
+
+    def test_property(self):
+        self.assertEqual(evaluate(DECLARATIONS + "print (p).x; "
+                                                 "print (p).get();"),
+                         "7\n7\n")
+
+    def test_assignment(self):
+        self.assertEqual(evaluate(DECLARATIONS + "{ (a)[2] = 9; (p).x = 8; } "
+                                                 "print a[2]; print p.x;"),
+                         "9\n8\n")
+
+    def test_operators_around_postfix(self):
+        self.assertEqual(evaluate(DECLARATIONS +
+                                  "print -(a)[0] * ((2) + (f)(3));"), "-8\n")
+
+    def test_grouping_is_not_an_assignment_target(self):
+        self.assertIn("Invalid assignment target",
+                      evaluate(DECLARATIONS + "(a) = 1;"))
+
+
+
+class TestPrecedence(unittest.TestCase):
+    def test_arithmetic(self):
+        self.assertEqual(evaluate("print 1 + 2 * 3 - 4 / 2; print -2 * -3;"),
+                         "5\n6\n")
+
+    def test_left_associativity(self):
+        self.assertEqual(evaluate("print 8 - 4 - 2; print 16 / 4 / 2;"),
+                         "2\n2\n")
+
+    def test_assignment_is_right_associative(self):
+        self.assertEqual(evaluate("{ var a; var b; a = b = 3; print a + b; }"),
+                         "6\n")
+
+    def test_comparisons_and_logic(self):
+        self.assertEqual(evaluate("print 1 < 2 == 2 < 3; "
+                                  "print \"a\" + \"b\" == \"ab\"; "
+                                  "print nil or 1 and 2;"),
+                         "True\nTrue\n2\n")
+
+
+class TestDeepNesting(unittest.TestCase):
+    # deeper than the default recursion limit of python allows to recurse
+    DEPTH = 5000
+
+    def test_groupings(self):
+        self.assertEqual(evaluate("print " + "(" * self.DEPTH + "1" +
+                                  ")" * self.DEPTH + ";"), "1\n")
+
+    def test_unary_operators(self):
+        self.assertEqual(evaluate("print " + "-" * (self.DEPTH + 1) + "1;"),
+                         "-1\n")
+
+    def test_long_chain(self):
+        self.assertEqual(evaluate("print " + " + ".join(["1"] * self.DEPTH) +
+                                  ";"), "5000\n")
+
+    def test_unclosed_groupings(self):
+        self.assertIn("Parser was expecting \")\"",
+                      evaluate("print " + "(" * self.DEPTH + "1;"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from helpers import evaluate, nodes
+from PyLOX.expressions import GuardedBinary
+from PyLOX.interpreter import Interpreter
+from PyLOX.main import compile_program
+from PyLOX.pgo import ProfilingInterpreter, apply_profile, load_profile, \
+    profile_key
+from PyLOX.program import Program
+
+SOURCE = """
+fun add(a, b) { return a + b; }
+var total = 0;
+var i = 0;
+while (i < 2000) { total = add(total, i); i = i + 1; }
+print total;
+"""
+
+
+class TestProfile(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "profile.json")
+        evaluate(SOURCE, ProfilingInterpreter(io.StringIO()),
+                 whole_program=True, profile_out=self.path)
+        self.profile = load_profile(self.path, profile_key(SOURCE, False))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_applied_profile(self):
+        self.assertEqual(evaluate(SOURCE, Interpreter(io.StringIO()),
+                                  whole_program=True, profile_in=self.path),
+                         evaluate(SOURCE))
+
+    def test_program_is_not_changed(self):
+        # cached and shared programs are reused by other runs
+        program = Program(compile_program(SOURCE, whole_program=True))
+        statements, hot_loops = apply_profile(list(program), self.profile)
+        self.assertEqual(len(hot_loops), 1)
+        self.assertTrue(any(type(node) is GuardedBinary
+                            for node in nodes(statements)))
+        self.assertFalse(any(type(node) is GuardedBinary
+                             for node in nodes(program)))
+        self.assertTrue(hot_loops.isdisjoint(nodes(program)))
+
+
+if __name__ == "__main__":
+    unittest.main()
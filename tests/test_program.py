@@ -0,0 +1,80 @@
+import io
+import unittest
+
+from PyLOX.exceptions import PyLOXRuntimeError
+from PyLOX.interpreter import Interpreter
+from PyLOX.main import compile_program
+from PyLOX.program import Program, run_concurrently
+
+SOURCE = """
+fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+fun counter() {
+    var count = 0;
+    fun increment() { count = count + 1; return count; }
+    return increment;
+}
+class Point {
+    init(x, y) { this.x = x; this.y = y; }
+    sum() { return this.x + this.y; }
+}
+var increment = counter();
+var total = 0;
+for (var i = 0; i < 200; i = i + 1) {
+    { increment(); }
+    var p = Point(i, fib(5));
+    total = total + p.sum();
+}
+print total;
+print increment();
+"""
+
+
+def compile(source, lazy=False, whole_program=True):
+    return Program(compile_program(source, whole_program=whole_program,
+                                   lazy=lazy, stream=io.StringIO()))
+
+
+class TestProgram(unittest.TestCase):
+    def test_programs_can_not_be_changed(self):
+        program = compile(SOURCE)
+        with self.assertRaises(AttributeError):
+            program.statements = ()
+        self.assertIs(type(program.statements), tuple)
+
+    def test_runs_keep_the_globals_of_their_interpreter(self):
+        interpreter = Interpreter(io.StringIO())
+        # globals of a program that other programs read are kept without
+        # whole_program
+        program = compile("var n; { n = 1; } fun next() { n = n + 1; }",
+                          whole_program=False)
+        program.run(interpreter)
+        second = compile("{ next(); next(); } print n;", whole_program=False)
+        second.run(interpreter)
+        self.assertEqual(interpreter.stream.getvalue(), "3\n")
+
+    def test_concurrent_runs(self):
+        for lazy in [False, True]:
+            program = compile(SOURCE, lazy)
+            interpreters = [Interpreter(io.StringIO()) for _ in range(8)]
+            results = run_concurrently(program, interpreters)
+            self.assertFalse(any(isinstance(result, PyLOXRuntimeError)
+                                 for result in results))
+            # every run has its own counter
+            self.assertEqual({interpreter.stream.getvalue()
+                              for interpreter in interpreters},
+                             {"20900\n201\n"})
+
+    def test_failed_runs(self):
+        program = compile("print 10 / divisor;")
+        interpreters = [Interpreter(io.StringIO()) for _ in range(4)]
+        for index, interpreter in enumerate(interpreters):
+            interpreter.environment.memory["divisor"] = float(index)
+        results = run_concurrently(program, interpreters, jobs=2)
+        self.assertIsInstance(results[0], PyLOXRuntimeError)
+        self.assertEqual([interpreter.stream.getvalue()
+                          for interpreter in interpreters[1:]],
+                         ["10\n", "5\n", "3.3333333333333335\n"])
+
+
+if __name__ == "__main__":
+    unittest.main()
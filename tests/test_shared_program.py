@@ -0,0 +1,75 @@
+import io
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+from PyLOX.interpreter import Interpreter
+from PyLOX.main import compile_program
+from PyLOX.program import execute, run_deep
+from PyLOX.shared_program import SharedProgram, attach, encode, publish
+
+SOURCE = """
+fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+class P { init(x) { this.x = x; } }
+var values = [1, 2, 3];
+print fib(10) + P(2).x;
+print values * 2;
+print "text";
+"""
+
+
+def run_program(program):
+    output = io.StringIO()
+    for outcome in run_deep(execute, program, Interpreter(output)):
+        if outcome is not None:
+            print(outcome, file=output)
+    return output.getvalue()
+
+
+def run_attached(name):
+    # runs in another process
+    program = attach(name)
+    try:
+        return run_program(program)
+    finally:
+        program.memory.close()
+
+
+class TestSharedProgram(unittest.TestCase):
+    def setUp(self):
+        self.program = compile_program(SOURCE, whole_program=True)
+
+    def test_same_results(self):
+        shared = SharedProgram(memoryview(encode(self.program)))
+        self.assertEqual(len(shared), len(self.program))
+        self.assertEqual(run_program(shared), run_program(self.program))
+
+    def test_statements_are_decoded_on_request(self):
+        shared = SharedProgram(memoryview(encode(self.program)))
+        self.assertEqual(shared.statements, [None] * len(self.program))
+        shared[1]
+        self.assertEqual([stmt is not None for stmt in shared.statements],
+                         [index == 1 for index in range(len(self.program))])
+
+    def test_source_is_stored_once(self):
+        shared = SharedProgram(memoryview(encode(self.program)))
+        self.assertEqual(len(shared.lines), 1)
+        self.assertIs(shared[0].name.lines, shared[1].name.lines)
+        self.assertEqual(shared[0].name.line, self.program[0].name.line)
+
+    def test_other_buffers_are_rejected(self):
+        with self.assertRaises(ValueError):
+            SharedProgram(memoryview(b"JUNK" + encode(self.program)[4:]))
+
+    def test_other_processes_attach(self):
+        memory = publish(self.program)
+        try:
+            with ProcessPoolExecutor(2) as executor:
+                outputs = list(executor.map(run_attached, [memory.name] * 2))
+        finally:
+            memory.close()
+            memory.unlink()
+        self.assertEqual(outputs, [run_program(self.program)] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
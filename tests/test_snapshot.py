@@ -0,0 +1,89 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from PyLOX.interpreter import Interpreter
+from PyLOX.main import run, run_file, run_prelude
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.prelude = os.path.join(self.directory, "prelude.lox")
+        self.snapshot = os.path.join(self.directory, "prelude.snap")
+        with open(self.prelude, "w") as f:
+            f.write("import \"values.lox\"; print \"prelude\";")
+        self.write_module("var value = 1;")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_module(self, source):
+        with open(os.path.join(self.directory, "values.lox"), "w") as f:
+            f.write(source)
+
+    def evaluate(self):
+        # runs the prelude from the snapshot and returns the output
+        output = io.StringIO()
+        interpreter = Interpreter(output)
+        with contextlib.redirect_stdout(output):
+            run_prelude(self.prelude, interpreter, self.snapshot)
+            run("print value;", interpreter, jobs=1)
+        return output.getvalue()
+
+    def test_restore(self):
+        self.assertEqual(self.evaluate(), "prelude\n1\n")
+        self.assertEqual(self.evaluate(), "1\n")
+
+    def test_changed_module(self):
+        self.assertEqual(self.evaluate(), "prelude\n1\n")
+        self.write_module("var value = 22;")
+        output = self.evaluate()
+        self.assertIn("before a module of the prelude changed", output)
+        self.assertTrue(output.endswith("prelude\n22\n"))
+        self.assertEqual(self.evaluate(), "22\n")
+
+
+class TestScriptAfterPrelude(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def evaluate(self, prelude, script):
+        # runs the script after the prelude twice, the second time from
+        # the snapshot, and returns the outputs
+        paths = [os.path.join(self.directory, name)
+                 for name in ("prelude.lox", "script.lox", "prelude.snap")]
+        for path, source in zip(paths, (prelude, script)):
+            with open(path, "w") as f:
+                f.write(source)
+        outputs = []
+        for _ in range(2):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                run_file(paths[1], output, jobs=1, prelude=paths[0],
+                         snapshot=paths[2])
+            outputs.append(output.getvalue())
+        return outputs
+
+    def test_prelude_reads_a_global_of_the_script(self):
+        # the declaration is not a dead store, the prelude reads it
+        self.assertEqual(self.evaluate("fun show() { print greeting; }",
+                                       "var greeting = \"hi\"; show();"),
+                         ["hi\n", "hi\n"])
+
+    def test_prelude_changes_the_type_of_a_global(self):
+        for output in self.evaluate("fun bump() { counter = \"s\"; }",
+                                    "var counter = 1; bump(); "
+                                    "print counter - 1;"):
+            self.assertIn("Runtime error", output)
+            self.assertIn("MINUS was expecting", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
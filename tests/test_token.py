@@ -0,0 +1,67 @@
+import io
+import pickle
+import unittest
+
+from helpers import evaluate
+from PyLOX.scanner import Scanner
+from PyLOX.token import LineIndex
+
+SOURCE = "var a = 1;\n\n  print \"x\ny\";\r\nprint a;"
+
+
+def positions(source, line=0):
+    tokens = Scanner(source, line, io.StringIO()).scan_tokens()
+    return [(token.lexeme, token.line, token.column) for token in tokens]
+
+
+class TestLineIndex(unittest.TestCase):
+    def test_positions(self):
+        lines = LineIndex("ab\ncd\r\nef")
+        self.assertEqual([lines.position(offset)
+                          for offset in [0, 2, 3, 4, 7]],
+                         [(0, 0), (0, 2), (1, 0), (1, 1), (2, 0)])
+
+    def test_newline_runs_start_one_line(self):
+        # like the scanner counted lines before positions were offsets
+        lines = LineIndex("a\n\n\nb\r\n\r\nc")
+        self.assertEqual(lines.position(4), (1, 0))
+        self.assertEqual(lines.position(9), (2, 0))
+
+    def test_first_line(self):
+        self.assertEqual(LineIndex("a\nb", 7).position(2), (8, 0))
+
+    def test_line_starts_are_computed_on_request(self):
+        tokens = Scanner(SOURCE, 0, io.StringIO()).scan_tokens()
+        lines = tokens[0].lines
+        self.assertIsNone(lines.starts)
+        self.assertEqual(tokens[-1].line, 3)
+        self.assertEqual(len(lines.starts), 4)
+
+
+class TestTokenPositions(unittest.TestCase):
+    def test_positions_are_at_the_end_of_tokens(self):
+        self.assertEqual(positions(SOURCE), [
+            ("var", 0, 3), ("a", 0, 5), ("=", 0, 7), ("1", 0, 9), (";", 0, 10),
+            ("print", 1, 7), ("\"x\ny\"", 2, 2), (";", 2, 3),
+            ("print", 3, 5), ("a", 3, 7), (";", 3, 8), ("", 3, 8)])
+
+    def test_chunk_lines(self):
+        self.assertEqual(positions("print a;", 5)[:2],
+                         [("print", 5, 5), ("a", 5, 7)])
+
+    def test_pickled_tokens(self):
+        tokens = Scanner(SOURCE, 2, io.StringIO()).scan_tokens()
+        copies = pickle.loads(pickle.dumps(tokens))
+        self.assertEqual([(token.line, token.column) for token in copies],
+                         [(token.line, token.column) for token in tokens])
+        # tokens of a source share its index
+        self.assertTrue(all(token.lines is copies[0].lines
+                            for token in copies))
+
+    def test_errors_report_positions(self):
+        self.assertIn("(2: 9)", evaluate("var s = \"a\";\n\nvar t = s;\n"
+                                         "print t - 1;"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,33 +5,84 @@
     base class is named Expr
 
     entry format
-    <name_of class> : <type> <name> (, <type> <name>)*
+    <name_of class> ( < <base> (, <base>)* )? ( : <type> <name> (, <type> <name>)* )?
+
+    a class with bases takes their fields before its own, a class with more
+    than one base is visited like the first one
+    lines starting with # are comments written before the next class
 """
+import io
+import re
 import sys
 
+# longest line of the output
+LINE_LENGTH = 79
+
 
 def indent(string, level=0):
     return 4 * level * " " + string
 
 
-def generate_expression(out_file, description):
-    name, definitions = description.split(":")
-    lines = [indent("class {name}(Expr):".format(name=name.strip()))]
-
-    definitions = [[part.strip() for part in definition.strip().split()]
-                   for definition in definitions.split(",")]
-    arguments = ["{name}: {type}".format(name=definition[1], type=definition[0])
-                 for definition in definitions]
+def wrap(string, level):
+    # breaks an argument list after commas, continuation lines are aligned
+    # with the opening parenthesis
+    line = indent(string, level)
+    if len(line) <= LINE_LENGTH:
+        return [line]
+    column = line.index("(") + 1
+    lines = []
+    while len(line) > LINE_LENGTH:
+        split = line.rindex(", ", 0, LINE_LENGTH) + 1
+        lines.append(line[:split])
+        line = column * " " + line[split + 1:]
+    return lines + [line]
+
+
+def visitor_name(name):
+    # CamelCase class names are visited by snake_case methods
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+def parse_description(description):
+    name, _, definitions = description.partition(":")
+    name, _, bases = name.partition("<")
+    bases = [base.strip() for base in bases.split(",") if base.strip()]
+    fields = [definition.split() for definition in definitions.split(",")
+              if definition.strip()]
+    return name.strip(), bases, fields
+
+
+def generate_expression(out_file, description, comments, classes):
+    name, bases, fields = parse_description(description)
+    inherited = classes[bases[0]] if bases else []
+    classes[name] = inherited + fields
+    lines = [line.rstrip() for line in comments]
+    lines.append(indent("class {name}({bases}):".format(
+        name=name, bases=", ".join(bases or ["Expr"]))))
+
+    if len(bases) > 1:
+        lines.append(indent("pass", 1))
+        lines.append("")
+        print("\n".join(lines), file=out_file)
+        return
+
+    if fields:
+        arguments = ["{name}: {type}".format(name=field[1], type=field[0])
+                     for field in inherited + fields]
+        lines.extend(wrap("def __init__(self, {args}):".format(
+            args=", ".join(arguments)), 1))
+        if inherited:
+            lines.extend(wrap("super({name}, self).__init__({args})".format(
+                name=name, args=", ".join(field[1] for field in inherited)),
+                2))
+        for field in fields:
+            lines.append(indent("self.{name} = {name}".format(name=field[1]),
+                                2))
+        lines.append("")
 
-    lines.append(indent("def __init__(self, {args}):".format(
-        args=", ".join(arguments)), 1))
-
-    for definition in definitions:
-        lines.append(indent("self.{name} = {name}".format(name=definition[1]), 2))
-
-    lines.append("")
     lines.append(indent("def visit(self, visitor, *args, **kwargs):", 1))
-    lines.append(indent("return visitor.visit_{name}(self, *args, **kwargs)".format(name=name.strip().lower()), 2))
+    lines.append(indent("return visitor.visit_{name}(self, *args, **kwargs)"
+                        .format(name=visitor_name(name)), 2))
     lines.append("")
 
     print("\n".join(lines), file=out_file)
@@ -46,7 +97,11 @@ def generate_base(out_file):
 
 
 def generate_header(out_file):
-    lines = ["from PyLOX.token import Token", "", ""]
+    lines = ["from typing import List",
+             "",
+             "from PyLOX.classes import InlineCache",
+             "from PyLOX.token import Token",
+             "", ""]
     print("\n".join(lines), file=out_file)
 
 
@@ -56,9 +111,19 @@ if __name__ == "__main__":
         sys.exit(0)
     with open(sys.argv[1], "r") as f:
         descriptions = f.readlines()
+    output = io.StringIO()
+    generate_header(output)
+    generate_base(output)
+    # fields of the generated classes by their name
+    classes = {}
+    comments = []
+    for description in descriptions:
+        if description.startswith("#"):
+            comments.append(description)
+        elif description.strip():
+            print("", file=output)
+            generate_expression(output, description, comments, classes)
+            comments = []
     with open(sys.argv[2], "w") as f:
-        generate_header(f)
-        generate_base(f)
-        for description in descriptions:
-            print("", file=f)
-            generate_expression(f, description)
+        # without the blank line after the last class
+        f.write(output.getvalue().rstrip("\n") + "\n")
@@ -0,0 +1,69 @@
+"""
+    Measures the cold start of the interpreter, the time from launching a
+    new process to the output of a one line script, against the start of a
+    bare python process
+
+    exits with an error if the median overhead exceeds the budget
+
+    usage
+    python tools/startup_benchmark.py [--runs=N] [--budget=MILLISECONDS]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RUNS = 20
+# milliseconds the interpreter may add to the start of python
+BUDGET = 45.0
+
+
+def measure(command, expected, runs, environment):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run(command, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT,
+                                env=environment).stdout.decode()
+        timings.append((time.perf_counter() - start) * 1000)
+        if output != expected:
+            print("Unexpected output of {command}: {output}".format(
+                command=" ".join(command), output=output))
+            sys.exit(1)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    runs, budget = RUNS, BUDGET
+    for arg in sys.argv[1:]:
+        if arg.startswith("--runs="):
+            runs = int(arg[len("--runs="):])
+        elif arg.startswith("--budget="):
+            budget = float(arg[len("--budget="):])
+        else:
+            print("Usage: python {name} [--runs=N] [--budget=MILLISECONDS]"
+                  .format(name=sys.argv[0]))
+            sys.exit(0)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment = dict(os.environ, PYTHONPATH=root)
+    with tempfile.NamedTemporaryFile("w", suffix=".lox",
+                                     delete=False) as f:
+        f.write("print \"ready\";\n")
+    try:
+        # the first runs warm the file system cache and write the bytecode
+        measure([sys.executable, "-m", "PyLOX.main", f.name], "ready\n", 2,
+                environment)
+        python = measure([sys.executable, "-c", "pass"], "", runs,
+                         environment)
+        interpreter = measure([sys.executable, "-m", "PyLOX.main", f.name],
+                              "ready\n", runs, environment)
+    finally:
+        os.remove(f.name)
+    overhead = interpreter - python
+    print("python {python:.1f} ms, interpreter {interpreter:.1f} ms, "
+          "overhead {overhead:.1f} ms, budget {budget:.1f} ms".format(
+        python=python, interpreter=interpreter, overhead=overhead,
+        budget=budget))
+    sys.exit(1 if overhead > budget else 0)